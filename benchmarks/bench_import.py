@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how long a fresh interpreter takes to import the parts of
+qtestudo, and how long a run takes from starting its worker until the
+worker starts the first test. Every import is timed in its own
+interpreter, so nothing is cached between them; the best and the median
+of several repetitions are reported, along with whether Qt got loaded.
+
+    python benchmarks/bench_import.py [-r REPEAT] [--json]
+"""
+
+import os
+import sys
+import time
+import json
+import subprocess
+
+from optparse import OptionParser
+from unittest import TestCase, TestSuite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from qtestudo.core import TestRunner
+from qtestudo.cli import StreamResult
+
+# What is imported, and what it is needed for.
+IMPORTS = [
+    ('', 'interpreter startup'),
+    ('qtestudo', 'import qtestudo'),
+    ('qtestudo.core', 'worker'),
+    ('qtestudo.cli', 'python -m qtestudo.cli'),
+    ('qtestudo.gui', 'python -m qtestudo'),
+]
+
+# Run in a fresh interpreter; prints the seconds the import took and
+# whether Qt was loaded by it.
+PROBE = """
+import sys, time
+sys.path.insert(0, %r)
+start = time.time()
+if %r:
+    __import__(%r)
+print time.time() - start, 'PyQt4' in sys.modules
+"""
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_import(module, repeat):
+    """ Return the wall clock time of a fresh interpreter importing module
+    (including its startup), the time of the import alone, and whether
+    it imported Qt; the best and median of repeat runs each. Return None if
+    module cannot be imported. """
+    totals = []
+    imports = []
+    qt = False
+    for _ in xrange(repeat):
+        start = time.time()
+        proc = subprocess.Popen(
+            [sys.executable, '-c', PROBE % (ROOT, module, module)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        out, err = proc.communicate()
+        totals.append(time.time() - start)
+        if proc.returncode:
+            return None
+        elapsed, loaded = out.split()
+        imports.append(float(elapsed))
+        qt = loaded == 'True'
+    return {
+        'total': [min(totals), median(totals)],
+        'import': [min(imports), median(imports)],
+        'qt': qt
+    }
+
+
+class Trivial(TestCase):
+    def test(self):
+        pass
+
+
+def time_first_test(repeat):
+    """ Return the best and median time from starting a run until its
+    worker started the first test. """
+    times = []
+    for _ in xrange(repeat):
+        result = StreamResult()
+        runner = TestRunner(result, 1, timings=None, results=None)
+        runner.run(TestSuite([Trivial('test')]))
+        runner.wait()
+        times.append(result.first_test)
+    return [min(times), median(times)]
+
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-r", "--repeat", type="int", default=10,
+                      help="measurements of each kind [default: %default]")
+    parser.add_option("--json", action="store_true",
+                      help="print the results as JSON, for tracking them")
+    options, args = parser.parse_args()
+    
+    results = {}
+    for module, purpose in IMPORTS:
+        results[module or 'python'] = time_import(module, options.repeat)
+    results['first test'] = time_first_test(options.repeat)
+    if options.json:
+        print json.dumps(results, sort_keys=True)
+        return
+    for module, purpose in IMPORTS:
+        timing = results[module or 'python']
+        if timing is None:
+            print "%-14s %-24s could not be imported" % (module, purpose)
+            continue
+        print "%-14s %-24s %7.1f ms (%7.1f ms import), median %7.1f ms%s" % (
+            module or 'python', purpose, 1000 * timing['total'][0],
+            1000 * timing['import'][0], 1000 * timing['total'][1],
+            ', loads Qt' if timing['qt'] else ''
+        )
+    print "%-14s %-24s %7.1f ms, median %7.1f ms" % (
+        'first test', 'run until worker starts',
+        1000 * results['first test'][0], 1000 * results['first test'][1]
+    )
+
+
+if __name__ == '__main__':
+    main()
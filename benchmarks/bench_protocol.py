@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how many messages per second get from a worker to the GUI process,
+using the old protocol (one Queue.put of the full names per message) and
+the current one (batched, test names interned). Both first capture output
+the old way, in a StringIO, so that they only differ in the protocol; the
+current one is then measured with the output captured at the descriptor
+level (see OutputCapture), and with per-test memory measurement on top of
+that (see BGTestResult), to tell the cost of the protocol from that of the
+instrumentation.
+
+    python benchmarks/bench_protocol.py [-n TESTS] [-o OUTPUT_BYTES]
+"""
+
+import os
+import sys
+import time
+import marshal
+import tempfile
+import StringIO
+import traceback
+
+from optparse import OptionParser
+from multiprocessing import Pipe, Process, Queue
+from unittest import TestCase, TestResult, TestSuite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qtestudo import core
+
+
+def make_suite(n, output):
+    """ Return a suite of n distinct, trivial tests each printing output
+    bytes. """
+    def test(self):
+        " Synthetic test. "
+        if output:
+            sys.stdout.write('x' * output)
+    attrs = dict(('test_%06d' % i, test) for i in xrange(n))
+    case = type('SyntheticTestCase', (TestCase, ), attrs)
+    return TestSuite(case(name) for name in sorted(attrs))
+
+
+class LegacyResult(TestResult):
+    """ The protocol as it was before batching: one message per callback,
+    each repeating the name and description of the test. """
+    def __init__(self, queue, pseudo_file):
+        TestResult.__init__(self)
+        self.queue = queue
+        self.pseudo_file = pseudo_file
+    
+    def startTest(self, test):
+        self.pseudo_file.truncate(0)
+        self.queue.put(("start", [str(test), test.shortDescription()]))
+    
+    def addSuccess(self, test):
+        self.queue.put(
+            ("success", [str(test), test.shortDescription(),
+                         self.pseudo_file.getvalue()])
+        )
+    
+    def addError(self, test, err):
+        tb = ''.join(traceback.format_exception(*err))
+        self.queue.put(
+            ("error", [str(test), test.shortDescription(), tb,
+                       self.pseudo_file.getvalue()])
+        )
+    
+    addFailure = addError
+
+
+class StringCapture(object):
+    """ Capture output in a StringIO like the old protocol did, with the
+    interface of OutputCapture. """
+    def __init__(self):
+        self.pseudo_file = StringIO.StringIO()
+    
+    def start(self):
+        sys.stdout = self.pseudo_file
+    
+    def clear(self):
+        self.pseudo_file.truncate(0)
+    
+    def read(self):
+        return self.pseudo_file.getvalue()
+    
+    def stop(self):
+        sys.stdout = sys.__stdout__
+
+
+def legacy_worker(suite, queue):
+    pseudo_file = StringIO.StringIO()
+    sys.stdout = pseudo_file
+    suite(LegacyResult(queue, pseudo_file))
+    queue.put(('done', [0]))
+    queue.close()
+    queue.join_thread()
+
+
+def run_legacy(suite):
+    queue = Queue()
+    proc = Process(target=legacy_worker, args=(suite, queue))
+    start = time.time()
+    proc.start()
+    messages = 0
+    while True:
+        key, args = queue.get()
+        messages += 1
+        if key == 'done':
+            break
+    elapsed = time.time() - start
+    proc.join()
+    return messages, elapsed
+
+
+def batched_worker(suite, conn, fd_capture=False, memory=False):
+    path = None
+    if fd_capture:
+        fd, path = tempfile.mkstemp(prefix='qtestudo-', suffix='.out')
+        os.close(fd)
+        capture = core.OutputCapture(path)
+    else:
+        capture = StringCapture()
+    capture.start()
+    writer = core.BatchWriter(conn)
+    suite(core.BGTestResult(writer, capture, memory=memory))
+    writer.send('done', [0])
+    writer.close()
+    capture.stop()
+    if path is not None:
+        os.unlink(path)
+
+
+def run_batched(suite, fd_capture=False, memory=False):
+    reader, writer = Pipe(duplex=False)
+    proc = Process(target=batched_worker,
+                   args=(suite, writer, fd_capture, memory))
+    start = time.time()
+    proc.start()
+    writer.close()
+    messages = 0
+    tests = {}
+    tracebacks = {}
+    done = False
+    while not done:
+        for key, args in marshal.loads(reader.recv_bytes()):
+            if key == 'test':
+                tests[args[0]] = args[1:]
+                continue
+            if key == 'traceback':
+                tracebacks[args[0]] = args[1]
+                continue
+            messages += 1
+            if key == 'done':
+                done = True
+            else:
+                # Resolve the name like QTestRunner.tick does.
+                tests[args[0]]
+    elapsed = time.time() - start
+    proc.join()
+    return messages, elapsed
+
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-n", "--tests", type="int", default=20000,
+                      help="number of synthetic tests [default: %default]")
+    parser.add_option("-o", "--output", type="int", default=0,
+                      help="bytes each test prints [default: %default]")
+    options, args = parser.parse_args()
+    
+    suite = make_suite(options.tests, options.output)
+    for name, fun, extra in [('legacy', run_legacy, ()),
+                             ('batched', run_batched, ()),
+                             ('capture', run_batched, (True, )),
+                             ('memory', run_batched, (True, True))]:
+        messages, elapsed = fun(suite, *extra)
+        print "%-8s %8d messages in %7.3f s: %10.0f messages/s" % (
+            name, messages, elapsed, messages / elapsed
+        )
+
+
+if __name__ == '__main__':
+    main()
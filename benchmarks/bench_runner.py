@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how fast results get from the workers into a QTestResult, for
+synthetic suites of several sizes written to a temporary directory. For
+every size a fresh interpreter runs the suite once, so peak memory is that
+of this run alone, and reports
+
+    throughput      tests per second from TestRunner.run until done
+    first result    seconds until the first result reached the result
+    stalls          longest and 99th percentile delay of a timer that
+                    should fire every HEARTBEAT seconds, i.e. how long the
+                    event loop was kept from handling input
+    peak memory     of the GUI process and of the largest worker
+
+The GUI runs offscreen and nothing is shown. Without PyQt4 (or with
+--headless) the results go to the result of qtestudo.cli instead and
+there are no stalls to measure.
+
+    python benchmarks/bench_runner.py [-n 1000,10000,100000] [-j WORKERS]
+        [-o OUTPUT_BYTES] [-f FAILURE_RATE] [--headless] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+from optparse import OptionParser
+from unittest import TestLoader, TestSuite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from qtestudo.core import TestRunner, MemoryMeter
+from qtestudo.cli import StreamResult
+
+# Seconds between heartbeats of the event loop.
+HEARTBEAT = 0.01
+# Tests per class and classes per module of the synthetic suites.
+CLASS_SIZE = 100
+MODULE_SIZE = 10
+
+MODULE = """
+import sys
+from unittest import TestCase
+
+OUTPUT = %(output)r
+
+def passes(self):
+    if OUTPUT:
+        sys.stdout.write(OUTPUT)
+
+def fails(self):
+    if OUTPUT:
+        sys.stdout.write(OUTPUT)
+    self.fail('synthetic failure')
+"""
+
+CLASS = """
+class %(name)s(TestCase):
+%(tests)s
+"""
+
+
+def write_suite(directory, n, output, failure_rate):
+    """ Write n tests, each printing output bytes, to modules in
+    directory; a failure_rate fraction of them fails, spread evenly.
+    Return the names of the modules. """
+    modules = []
+    per_module = CLASS_SIZE * MODULE_SIZE
+    for start in xrange(0, n, per_module):
+        name = 'test_synthetic_%04d' % len(modules)
+        parts = [MODULE % {'output': 'x' * output}]
+        for offset in xrange(start, min(n, start + per_module), CLASS_SIZE):
+            tests = []
+            for i in xrange(offset, min(n, start + per_module,
+                                        offset + CLASS_SIZE)):
+                failing = int((i + 1) * failure_rate) > int(i * failure_rate)
+                tests.append('    test_%06d = %s' % (
+                    i, 'fails' if failing else 'passes'
+                ))
+            parts.append(CLASS % {
+                'name': 'Synthetic%06d' % offset, 'tests': '\n'.join(tests)
+            })
+        with open(os.path.join(directory, name + '.py'), 'w') as fd:
+            fd.write('\n'.join(parts))
+        modules.append(name)
+    return modules
+
+
+def load_suite(directory, modules):
+    sys.path.insert(0, directory)
+    loader = TestLoader()
+    return TestSuite(loader.loadTestsFromName(name) for name in modules)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def workers_peak(runner):
+    """ Return the peak resident memory of the largest finished worker. """
+    for proc in runner.procs:
+        proc.join()
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return (resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss *
+            MemoryMeter().peak_unit)
+
+
+def run_headless(suite, workers):
+    result = StreamResult()
+    runner = TestRunner(result, workers, timings=None, results=None)
+    first = []
+    report = result.report
+    
+    def first_report(*args):
+        if not first:
+            first.append(time.time())
+        report(*args)
+    
+    result.report = first_report
+    start = time.time()
+    runner.run(suite)
+    runner.wait()
+    elapsed = time.time() - start
+    return {
+        'elapsed': elapsed,
+        'first result': first[0] - start if first else None,
+        'max stall': None, 'p99 stall': None,
+        'workers peak': workers_peak(runner)
+    }
+
+
+def run_gui(suite, workers):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt4 import QtCore, QtGui
+    from qtestudo.gui import QTestResult, QTestRunner
+    
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+    times = {}
+    
+    class BenchResult(QTestResult):
+        def addResult(self, *args, **kwargs):
+            if 'first' not in times:
+                times['first'] = time.time()
+            QTestResult.addResult(self, *args, **kwargs)
+    
+    def finished(elapsed):
+        times['done'] = time.time()
+        app.quit()
+    
+    result = BenchResult(on_success=finished, on_failure=finished)
+    result.history_dir = None
+    runner = QTestRunner(result, workers, timings=None, results=None)
+    
+    beats = []
+    gaps = []
+    
+    def beat():
+        now = time.time()
+        if beats:
+            gaps.append(max(0.0, now - beats[-1] - HEARTBEAT))
+        beats.append(now)
+    
+    heartbeat = QtCore.QTimer()
+    heartbeat.connect(heartbeat, QtCore.SIGNAL('timeout()'), beat)
+    heartbeat.start(int(HEARTBEAT * 1000))
+    
+    def start():
+        times['start'] = time.time()
+        runner.run(suite)
+    
+    QtCore.QTimer.singleShot(0, start)
+    app.exec_()
+    heartbeat.stop()
+    return {
+        'elapsed': times['done'] - times['start'],
+        'first result': times['first'] - times['start']
+                        if 'first' in times else None,
+        'max stall': max(gaps) if gaps else 0.0,
+        'p99 stall': percentile(gaps, 0.99),
+        'workers peak': workers_peak(runner)
+    }
+
+
+def measure(n, workers, output, failure_rate, headless):
+    """ Run a synthetic suite of n tests and return what was measured. """
+    directory = tempfile.mkdtemp(prefix='qtestudo-bench-')
+    try:
+        modules = write_suite(directory, n, output, failure_rate)
+        start = time.time()
+        suite = load_suite(directory, modules)
+        load = time.time() - start
+        if headless:
+            measures = run_headless(suite, workers)
+        else:
+            try:
+                measures = run_gui(suite, workers)
+            except ImportError:
+                headless = True
+                measures = run_headless(suite, workers)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    measures.update({
+        'tests': n, 'workers': workers, 'output': output,
+        'failure rate': failure_rate, 'gui': not headless, 'load': load,
+        'throughput': n / measures['elapsed'],
+        'gui peak': MemoryMeter().peak()
+    })
+    return measures
+
+
+def measure_fresh(n, options):
+    """ Run measure for n tests in a new interpreter. """
+    args = [sys.executable, os.path.abspath(__file__), '--single', str(n),
+            '-j', str(options.workers), '-o', str(options.output),
+            '-f', str(options.failure_rate)]
+    if options.headless:
+        args.append('--headless')
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+    out = proc.communicate()[0]
+    if proc.returncode:
+        return None
+    return json.loads(out.splitlines()[-1])
+
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-n", "--tests", default="1000,10000,100000",
+                      help="comma-separated sizes of the synthetic suites "
+                           "[default: %default]")
+    parser.add_option("-j", "--workers", type="int", default=2,
+                      help="worker processes [default: %default]")
+    parser.add_option("-o", "--output", type="int", default=0,
+                      help="bytes each test prints [default: %default]")
+    parser.add_option("-f", "--failure-rate", type="float", default=0.01,
+                      help="fraction of the tests that fail "
+                           "[default: %default]")
+    parser.add_option("--headless", action="store_true",
+                      help="measure without Qt")
+    parser.add_option("--json", action="store_true",
+                      help="print the results as JSON, for tracking them")
+    parser.add_option("--single", type="int", help="internal: measure "
+                      "this many tests in this interpreter")
+    options, args = parser.parse_args()
+    
+    if options.single is not None:
+        print json.dumps(measure(
+            options.single, options.workers, options.output,
+            options.failure_rate, options.headless
+        ), sort_keys=True)
+        return
+    
+    results = []
+    for n in [int(size) for size in options.tests.split(',')]:
+        results.append(measure_fresh(n, options))
+    if options.json:
+        print json.dumps(results, sort_keys=True)
+        return
+    for measures in results:
+        if measures is None:
+            print "failed"
+            continue
+        stalls = ''
+        if measures['gui']:
+            stalls = ', stalls max %.1f ms p99 %.1f ms' % (
+                1000 * measures['max stall'], 1000 * measures['p99 stall']
+            )
+        print ("%7d tests: %9.0f tests/s, first result after %.3f s%s, "
+               "peak %.0f MiB GUI, %.0f MiB worker" % (
+                   measures['tests'], measures['throughput'],
+                   measures['first result'] or 0.0, stalls,
+                   measures['gui peak'] / float(1 << 20),
+                   measures['workers peak'] / float(1 << 20)
+               ))
+
+
+if __name__ == '__main__':
+    main()
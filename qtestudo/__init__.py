@@ -0,0 +1,218 @@
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+qtestudo is a graphical user interface to the unittest testing framework.
+Below is a minimal working example for using it::
+
+    from PyQt4 import QtGui
+    import qtestudo
+    import unittest
+    import sys
+
+    class ExampleTestCase(unittest.TestCase):
+        def testDummy(self):
+            self.assertEquals(2+2, 4)
+        def testWillFail(self):
+            self.assertEquals(2*2, 5)
+        def testWillError(self):
+            self.assertEquals(2+'2',5)
+        
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.
+                    loadTestsFromTestCase(ExampleTestCase))
+
+    app = QtGui.QApplication(sys.argv)
+    window = qtestudo.QTestWindow()
+    window.show()
+    display = qtestudo.QTestRunner(window.result)
+    qtestudo.call_init(lambda: display.run(suite))
+    app.exec_()
+
+qtestudo also has function mimicing unittest.main::
+
+    import unittest
+    import qtestudo
+    
+    class SomeTest(unittest.TestCase):
+        def test_foo(self):
+            " This is the description. "
+            print 'You should see this in the UI'
+            self.assertEquals(1, 2)
+    
+    if __name__ == '__main__':
+        qtestudo.main()
+
+Additionally, if you run python -m qtestudo, you will be able to select
+the tests you want to run using File->Open, then open files or whole
+directories and check the modules, TestCases or test methods you want to
+run, or press "Select All" to select all. Typing in the filter box shows
+only the tests whose module.TestCase.method name contains what was typed,
+or matches it as a regular expression; "Select All" and "Select None"
+then only apply to the tests shown. Run them using File->Run afterwards.
+The files are not imported to find the TestCases, only the workers running
+the tests import them.
+
+Please note that if you open new TestCases after having opened others the
+same way before, only the new ones will be run.
+
+Test that appear italics in the list have output which can be viewed in the
+detailed view(double click). For tests with errors or failed tests the
+traceback is shown in the detailed view too.
+Failed tests and tests with errors are grouped by their traceback, with
+the number of tests that failed the same way; expand a group to see them.
+Typing into the search box above the lists shows only the results whose
+name, description or traceback contain all words typed, also while tests
+are running; words shorter than three characters have to match whole
+words.
+Output is captured at the file descriptor level, so what C extensions and
+subprocesses write is included. Of a test writing more than
+Options->Output Limit (output_limit of QTestRunner, OUTPUT_LIMIT by
+default) only the beginning and the end are kept. Double click a test in
+the Running Tests list to watch its output as it is written.
+
+With Options->Profile Tests checked (or profile passed to QTestRunner),
+every test is profiled with cProfile. Its profile is shown in the Profile
+tab of the detailed view, View->Hotspots shows the functions that took the
+most time across all tests, and both can be exported for pstats.
+
+With Options->Measure Memory checked (or measure_memory passed to
+QTestRunner), the peak resident memory of its worker and how much more
+memory the worker keeps after the test are recorded for every test. Tests
+that leave more than LEAK_THRESHOLD bytes behind are marked as leaking,
+and tests that take their worker past Options->Memory Budget (which turns
+measuring on) are marked as over budget.
+
+The results of every run, with their output and tracebacks, are kept in
+HISTORY_DIR. View->History lists the runs; select one to see what changed
+since the run before it (new failures, fixed tests and tests that got
+REGRESSION_FACTOR times slower), or two to compare them with each other.
+Runs are only read once they are looked at, so a long history opens fast.
+
+Tests can be run in several worker processes at once; set the number of
+workers using Options->Workers or pass it to QTestRunner. Tests sharing a
+setUpClass or setUpModule fixture are always run by the same worker.
+
+With File->Watch checked, the selected tests whose modules import a file
+that changed (directly or not) are run again whenever it is saved; their
+new results replace the old ones.
+
+Set Options->Timeout (or pass timeout to QTestRunner) to limit how long a
+single test may run. A worker stuck in a test for longer is killed, the
+test is reported as an error with the output it produced, and a new
+worker takes over the remaining tests.
+
+With Options->Stop After Failures set to N (or maxfail passed to
+QTestRunner), a run is stopped once N tests failed or had errors: the
+workers finish the tests they are running and the rest are not run.
+File->Stop does the same at any time; choosing it again kills the workers
+right away. Either way the results so far are kept and the summary says
+how many tests were not run. Tests that failed the last time they ran are
+run first, so they fail early.
+
+To run tests without a display, e.g. on CI, use qtestudo.cli, which needs
+no Qt and runs them the same way::
+
+    python -m qtestudo.cli -j 4 --junit results.xml --json - tests/
+
+It prints the summary the status bar would show and exits with status 1
+if any test failed.
+With --profile FILE, the tests are profiled and the sum of their
+profiles is saved to FILE for pstats.
+--memory measures memory, --memory-budget MIB sets the memory budget and
+--output-limit BYTES the output limit.
+-x stops the run after the first failure, --maxfail N after N.
+
+To spread tests over other hosts, start a worker agent on each of them,
+with the same source tree and the same QTESTUDO_AUTHKEY as the runner:
+
+    QTESTUDO_AUTHKEY=secret python -m qtestudo.agent -p 7510
+
+Then pass --agents HOST:PORT,... to qtestudo.cli (HOST:PORT*N for N
+workers on one agent), or set Options->Agents in the GUI. The agents take
+tests from the same queue as the local workers; if an agent goes away,
+its tests run elsewhere, including the one it was running, which is
+only reported as an error if that happens to it more than AGENT_RETRIES
+times.
+Only run agents on networks you trust.
+
+Importing qtestudo does not import Qt; the GUI (qtestudo.gui) is only
+loaded once one of its names is used. Everything that does without Qt is
+in qtestudo.core, which is all the workers need.
+"""
+
+
+
+import sys
+import types
+
+# Where the names qtestudo offers are defined. The modules are searched in
+# order; the GUI comes last, so nothing that is found in the others loads
+# Qt.
+_MODULES = ['qtestudo.core', 'qtestudo.gui']
+
+
+class _Package(types.ModuleType):
+    """ Stands in for the qtestudo package in sys.modules and imports the
+    module defining a name when it is asked for. Names are looked up anew
+    every time and set where they are defined, so that settings such as
+    qtestudo.COLORED_PROGRESS read and change those of the module using
+    them. """
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        for module_name in _MODULES:
+            module = sys.modules.get(module_name)
+            if module is None:
+                module = __import__(module_name, fromlist=['*'])
+            try:
+                return getattr(module, name)
+            except AttributeError:
+                continue
+        raise AttributeError(name)
+    
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            types.ModuleType.__setattr__(self, name, value)
+            return
+        found = False
+        for module_name in _MODULES:
+            module = sys.modules.get(module_name)
+            if module is None:
+                if found:
+                    # It takes the new value from the module it imports
+                    # the name from once it is imported.
+                    break
+                module = __import__(module_name, fromlist=['*'])
+            if hasattr(module, name):
+                setattr(module, name, value)
+                found = True
+        if not found:
+            types.ModuleType.__setattr__(self, name, value)
+
+
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(
+    (key, value) for key, value in globals().iteritems()
+    if key in ('__file__', '__path__', '__package__')
+)
+# The functions of _Package use the globals of this module, which must not
+# be torn down once it leaves sys.modules.
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
@@ -0,0 +1,159 @@
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Run tests for a TestRunner on another host::
+    
+    QTESTUDO_AUTHKEY=secret python -m qtestudo.agent -p 7510
+
+Every runner connecting to the agent gets a worker process of its own,
+which runs the chunks of tests it is handed and sends back the results
+just like the runner's local workers do; see the agents of TestRunner. A
+runner that goes away takes its worker with it. Tests are imported by
+their module name, or else from the path they have on the runner's host,
+so the agent has to see the same source tree.
+
+Runners and agents prove to each other that they know the same key, as
+there is no telling what a test run might do; still, only run agents on
+networks you trust.
+"""
+
+
+import os
+import sys
+import select
+import signal
+import marshal
+
+from optparse import OptionParser
+from multiprocessing import Pipe, Process, AuthenticationError
+from multiprocessing import active_children
+from multiprocessing.connection import Listener
+
+from qtestudo.core import AGENT_AUTHKEY, AGENT_PORT, TestRunner, load_spec
+
+
+def wait_status(exitcode):
+    """ Return the status os.waitpid would have given for a process with
+    the exitcode of a multiprocessing Process. """
+    if exitcode < 0:
+        return -exitcode
+    return exitcode << 8
+
+
+def run_worker(specs, control, conn, inherited, profile, output_limit,
+               measure_memory):
+    for other in inherited:
+        other.close()
+    TestRunner.bgProcess([load_spec(spec) for spec in specs], control, conn,
+                         None, profile, output_limit, measure_memory)
+
+
+def serve(conn, inherited=()):
+    """ Run a worker for the runner at the other end of conn, and pass
+    what they send on to each other until either goes away. """
+    for other in inherited:
+        other.close()
+    try:
+        cmd, args = conn.recv()
+    except (EOFError, IOError):
+        return
+    if cmd != 'start':
+        return
+    specs, profile, output_limit, measure_memory = args
+    reader, writer = Pipe(duplex=False)
+    commands, control = Pipe(duplex=False)
+    proc = Process(
+        target=run_worker,
+        args=(specs, commands, writer, [conn, reader, control], profile,
+              output_limit, measure_memory)
+    )
+    proc.start()
+    writer.close()
+    commands.close()
+    try:
+        while True:
+            ready = select.select([conn, reader], [], [])[0]
+            if conn in ready:
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, IOError):
+                    # The runner gave up on us.
+                    break
+                try:
+                    control.send_bytes(data)
+                except (IOError, OSError):
+                    # The worker died, reader tells us how.
+                    pass
+            if reader in ready:
+                try:
+                    data = reader.recv_bytes()
+                except (EOFError, IOError):
+                    proc.join()
+                    if proc.exitcode:
+                        # It died before it could report 'done'.
+                        conn.send_bytes(marshal.dumps(
+                            [('exit', [wait_status(proc.exitcode)])]
+                        ))
+                    break
+                conn.send_bytes(data)
+    except (EOFError, IOError):
+        pass
+    finally:
+        if proc.is_alive():
+            os.kill(proc.pid, signal.SIGKILL)
+            proc.join()
+        for other in (conn, reader, control):
+            other.close()
+
+
+def main(argv=None):
+    parser = OptionParser(
+        usage='%prog [options]',
+        description='Run tests for the qtestudo runners connecting to this '
+                    'host.'
+    )
+    parser.add_option('-b', '--bind', default='',
+                      help='address to listen on [all]')
+    parser.add_option('-p', '--port', type='int', default=AGENT_PORT,
+                      help='port to listen on [%default]')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+    if not AGENT_AUTHKEY:
+        parser.error('set QTESTUDO_AUTHKEY to the key the runners use')
+    
+    listener = Listener((options.bind, options.port),
+                        authkey=AGENT_AUTHKEY)
+    sys.stderr.write('Listening on %s:%d\n' % listener.address)
+    while True:
+        try:
+            conn = listener.accept()
+        except (AuthenticationError, EOFError, IOError), exc:
+            sys.stderr.write('Refused a connection: %s\n' % exc)
+            continue
+        proc = Process(target=serve, args=(conn, [listener]))
+        proc.start()
+        conn.close()
+        # Reap the runs that are over.
+        active_children()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
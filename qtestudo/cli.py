@@ -0,0 +1,369 @@
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Run tests the way the qtestudo GUI does, without Qt, e.g. on CI::
+    
+    python -m qtestudo.cli -j 4 --junit results.xml --json - tests/
+
+Results are streamed as they arrive, one JSON object per line, and to a
+JUnit XML file; neither keeps anything per test in memory. The summary
+printed at the end is the one the GUI shows in its status bar, and the
+exit status is 0 if it says OK and 1 otherwise.
+
+With --profile FILE, every test is profiled; the sum of their profiles is
+saved to FILE for pstats and its hottest functions are printed.
+
+With -x or --maxfail N, the run stops after the first or N failures and
+errors, as soon as the tests running at that time finished; tests that
+failed last time are run first.
+
+With --agents HOST:PORT,..., tests also run on the worker agents (see
+qtestudo.agent) at those addresses, which need to be given the same
+QTESTUDO_AUTHKEY.
+"""
+
+
+import re
+import sys
+import json
+import marshal
+
+from optparse import OptionParser
+from unittest import TestSuite
+
+from qtestudo.core import (
+    WORKERS, GROUP, TEST_PATTERN, INDEX_PATH, TIMINGS_DB, RESULTS_DB,
+    MEMORY_BUDGET, OUTPUT_LIMIT, CACHED, LEAKED, OVER_BUDGET, TestRunner,
+    DiscoveryIndex, discover, summary, add_stats, hottest, dump_stats,
+    memory_flags, agent_addresses
+)
+
+# Characters that may not appear in XML 1.0 documents.
+_INVALID_XML = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# Number of functions printed of the profile of a run.
+HOTTEST = 15
+# Test names as str(TestCase) has them, "method (module.Class)".
+_TEST_NAME = re.compile(r'^(\S+) \((.+)\)$')
+
+
+def escape(data):
+    """ Escape the unicode data for use in XML text or attribute values.
+    """
+    data = _INVALID_XML.sub(u'?', data)
+    return (data.replace(u'&', u'&amp;').replace(u'<', u'&lt;')
+            .replace(u'>', u'&gt;').replace(u'"', u'&quot;'))
+
+
+def text(data):
+    """ Return data, which may be str or unicode, as unicode. """
+    if data is None:
+        return u''
+    if isinstance(data, str):
+        return data.decode('utf-8', 'replace')
+    return data
+
+
+class JSONLinesReporter(object):
+    """ Write a JSON object for every result, and one for the summary, to
+    stream as soon as they are known. """
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write(self, obj):
+        self.stream.write(json.dumps(obj) + '\n')
+        self.stream.flush()
+    
+    def add(self, outcome, name, descr, outp, tb, wall, cpu, flags,
+            growth, peak):
+        self.write({
+            'test': text(name), 'description': text(descr),
+            'outcome': outcome, 'cached': bool(flags & CACHED),
+            'wall': wall, 'cpu': cpu, 'growth': growth, 'peak': peak,
+            'leaked': bool(flags & LEAKED),
+            'over_budget': bool(flags & OVER_BUDGET),
+            'output': text(outp), 'traceback': text(tb)
+        })
+    
+    def close(self, result, elapsed):
+        self.write({
+            'summary': summary(result, elapsed),
+            'tests': result.n_success + result.n_fail + result.n_error,
+            'failures': result.n_fail, 'errors': result.n_error,
+            'cached': result.n_cached, 'leaked': result.n_leaked,
+            'over_budget': result.n_over_budget,
+            'not_run': result.n_not_run, 'elapsed': elapsed,
+            'ok': not (result.n_fail or result.n_error)
+        })
+
+
+class JUnitReporter(object):
+    """ Write results to the JUnit XML file path as they arrive. The counts
+    in the testsuite element are only known at the end; room is left for
+    them, which is filled in once the run is over. """
+    HEADER = ('<testsuite name="qtestudo" tests="%d" failures="%d" '
+              'errors="%d" skipped="0" time="%.3f"')
+    # Enough for counts and seconds of 20 digits each.
+    HEADER_SIZE = len(HEADER % (0, 0, 0, 0)) + 80
+    
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        self.header = self.file.tell()
+        self.writeHeader(0, 0, 0, 0)
+    
+    def writeHeader(self, tests, failures, errors, elapsed):
+        header = self.HEADER % (tests, failures, errors, elapsed)
+        # Whitespace before the closing bracket keeps the size fixed.
+        self.file.write(header.ljust(self.HEADER_SIZE) + '>\n')
+    
+    @staticmethod
+    def xml(data):
+        return escape(text(data)).encode('utf-8')
+    
+    def add(self, outcome, name, descr, outp, tb, wall, cpu, flags,
+            growth, peak):
+        match = _TEST_NAME.match(name)
+        if match is not None:
+            method, classname = match.groups()
+        else:
+            method, classname = name, ''
+        parts = ['<testcase classname="%s" name="%s" time="%.3f">' % (
+            self.xml(classname), self.xml(method), wall
+        )]
+        if outcome != 'success':
+            message = text(tb).strip().split(u'\n')[-1]
+            parts.append('<%s message="%s">%s</%s>' % (
+                outcome, self.xml(message), self.xml(tb), outcome
+            ))
+        if outp:
+            parts.append('<system-out>%s</system-out>' % self.xml(outp))
+        parts.append('</testcase>\n')
+        self.file.write(''.join(parts))
+    
+    def close(self, result, elapsed):
+        self.file.write('</testsuite>\n')
+        self.file.seek(self.header)
+        self.writeHeader(result.n_success + result.n_fail + result.n_error,
+                         result.n_fail, result.n_error, elapsed)
+        self.file.close()
+
+
+class StreamResult(object):
+    """ Result of a headless TestRunner. Only the counts and the sum of
+    the profiles of the tests are kept; every result is handed to the
+    reporters as it arrives. """
+    def __init__(self, reporters=(), memory_budget=MEMORY_BUDGET):
+        self.reporters = list(reporters)
+        self.memory_budget = memory_budget
+        self.amount = 0
+        self.elapsed = None
+        self.first_test = None
+        self.utilization = []
+        self.n_not_run = 0
+        self.enter()
+        self.translate = {
+            'success': self.addSuccess, 'failure': self.addFailure,
+            'error': self.addError, 'start': self.startTest,
+            'profile': self.addProfile, 'done': self.done
+        }
+    
+    def setAmount(self, amount):
+        self.amount = amount
+    
+    def enter(self, update=False):
+        self.profile = {}
+        self.n_started = 0
+        self.n_success = 0
+        self.n_fail = 0
+        self.n_error = 0
+        self.n_cached = 0
+        self.n_leaked = 0
+        self.n_over_budget = 0
+    
+    def beginUpdate(self):
+        pass
+    
+    def endUpdate(self):
+        pass
+    
+    def report(self, outcome, test_name, test_descr, outp, tb, wall, cpu,
+               flags=0, growth=0, peak=0):
+        flags |= memory_flags(growth, peak, self.memory_budget)
+        if flags & LEAKED:
+            self.n_leaked += 1
+        if flags & OVER_BUDGET:
+            self.n_over_budget += 1
+        for reporter in self.reporters:
+            reporter.add(outcome, test_name, test_descr, outp, tb, wall, cpu,
+                         flags, growth, peak)
+    
+    def startTest(self, test_name, test_descr):
+        self.n_started += 1
+    
+    def addSuccess(self, test_name, test_descr, outp, wall=0.0, cpu=0.0,
+                   growth=0, peak=0):
+        self.n_success += 1
+        self.report('success', test_name, test_descr, outp, '', wall, cpu, 0,
+                    growth, peak)
+    
+    def addCached(self, test_name, test_descr, outp, wall=0.0, cpu=0.0):
+        self.n_started += 1
+        self.n_success += 1
+        self.n_cached += 1
+        self.report('success', test_name, test_descr, outp, '', wall, cpu,
+                    CACHED)
+    
+    def addFailure(self, test_name, test_descr, tb, outp, wall=0.0,
+                   cpu=0.0, growth=0, peak=0):
+        self.n_fail += 1
+        self.report('failure', test_name, test_descr, outp, tb, wall, cpu, 0,
+                    growth, peak)
+    
+    def addError(self, test_name, test_descr, tb, outp, wall=0.0, cpu=0.0,
+                 growth=0, peak=0):
+        self.n_error += 1
+        self.report('error', test_name, test_descr, outp, tb, wall, cpu, 0,
+                    growth, peak)
+    
+    def addProfile(self, test_name, stats):
+        add_stats(self.profile, marshal.loads(stats))
+    
+    def wasSuccessful(self):
+        return not (self.n_fail or self.n_error)
+    
+    def done(self, elapsed, first_test=None, utilization=None, not_run=0):
+        self.elapsed = elapsed
+        self.first_test = first_test
+        self.utilization = utilization or []
+        self.n_not_run = not_run
+        for reporter in self.reporters:
+            reporter.close(self, elapsed)
+
+
+def main(argv=None):
+    parser = OptionParser(
+        usage='%prog [options] PATH...',
+        description='Run the tests in the files and directory trees PATH '
+                    'without a GUI.'
+    )
+    parser.add_option('-j', '--workers', type='int', default=WORKERS,
+                      help='number of worker processes [%default]')
+    parser.add_option('-g', '--group', default=GROUP,
+                      choices=['auto', 'class', 'module'],
+                      help='what to keep in one worker [%default]')
+    parser.add_option('-p', '--pattern', default=TEST_PATTERN,
+                      help='files searched for tests in directories '
+                           '[%default]')
+    parser.add_option('-t', '--timeout', type='float', default=None,
+                      help='seconds a test may run before its worker is '
+                           'killed')
+    parser.add_option('-i', '--incremental', action='store_true',
+                      help='skip tests that passed before if nothing they '
+                           'import changed')
+    parser.add_option('--json', metavar='FILE',
+                      help='write results as JSON lines to FILE, - for '
+                           'standard output')
+    parser.add_option('--junit', metavar='FILE',
+                      help='write results as JUnit XML to FILE')
+    parser.add_option('--profile', metavar='FILE',
+                      help='profile every test, save the sum of the '
+                           'profiles to FILE for pstats')
+    parser.add_option('--memory', action='store_true',
+                      help='record how much memory every test uses and flag '
+                           'those leaking memory')
+    parser.add_option('--memory-budget', type='float', metavar='MIB',
+                      help='flag tests during which a worker uses more '
+                           'than MIB MiB of memory; implies --memory')
+    parser.add_option('--output-limit', type='int', metavar='BYTES',
+                      default=OUTPUT_LIMIT,
+                      help='bytes of output kept of every test, 0 for all '
+                           '[%default]')
+    parser.add_option('--agents', metavar='HOST[:PORT][*N],...',
+                      help='also run tests on the agents at these '
+                           'addresses, N workers on those followed by *N')
+    parser.add_option('-x', '--failfast', action='store_const',
+                      dest='maxfail', const=1,
+                      help='stop after the first failure or error')
+    parser.add_option('--maxfail', type='int', metavar='N',
+                      help='stop after N failures and errors')
+    parser.add_option('--no-history', action='store_true',
+                      help='do not record durations or cache results')
+    options, paths = parser.parse_args(argv)
+    if not paths:
+        parser.error('no PATH given')
+    agents = []
+    if options.agents:
+        try:
+            agents = agent_addresses(options.agents)
+        except ValueError, exc:
+            parser.error('invalid --agents: %s' % exc)
+    
+    classes, errors = discover(paths, DiscoveryIndex(INDEX_PATH),
+                               options.pattern)
+    for path, tb in errors:
+        sys.stderr.write('Could not scan %s for tests:\n%s' % (path, tb))
+    tests = []
+    for cls in classes:
+        tests.extend(cls.tests())
+    
+    reporters = []
+    if options.json == '-':
+        reporters.append(JSONLinesReporter(sys.stdout))
+    elif options.json:
+        reporters.append(JSONLinesReporter(open(options.json, 'w')))
+    if options.junit:
+        reporters.append(JUnitReporter(options.junit))
+    
+    budget = MEMORY_BUDGET
+    if options.memory_budget:
+        budget = int(options.memory_budget * (1 << 20))
+    result = StreamResult(reporters, budget)
+    runner = TestRunner(
+        result, options.workers, options.group,
+        timings=None if options.no_history else TIMINGS_DB,
+        incremental=options.incremental,
+        results=None if options.no_history else RESULTS_DB,
+        timeout=options.timeout, profile=bool(options.profile),
+        agents=agents, maxfail=options.maxfail,
+        output_limit=options.output_limit,
+        measure_memory=bool(options.memory or options.memory_budget)
+    )
+    runner.run(TestSuite(tests))
+    for address, reason in runner.unreachable:
+        sys.stderr.write('Could not use the agent at %s:%d: %s\n' % (
+            address + (reason,)
+        ))
+    runner.wait()
+    if options.profile:
+        dump_stats(result.profile, options.profile)
+        sys.stderr.write('%-60s %8s %10s %10s\n' % (
+            'Function', 'Calls', 'Own (s)', 'Cum. (s)'
+        ))
+        for name, calls, own, cumulative in hottest(result.profile,
+                                                    HOTTEST):
+            sys.stderr.write('%-60s %8d %10.4f %10.4f\n' % (
+                name[-60:], calls, own, cumulative
+            ))
+    sys.stderr.write(summary(result, result.elapsed) + '\n')
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,3173 @@
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The part of qtestudo that does without Qt: finding tests, running them in
+worker processes and collecting their results. TestRunner drives a run
+without an event loop, which is what the headless runner in qtestudo.cli
+does; QTestRunner in qtestudo.gui builds on it for the GUI. The workers
+only ever import this module.
+"""
+
+
+import os
+import re
+import sys
+import ast
+import imp
+import mmap
+import time
+import zlib
+import select
+import signal
+import socket
+import struct
+import fnmatch
+import hashlib
+import marshal
+import cPickle
+import sqlite3
+import tempfile
+import threading
+import traceback
+
+from array import array
+from collections import deque
+from multiprocessing import Pipe, Process, AuthenticationError
+from multiprocessing.connection import answer_challenge, deliver_challenge
+from _multiprocessing import Connection
+
+from unittest import TestResult, TestCase, TestSuite
+from unittest import FunctionTestCase
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows.
+    resource = None
+
+# Number of worker processes TestRunner distributes the tests among.
+WORKERS = 1
+# How tests are kept together in one worker. 'auto' keeps the tests of a
+# module together if it defines setUpModule/tearDownModule and those of a
+# class together if it defines setUpClass/tearDownClass, 'class' and
+# 'module' always keep classes respectively modules together.
+GROUP = 'auto'
+
+# Workers send their messages in batches of at most BATCH_SIZE messages,
+# a batch is sent at the latest BATCH_INTERVAL seconds after it was begun.
+BATCH_SIZE = 256
+BATCH_INTERVAL = 0.05
+
+# Seconds TestRunner may spend applying results before it lets the event
+# loop process other events again.
+FRAME_BUDGET = 0.005
+
+# Whether captured output and tracebacks are compressed on disk.
+COMPRESS_BLOBS = True
+
+# Whether TestRunner keeps its workers around between runs (see Zygote).
+WARM = False
+
+# Where qtestudo keeps the data it collects across runs.
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.qtestudo')
+# The database the durations of all tests are recorded in, None to not
+# record them.
+TIMINGS_DB = os.path.join(DATA_DIR, 'timings.sqlite')
+# The index of the test classes found in source files, see DiscoveryIndex.
+INDEX_PATH = os.path.join(DATA_DIR, 'index.pickle')
+# Files searched for tests when a directory is opened.
+TEST_PATTERN = 'test*.py'
+# Whether tests that passed before are skipped as long as neither their
+# module nor any module it imports has changed, see ResultCache.
+INCREMENTAL = False
+# The database the results of incremental runs are kept in.
+RESULTS_DB = os.path.join(DATA_DIR, 'results.sqlite')
+# Where the results of every run are kept, see RunHistory; None to not
+# keep them.
+HISTORY_DIR = os.path.join(DATA_DIR, 'history')
+# A test is slower in one run than in another if it took REGRESSION_FACTOR
+# times as long and at least REGRESSION_MIN seconds more.
+REGRESSION_FACTOR = 2.0
+REGRESSION_MIN = 0.1
+# Number of tests shown in the slowest tests panel.
+SLOWEST = 20
+# Expected duration of a test if nothing is known about any test of the
+# run.
+DEFAULT_ESTIMATE = 0.1
+# Number of chunks of tests a worker is given ahead, so it need not wait
+# for the next one when it finishes.
+PREFETCH = 2
+# Seconds a single test may run before its worker is killed and the test
+# recorded as an error; None for no limit.
+TIMEOUT = None
+# Number of failed tests and errors after which a run is cancelled, see
+# TestRunner.cancel; None to run all tests regardless.
+MAXFAIL = None
+# Bytes of output kept of every test by default, see TestRunner; of longer
+# output, the first and the last half of that are kept. None to keep all of
+# it.
+OUTPUT_LIMIT = 1 << 20
+# Whether workers profile every test with cProfile, see ProfileStats.
+PROFILE = False
+# Whether workers measure how much memory every test uses, which takes a
+# few system calls per test; see BGTestResult.
+MEASURE_MEMORY = False
+# A test is flagged as leaking if its worker uses more than LEAK_THRESHOLD
+# bytes more resident memory after it than before, and as over budget if
+# the worker used more than MEMORY_BUDGET bytes while running it (None for
+# no budget). See memory_flags.
+LEAK_THRESHOLD = 1 << 20
+MEMORY_BUDGET = None
+# Addresses (host, port) of the worker agents (see qtestudo.agent)
+# TestRunner runs tests on besides its own workers, one worker for every
+# time an address is listed. Agents and runners prove to each other that
+# they know AGENT_AUTHKEY; an agent needs one to start.
+AGENTS = []
+AGENT_AUTHKEY = os.environ.get('QTESTUDO_AUTHKEY')
+# Port agents listen on if none is given, and seconds TestRunner tries to
+# reach an agent before it does without it.
+AGENT_PORT = 7510
+AGENT_TIMEOUT = 5.0
+# Times a test is queued again after the agent running it was lost, before
+# that counts as an error of the test.
+AGENT_RETRIES = 2
+
+_SYSTEM_PREFIXES = tuple(set(
+    os.path.abspath(prefix) for prefix in
+    [sys.prefix, sys.exec_prefix, os.path.dirname(os.__file__)]
+))
+
+
+def cpu_time():
+    """ Return the CPU time (user and system) used by this process. """
+    times = os.times()
+    return times[0] + times[1]
+
+
+class MemoryMeter(object):
+    """ Tell the resident set size of this process and the most it ever
+    had, in bytes, cheaply enough to do so around every test. What cannot
+    be told on this platform is 0. Has to be made in the process it
+    measures. """
+    def __init__(self):
+        try:
+            self.statm = os.open('/proc/self/statm', os.O_RDONLY)
+        except (OSError, AttributeError):
+            self.statm = None
+        try:
+            self.page_size = os.sysconf('SC_PAGE_SIZE')
+        except (ValueError, OSError, AttributeError):
+            self.page_size = 4096
+        # ru_maxrss is in kilobytes, except on OS X.
+        self.peak_unit = 1 if sys.platform == 'darwin' else 1024
+    
+    def rss(self):
+        if self.statm is None:
+            return 0
+        os.lseek(self.statm, 0, os.SEEK_SET)
+        return int(os.read(self.statm, 128).split()[1]) * self.page_size
+    
+    def peak(self):
+        if resource is None:
+            return 0
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss *
+                self.peak_unit)
+    
+    def close(self):
+        if self.statm is not None:
+            os.close(self.statm)
+            self.statm = None
+
+
+def flatten_suite(suite):
+    """ Yield the tests contained in suite (and in the suites contained
+    in it) in the order they would be run in. """
+    if isinstance(suite, TestSuite):
+        for test in suite:
+            for sub in flatten_suite(test):
+                yield sub
+    else:
+        yield suite
+
+
+def _overrides(cls, name):
+    """ Return whether cls defines the fixture classmethod name itself
+    instead of inheriting the no-op version from TestCase. """
+    method = getattr(cls, name, None)
+    if method is None:
+        return False
+    return getattr(method, 'im_func', method) is not getattr(
+        getattr(TestCase, name, None), 'im_func', None
+    )
+
+
+def fixture_key(test, group=GROUP):
+    """ Return the key of the fixture group test belongs to. All tests
+    with the same key have to be run by the same worker. """
+    key = getattr(test, 'fixtureKey', None)
+    if key is not None:
+        return key(group)
+    cls = test.__class__
+    mod_name = cls.__module__
+    if group == 'module':
+        return mod_name
+    if group == 'class':
+        return (mod_name, cls.__name__)
+    module = sys.modules.get(mod_name)
+    if (getattr(module, 'setUpModule', None) is not None or
+        getattr(module, 'tearDownModule', None) is not None):
+        return mod_name
+    if _overrides(cls, 'setUpClass') or _overrides(cls, 'tearDownClass'):
+        return (mod_name, cls.__name__)
+    return id(test)
+
+
+def fixture_groups(tests, group=GROUP):
+    """ Split the indices of tests into lists of those belonging to the
+    same fixture group (see fixture_key). The groups are in the order their
+    first test appears in, within a group the original order is kept. """
+    groups = {}
+    order = []
+    for indx, test in enumerate(tests):
+        key = fixture_key(test, group)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(indx)
+    return [groups[group_key] for group_key in order]
+
+
+def failing_first(group, ids, failing):
+    """ Return the indices of the tests of group, whose ids are ids, with
+    those in failing first. The tests of a class are kept together, so its
+    class fixtures still run once; classes with failing tests come first.
+    """
+    # Of every class, whether none of its tests is failing and where it
+    # first appears.
+    classes = {}
+    for test_id in ids:
+        cls = test_id.rpartition('.')[0]
+        rank = classes.setdefault(cls, [True, len(classes)])
+        if test_id in failing:
+            rank[0] = False
+    order = sorted(xrange(len(group)), key=lambda i: (
+        classes[ids[i].rpartition('.')[0]], ids[i] not in failing
+    ))
+    return [group[i] for i in order]
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def group_costs(groups, durations, default=DEFAULT_ESTIMATE):
+    """ Return the expected duration of each group, a list of test ids.
+    Tests missing from the durations mapping are expected to take the
+    median of the known durations, or default if none are known. """
+    estimate = median(
+        durations[test] for group in groups for test in group
+        if test in durations
+    )
+    if estimate is None:
+        estimate = default
+    return [sum(durations.get(test, estimate) for test in group)
+            for group in groups]
+
+
+def test_spec(test):
+    """ Return a (module, path, class, method) tuple that load_spec can
+    recreate test from in another process, or None if test is not a plain
+    TestCase reachable through its module. """
+    if isinstance(test, TestRef):
+        return test.spec()
+    if not isinstance(test, TestCase) or isinstance(test, FunctionTestCase):
+        return None
+    cls = test.__class__
+    module = sys.modules.get(cls.__module__)
+    method = getattr(test, '_testMethodName', None)
+    if method is None or getattr(module, cls.__name__, None) is not cls:
+        return None
+    path = getattr(module, '__file__', None)
+    if path is not None and path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return (cls.__module__, path, cls.__name__, method)
+
+
+def import_module(name, path=None):
+    """ Import the module name. If it is not on sys.path, the directory of
+    its top-level package (as derived from path) is added, if that does
+    not help it is loaded straight from path. """
+    try:
+        return sys.modules[name]
+    except KeyError:
+        pass
+    try:
+        __import__(name)
+    except ImportError:
+        if path is None:
+            raise
+        # Put the directory containing the top-level package on sys.path.
+        root = os.path.dirname(os.path.abspath(path))
+        for _ in xrange(name.count('.')):
+            root = os.path.dirname(root)
+        if root in sys.path:
+            return imp.load_source(name, path)
+        sys.path.insert(0, root)
+        return import_module(name, path)
+    return sys.modules[name]
+
+
+class LoadFailure(TestCase):
+    """ Stands in for a test that could not be loaded in the worker and
+    reports the exception that prevented it as its error. """
+    def __init__(self, name, exc_info):
+        TestCase.__init__(self, 'runTest')
+        self.name = name
+        self.exc_info = exc_info
+    
+    def runTest(self):
+        raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+    
+    def id(self):
+        return self.name
+    
+    def __str__(self):
+        return self.name
+    
+    def shortDescription(self):
+        return None
+
+
+def load_spec(spec):
+    """ Recreate the test described by a test_spec tuple. """
+    mod_name, path, cls_name, method = spec
+    try:
+        cls = getattr(import_module(mod_name, path), cls_name)
+        return cls(method)
+    except Exception:
+        return LoadFailure(
+            '%s (%s.%s)' % (method, mod_name, cls_name), sys.exc_info()
+        )
+
+
+def load_test(test):
+    """ Return the actual test for test, which may be a TestRef. """
+    if isinstance(test, TestRef):
+        return test.load()
+    return test
+
+
+FIXTURES = ('setUpClass', 'tearDownClass', 'setUpModule', 'tearDownModule')
+
+
+def failed_tests(tests, names):
+    """ Return those of tests whose names are in names. Failed class and
+    module fixtures are named like unittest reports them, e.g.
+    "setUpClass (module.Class)", and select all tests of their class or
+    module. """
+    targets = []
+    for name in names:
+        fixture, sep, target = name.partition(' (')
+        if fixture in FIXTURES and target.endswith(')'):
+            targets.append(target[:-1] + '.')
+    targets = tuple(targets)
+    return [test for test in tests if str(test) in names or
+            (targets and test.id().startswith(targets))]
+
+
+class TestRef(object):
+    """ A test known only by the name of its module, class and method, as
+    found by discover. It is only imported when it is loaded, which
+    TestRunner leaves to the worker running it. """
+    def __init__(self, cls, method, descr=None):
+        self.cls = cls
+        self.method = method
+        self.descr = descr
+    
+    def spec(self):
+        cls = self.cls
+        return (cls.module, cls.path, cls.name, self.method)
+    
+    def load(self):
+        return load_spec(self.spec())
+    
+    def fixtureKey(self, group=GROUP):
+        """ See fixture_key. """
+        cls = self.cls
+        if group == 'module' or (group == 'auto' and cls.module_fixture):
+            return cls.module
+        if group == 'class' or (group == 'auto' and cls.class_fixture):
+            return (cls.module, cls.name)
+        return id(self)
+    
+    def id(self):
+        return '%s.%s.%s' % (self.cls.module, self.cls.name, self.method)
+    
+    def __str__(self):
+        return '%s (%s.%s)' % (self.method, self.cls.module, self.cls.name)
+    
+    def shortDescription(self):
+        return self.descr
+    
+    def countTestCases(self):
+        return 1
+    
+    def __call__(self, result):
+        return self.load()(result)
+
+
+class TestClassRef(object):
+    """ A TestCase subclass found by discover. """
+    def __init__(self, module, path, name, lineno, methods,
+                 class_fixture=False, module_fixture=False):
+        self.module = module
+        self.path = path
+        self.name = name
+        self.lineno = lineno
+        # (name, first line of docstring) of the test methods.
+        self.methods = methods
+        self.class_fixture = class_fixture
+        self.module_fixture = module_fixture
+    
+    def tests(self):
+        return [TestRef(self, method, descr) for method, descr in self.methods]
+
+
+def module_name(path):
+    """ Return the dotted name path is imported as, given the packages
+    (directories with an __init__.py) it lies in. """
+    directory, filename = os.path.split(os.path.abspath(path))
+    parts = [os.path.splitext(filename)[0]]
+    if parts == ['__init__']:
+        directory, package = os.path.split(directory)
+        parts = [package]
+    while os.path.isfile(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.append(package)
+    return '.'.join(reversed(parts))
+
+
+def scan_source(source, filename='<unknown>', prefix='test'):
+    """ Find the TestCase subclasses defined in source without executing it.
+    A class counts as a TestCase if one of its bases is named like one
+    (ends with "TestCase") or is such a class defined in the same module.
+    Return whether the module defines setUpModule or tearDownModule and a
+    list of (name, line, has class fixture, [(method, description)])
+    tuples. """
+    tree = ast.parse(source, filename)
+    classes = {}
+    module_fixture = False
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            classes[node.name] = node
+        elif (isinstance(node, ast.FunctionDef) and
+              node.name in ('setUpModule', 'tearDownModule')):
+            module_fixture = True
+    
+    def bases(node):
+        for base in node.bases:
+            if isinstance(base, ast.Name):
+                yield base.id
+            elif isinstance(base, ast.Attribute):
+                yield base.attr
+    
+    def lineage(name, seen=()):
+        """ Return the local classes name is made of, bases first, or None
+        if it is not a TestCase. """
+        node = classes[name]
+        found = False
+        ancestry = []
+        for base in bases(node):
+            if base in classes and base not in seen and base != name:
+                parents = lineage(base, seen + (name, ))
+                if parents is not None:
+                    ancestry.extend(parents)
+                    found = True
+            elif base.endswith('TestCase'):
+                found = True
+        if not found:
+            return None
+        return ancestry + [node]
+    
+    found = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        ancestry = lineage(node.name)
+        if ancestry is None:
+            continue
+        methods = {}
+        class_fixture = False
+        for cls in ancestry:
+            for item in cls.body:
+                if not isinstance(item, ast.FunctionDef):
+                    continue
+                if item.name in ('setUpClass', 'tearDownClass'):
+                    class_fixture = True
+                elif item.name.startswith(prefix):
+                    doc = ast.get_docstring(item)
+                    methods[item.name] = doc and doc.split('\n')[0].strip()
+        if methods:
+            found.append((
+                node.name, node.lineno, class_fixture, sorted(methods.items())
+            ))
+    return module_fixture, found
+
+
+class DiscoveryIndex(object):
+    """ On-disk cache of what scan_source found in each file. An entry is
+    reused as long as the file's mtime and size are unchanged, or, failing
+    that, its contents hash to the same digest. """
+    VERSION = 1
+    
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.files = {}
+        self.dirty = False
+        if path is not None:
+            try:
+                with open(path, 'rb') as fd:
+                    version, files = cPickle.load(fd)
+                if version == self.VERSION:
+                    self.files = files
+            except Exception:
+                # Missing or unreadable; it is only a cache.
+                pass
+    
+    def scan(self, path):
+        """ Return the scan_source result for the file at path. """
+        stat = os.stat(path)
+        cached = self.files.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[3]
+        with open(path, 'rb') as fd:
+            source = fd.read()
+        digest = hashlib.sha1(source).hexdigest()
+        if cached is not None and cached[2] == digest:
+            entry = cached[3]
+        else:
+            entry = scan_source(source, path)
+        self.files[path] = (stat.st_mtime, stat.st_size, digest, entry)
+        self.dirty = True
+        return entry
+    
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp = '%s.%d' % (self.path, os.getpid())
+        with open(tmp, 'wb') as fd:
+            cPickle.dump((self.VERSION, self.files), fd, 2)
+        os.rename(tmp, self.path)
+        self.dirty = False
+
+
+def find_sources(paths, pattern=TEST_PATTERN):
+    """ Yield the files among paths and the files matching pattern in the
+    directory trees among paths, skipping hidden directories. """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield os.path.abspath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(fnmatch.filter(files, pattern)):
+                yield os.path.abspath(os.path.join(root, name))
+
+
+def discover(paths, index=None, pattern=TEST_PATTERN):
+    """ Find the TestCase subclasses in the files and directory trees among
+    paths without importing anything. Return a list of TestClassRef and a
+    list of (path, traceback) for the files that could not be scanned. """
+    if index is None:
+        index = DiscoveryIndex(None)
+    classes = []
+    errors = []
+    for path in find_sources(paths, pattern):
+        try:
+            module_fixture, found = index.scan(path)
+        except Exception:
+            errors.append(
+                (path, ''.join(traceback.format_exception(*sys.exc_info())))
+            )
+            continue
+        if not found:
+            continue
+        module = module_name(path)
+        for name, lineno, class_fixture, methods in found:
+            classes.append(TestClassRef(
+                module, path, name, lineno, methods, class_fixture,
+                module_fixture
+            ))
+    try:
+        index.save()
+    except EnvironmentError:
+        pass
+    return classes, errors
+
+
+def is_project_file(path):
+    """ Whether path lies outside of the standard library and site-packages,
+    i.e. whether it is part of the project under test. """
+    return not os.path.abspath(path).startswith(_SYSTEM_PREFIXES)
+
+
+def test_path(test):
+    """ Return the source file test is defined in, or None if unknown. """
+    if isinstance(test, TestRef):
+        return test.cls.path
+    module = sys.modules.get(test.__class__.__module__)
+    path = getattr(module, '__file__', None)
+    if path is not None and path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return path
+
+
+class ImportGraph(object):
+    """ Which project files each source file imports, directly or not,
+    found statically. Files are only parsed again once their mtime or size
+    changes. Imports that cannot be resolved to a project file (see
+    is_project_file) are ignored, as are dynamic imports. """
+    def __init__(self, roots=None):
+        if roots is None:
+            roots = [os.path.abspath(entry or '.') for entry in sys.path
+                     if is_project_file(entry or '.')]
+        self.roots = roots
+        # Path to (mtime, size, digest, imported paths).
+        self.files = {}
+    
+    def _find(self, parts, roots):
+        """ Return the file of the module parts, and those of the packages
+        it is in, on the first of roots it is found on. """
+        for root in roots:
+            found = []
+            directory = root
+            for indx, part in enumerate(parts):
+                base = os.path.join(directory, part)
+                init = os.path.join(base, '__init__.py')
+                if os.path.isfile(init):
+                    found.append(init)
+                elif indx == len(parts) - 1 and os.path.isfile(base + '.py'):
+                    found.append(base + '.py')
+                else:
+                    break
+                directory = base
+            else:
+                return found
+        return []
+    
+    def scan(self, path):
+        """ Return the digest of path and the project files it imports. """
+        stat = os.stat(path)
+        cached = self.files.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2], cached[3]
+        with open(path, 'rb') as fd:
+            source = fd.read()
+        digest = hashlib.sha1(source).hexdigest()
+        imports = set()
+        name = module_name(path)
+        package = name.split('.')
+        if os.path.basename(path) != '__init__.py':
+            package = package[:-1]
+        root = os.path.dirname(os.path.abspath(path))
+        for _ in xrange(name.count('.')):
+            root = os.path.dirname(root)
+        roots = [root] + self.roots
+        try:
+            tree = ast.parse(source, path)
+        except SyntaxError:
+            tree = ast.Module(body=[])
+        # Importing a module imports the packages it is in.
+        if package:
+            imports.update(self._find(package, [root]))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports.update(self._find(alias.name.split('.'), roots))
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    if node.level - 1 > len(package):
+                        continue
+                    base = package[:len(package) - node.level + 1]
+                    search = [root]
+                else:
+                    base = []
+                    search = roots
+                if node.module:
+                    base = base + node.module.split('.')
+                if base:
+                    imports.update(self._find(base, search))
+                # The imported names may be submodules.
+                for alias in node.names:
+                    imports.update(self._find(base + [alias.name], search))
+        imports.discard(path)
+        imports = sorted(imports)
+        self.files[path] = (stat.st_mtime, stat.st_size, digest, imports)
+        return digest, imports
+    
+    def dependencies(self, path):
+        """ Return the set of project files path imports, directly or
+        indirectly, including path itself. """
+        seen = set()
+        todo = [os.path.abspath(path)]
+        while todo:
+            current = todo.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            try:
+                todo.extend(self.scan(current)[1])
+            except EnvironmentError:
+                pass
+        return seen
+    
+    def digest(self, path):
+        """ Return a digest of the contents of path and all project files it
+        imports; it changes whenever any of them does. """
+        combined = hashlib.sha1()
+        for dep in sorted(self.dependencies(path)):
+            try:
+                digest = self.scan(dep)[0]
+            except EnvironmentError:
+                digest = ''
+            combined.update('%s\0%s\0' % (dep, digest))
+        return combined.hexdigest()
+
+
+class Inotify(object):
+    """ Minimal ctypes binding of Linux' inotify, reporting the files that
+    were written, created, moved or deleted in the directories watched. """
+    MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self):
+        # Only needed for watch mode, and slow to import.
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.get_errno = ctypes.get_errno
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(self.get_errno(), 'inotify_init1 failed')
+        # Watch descriptor to directory.
+        self.watches = {}
+    
+    def watch(self, directory):
+        if directory in self.watches.itervalues():
+            return
+        wd = self.libc.inotify_add_watch(self.fd, directory, self.MASK)
+        if wd < 0:
+            raise OSError(self.get_errno(), 'inotify_add_watch failed')
+        self.watches[wd] = directory
+    
+    def read(self):
+        """ Return the paths events are pending for. """
+        paths = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT.unpack_from(
+                    data, offset
+                )
+                offset += self.EVENT.size
+                name = data[offset:offset + length].rstrip('\0')
+                offset += length
+                if wd in self.watches and name:
+                    paths.add(os.path.join(self.watches[wd], name))
+        return paths
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class ResultCache(object):
+    """ SQLite database of the tests that passed, together with the digest
+    (see ImportGraph.digest) of their inputs at the time. """
+    def __init__(self, path=RESULTS_DB):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.db = sqlite3.connect(path)
+        self.db.text_factory = str
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS passed (
+                test TEXT PRIMARY KEY, digest TEXT, output BLOB,
+                wall REAL, cpu REAL
+            )
+        """)
+    
+    def lookup(self, digests):
+        """ Return (output, wall, cpu) of the tests in digests, a mapping of
+        test id to current input digest, that passed with the same inputs.
+        """
+        found = {}
+        query = "SELECT digest, output, wall, cpu FROM passed WHERE test = ?"
+        for test, digest in digests.iteritems():
+            row = self.db.execute(query, (test, )).fetchone()
+            if row is not None and row[0] == digest:
+                found[test] = (marshal.loads(str(row[1])), row[2], row[3])
+        return found
+    
+    def update(self, passed, failed):
+        """ Remember passed, (test id, digest, output, wall, cpu) tuples, and
+        forget the tests with the ids in failed. """
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO passed VALUES (?, ?, ?, ?, ?)",
+                ((test, digest, buffer(marshal.dumps(output)), wall, cpu)
+                 for test, digest, output, wall, cpu in passed)
+            )
+            self.db.executemany(
+                "DELETE FROM passed WHERE test = ?",
+                ((test, ) for test in failed)
+            )
+    
+    def close(self):
+        self.db.close()
+
+
+SUCCESS, FAILURE, ERROR = range(3)
+# Flags of a result.
+CACHED = 1
+LEAKED = 2
+OVER_BUDGET = 4
+OUTCOMES = {'success': SUCCESS, 'failure': FAILURE, 'error': ERROR}
+
+
+# Object addresses, which differ between otherwise equal tracebacks.
+_ADDRESS = re.compile(r'0x[0-9a-fA-F]+')
+
+
+def traceback_key(tb):
+    """ Return a digest that tracebacks differing only in the addresses of
+    objects share. """
+    if isinstance(tb, unicode):
+        tb = tb.encode('utf-8')
+    return hashlib.sha1(_ADDRESS.sub('0x', tb)).digest()
+
+
+def memory_flags(growth, peak, budget=MEMORY_BUDGET,
+                 threshold=LEAK_THRESHOLD):
+    """ Return the flags of a result whose test left its worker using
+    growth bytes more resident memory and had it use up to peak bytes. """
+    flags = 0
+    if threshold is not None and growth > threshold:
+        flags |= LEAKED
+    if budget is not None and peak > budget:
+        flags |= OVER_BUDGET
+    return flags
+
+
+def megabytes(n):
+    return '%.1f MiB' % (n / float(1 << 20))
+
+
+def test_count(result):
+    total = result.n_success + result.n_fail + result.n_error
+    if result.n_cached:
+        return "%d tests (%d cached)" % (total, result.n_cached)
+    return "%d tests" % total
+
+
+def timing(result, elapsed):
+    text = "%.3f s" % elapsed
+    if result.first_test is not None:
+        text += " (first test after %.3f s)" % result.first_test
+    if len(result.utilization) > 1:
+        # Had the work been spread perfectly, every worker would have
+        # been busy the whole time.
+        ideal = elapsed * sum(result.utilization) / len(result.utilization)
+        text += " [workers busy %s, ideal %.3f s]" % (
+            ', '.join('%d%%' % round(100 * u) for u in result.utilization),
+            ideal
+        )
+    return text
+
+
+def memory_note(result):
+    notes = []
+    if result.n_leaked:
+        notes.append("%d leaked memory" % result.n_leaked)
+    if result.n_over_budget:
+        notes.append("%d over the memory budget" % result.n_over_budget)
+    if notes:
+        return " %s." % ', '.join(notes)
+    return ""
+
+
+def cancel_note(result):
+    if result.n_not_run:
+        return " Cancelled, %d tests not run." % result.n_not_run
+    return ""
+
+
+def summary(result, elapsed):
+    """ Return the line summing up the run of result that took elapsed
+    seconds, e.g. "Ran 3 tests in 0.012 s. 1 failed, 0 errors." """
+    if result.n_fail or result.n_error:
+        return "Ran %s in %s. %d failed, %d errors.%s%s" % (
+            test_count(result), timing(result, elapsed),
+            result.n_fail, result.n_error, cancel_note(result),
+            memory_note(result)
+        )
+    return "Ran %s in %s. OK.%s%s" % (
+        test_count(result), timing(result, elapsed), cancel_note(result),
+        memory_note(result)
+    )
+
+
+class BlobLog(object):
+    """ Append-only temporary file holding captured output and tracebacks.
+    Only the position of each blob is kept in memory; blobs are read back
+    through a memory map when they are asked for. """
+    COMPRESSED = 1
+    UNICODE = 2
+    
+    def __init__(self, compress=COMPRESS_BLOBS):
+        self.compress = compress
+        self.file = tempfile.TemporaryFile(prefix='qtestudo-')
+        self.map = None
+        self.clear()
+    
+    def clear(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.seek(0)
+        self.file.truncate()
+        self.size = 0
+        self.dirty = False
+        self.offsets = array('l')
+        self.lengths = array('i')
+        self.flags = array('b')
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def append(self, data):
+        """ Write data to the log and return its blob number. """
+        flags = 0
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+            flags |= self.UNICODE
+        if self.compress and len(data) > 64:
+            packed = zlib.compress(data, 1)
+            if len(packed) < len(data):
+                data = packed
+                flags |= self.COMPRESSED
+        self.file.seek(self.size)
+        self.file.write(data)
+        self.dirty = True
+        self.offsets.append(self.size)
+        self.lengths.append(len(data))
+        self.flags.append(flags)
+        self.size += len(data)
+        return len(self.offsets) - 1
+    
+    def read(self, blob):
+        offset = self.offsets[blob]
+        end = offset + self.lengths[blob]
+        if self.dirty:
+            self.file.flush()
+            self.dirty = False
+        if self.map is None or len(self.map) < end:
+            # The log has grown since it was mapped.
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(
+                self.file.fileno(), self.size, access=mmap.ACCESS_READ
+            )
+        data = self.map[offset:end]
+        flags = self.flags[blob]
+        if flags & self.COMPRESSED:
+            data = zlib.decompress(data)
+        if flags & self.UNICODE:
+            data = data.decode('utf-8')
+        return data
+
+
+class ResultStore(object):
+    """ Compact storage for the results of a run. Every result is a record
+    spread over parallel arrays; descriptions, outputs and tracebacks are
+    only stored if there are any, the latter two in a BlobLog on disk.
+    Every distinct traceback is stored once; its blob number identifies
+    the cluster of results failing the same way (see tracebackId). """
+    def __init__(self):
+        self.log = BlobLog()
+        self.clear()
+    
+    def clear(self):
+        self.names = []
+        self.outcomes = array('b')
+        self.descrs = array('i')
+        self.outputs = array('i')
+        self.tracebacks = array('i')
+        self.walls = array('f')
+        self.cpus = array('f')
+        self.growths = array('l')
+        self.peaks = array('l')
+        self.flags = array('b')
+        # Descriptions tend to repeat (or be missing), so they are shared.
+        self.descr_ids = {}
+        self.descr_list = []
+        # Blob number of every traceback stored, by traceback_key; of
+        # tracebacks differing only in addresses the first one is kept.
+        self.traceback_blobs = {}
+        self.log.clear()
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def _blob(self, data):
+        if not data:
+            return -1
+        return self.log.append(data)
+    
+    def add(self, outcome, name, descr, outp, tb, wall=0.0, cpu=0.0,
+            flags=0, growth=0, peak=0):
+        """ Store a result and return the number of its record. """
+        if descr:
+            try:
+                descr_id = self.descr_ids[descr]
+            except KeyError:
+                descr_id = self.descr_ids[descr] = len(self.descr_list)
+                self.descr_list.append(descr)
+        else:
+            descr_id = -1
+        self.names.append(name)
+        self.outcomes.append(outcome)
+        self.descrs.append(descr_id)
+        self.outputs.append(self._blob(outp))
+        if tb:
+            key = traceback_key(tb)
+            try:
+                blob = self.traceback_blobs[key]
+            except KeyError:
+                blob = self.traceback_blobs[key] = self.log.append(tb)
+        else:
+            blob = -1
+        self.tracebacks.append(blob)
+        self.walls.append(wall)
+        self.cpus.append(cpu)
+        self.growths.append(growth)
+        self.peaks.append(peak)
+        self.flags.append(flags)
+        return len(self.names) - 1
+    
+    def index(self):
+        """ Return the latest record of every test name. """
+        return dict((name, record) for record, name in enumerate(self.names))
+    
+    def name(self, record):
+        return self.names[record]
+    
+    def descr(self, record):
+        descr_id = self.descrs[record]
+        if descr_id == -1:
+            return ''
+        return self.descr_list[descr_id]
+    
+    def outcome(self, record):
+        return self.outcomes[record]
+    
+    def wall(self, record):
+        return self.walls[record]
+    
+    def cpu(self, record):
+        return self.cpus[record]
+    
+    def growth(self, record):
+        return self.growths[record]
+    
+    def peak(self, record):
+        return self.peaks[record]
+    
+    def isCached(self, record):
+        return bool(self.flags[record] & CACHED)
+    
+    def hasFlag(self, record, flag):
+        return bool(self.flags[record] & flag)
+    
+    def names_with(self, outcomes):
+        """ Return the set of names of the results with one of outcomes. """
+        return set(
+            self.names[record] for record in xrange(len(self.names))
+            if self.outcomes[record] in outcomes
+        )
+    
+    def hasOutput(self, record):
+        return self.outputs[record] != -1
+    
+    def output(self, record):
+        blob = self.outputs[record]
+        if blob == -1:
+            return ''
+        return self.log.read(blob)
+    
+    def traceback(self, record):
+        blob = self.tracebacks[record]
+        if blob == -1:
+            return ''
+        return self.log.read(blob)
+    
+    def tracebackId(self, record):
+        """ Return the number shared by the records with the same traceback
+        as record; -1 if it has none. """
+        return self.tracebacks[record]
+    
+    def readTraceback(self, traceback_id):
+        return self.log.read(traceback_id)
+    
+    def outputId(self, record):
+        """ Return the number of the output of record, -1 if it has none;
+        see readOutput. """
+        return self.outputs[record]
+    
+    def readOutput(self, output_id):
+        return self.log.read(output_id)
+    
+    def details(self, record):
+        """ Return the arguments for a QTestView of record. """
+        return (self.name(record), self.descr(record),
+                self.output(record), self.traceback(record))
+
+
+# Words of the names and descriptions of tests, see SearchIndex.
+_WORD = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def search_text(text):
+    """ Return text as lower case unicode, for searching. """
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    return text.lower()
+
+
+def trigrams(text):
+    return set(text[i:i + 3] for i in xrange(len(text) - 2))
+
+
+def short_words(text):
+    """ Return the set of words in text too short to have a trigram. """
+    return set(word for word in _WORD.findall(text) if len(word) < 3)
+
+
+class SearchIndex(object):
+    """ Index of the records of a ResultStore for finding them by their
+    name, description and traceback, kept up to date as records are added.
+    
+    Names and descriptions are split at whitespace into tokens, which
+    repeat a lot (module and class names, words of descriptions); the
+    records having every token are kept, and every distinct token and
+    traceback is indexed by the trigrams (three consecutive characters) in
+    it. A word searched for is only looked for in the tokens and tracebacks
+    sharing its rarest trigram, so searching takes time in the order of
+    the results found rather than of the results stored. Words shorter than
+    three characters only match whole words.
+    
+    Most tokens, like the names of test methods, occur once, so every token
+    is numbered and all postings are arrays of those numbers; the text of a
+    record is not kept but made again from the store when it is needed. """
+    def __init__(self, store):
+        self.store = store
+        self.clear()
+    
+    def clear(self):
+        # Number of every token, the tokens by number, the first record
+        # having each token and the further ones of those having more.
+        self.tokens = {}
+        self.token_list = []
+        self.token_first = array('i')
+        self.token_more = {}
+        # Token numbers by trigram and by short word in the tokens.
+        self.token_grams = {}
+        self.token_words = {}
+        # Traceback ids by trigram and by short word, and the records by
+        # traceback id.
+        self.traceback_grams = {}
+        self.traceback_words = {}
+        self.traceback_records = {}
+        # Records replaced by later ones, which are no longer found.
+        self.discarded = set()
+    
+    def add(self, record, tb=''):
+        """ Index record, which has to be the next one of the store, and its
+        traceback tb. """
+        tokens = self.tokens
+        for token in set(self.text(record).split()):
+            try:
+                token_id = tokens[token]
+            except KeyError:
+                self.addToken(token, record)
+                continue
+            try:
+                self.token_more[token_id].append(record)
+            except KeyError:
+                self.token_more[token_id] = array('i', [record])
+        traceback_id = self.store.tracebackId(record)
+        if traceback_id == -1:
+            return
+        records = self.traceback_records.get(traceback_id)
+        if records is None:
+            records = self.traceback_records[traceback_id] = array('i')
+            tb = search_text(tb)
+            for gram in trigrams(tb):
+                self.traceback_grams.setdefault(gram, array('i')).append(
+                    traceback_id
+                )
+            for word in short_words(tb):
+                self.traceback_words.setdefault(word, array('i')).append(
+                    traceback_id
+                )
+        records.append(record)
+    
+    def addToken(self, token, record):
+        try:
+            # Plain strings take a fourth of the memory and compare equal.
+            token = str(token)
+        except UnicodeError:
+            pass
+        token_id = self.tokens[token] = len(self.token_list)
+        self.token_list.append(token)
+        self.token_first.append(record)
+        token_grams = self.token_grams
+        for gram in trigrams(token):
+            try:
+                token_grams[gram].append(token_id)
+            except KeyError:
+                token_grams[gram] = array('i', [token_id])
+        for word in short_words(token):
+            self.token_words.setdefault(word, array('i')).append(token_id)
+    
+    def tokenRecords(self, token_id):
+        records = [self.token_first[token_id]]
+        records.extend(self.token_more.get(token_id, ()))
+        return records
+    
+    def discard(self, record):
+        self.discarded.add(record)
+    
+    def text(self, record):
+        """ Return the name and description of record, in lower case. """
+        store = self.store
+        text = search_text(store.name(record))
+        descr = store.descr(record)
+        if descr:
+            text = u'%s\n%s' % (text, search_text(descr))
+        return text
+    
+    def traceback(self, traceback_id):
+        return search_text(self.store.readTraceback(traceback_id))
+    
+    def find(self, word):
+        """ Return the set of records containing word, which is in lower
+        case. """
+        found = set()
+        if len(word) < 3:
+            for token_id in self.token_words.get(word, ()):
+                found.update(self.tokenRecords(token_id))
+            for traceback_id in self.traceback_words.get(word, ()):
+                found.update(self.traceback_records[traceback_id])
+            return found
+        grams = trigrams(word)
+        postings = [self.token_grams.get(gram, ()) for gram in grams]
+        token_list = self.token_list
+        for token_id in min(postings, key=len):
+            if word in token_list[token_id]:
+                found.update(self.tokenRecords(token_id))
+        postings = [self.traceback_grams.get(gram, ()) for gram in grams]
+        for traceback_id in min(postings, key=len):
+            if word in self.traceback(traceback_id):
+                found.update(self.traceback_records[traceback_id])
+        return found
+    
+    def search(self, query):
+        """ Return the set of records containing all words of query. """
+        found = None
+        for word in sorted(set(search_text(query).split()), key=len,
+                           reverse=True):
+            records = self.find(word)
+            if found is None:
+                found = records
+            else:
+                found &= records
+            if not found:
+                break
+        if found is None:
+            return set()
+        return found - self.discarded
+    
+    def matches(self, record, query):
+        """ Return whether record contains all words of query. """
+        key = self.text(record)
+        traceback = None
+        for word in search_text(query).split():
+            if len(word) < 3 and word in _WORD.findall(key):
+                continue
+            if len(word) >= 3 and word in key:
+                continue
+            if traceback is None:
+                traceback_id = self.store.tracebackId(record)
+                traceback = ('' if traceback_id == -1
+                             else self.traceback(traceback_id))
+            if len(word) < 3:
+                if word not in _WORD.findall(traceback):
+                    return False
+            elif word not in traceback:
+                return False
+        return True
+
+
+def add_stats(total, stats):
+    """ Add the profile stats (a dict as in pstats.Stats.stats) to total. """
+    for func, (cc, nc, tt, ct, callers) in stats.iteritems():
+        if func not in total:
+            total[func] = (cc, nc, tt, ct, dict(callers))
+            continue
+        t_cc, t_nc, t_tt, t_ct, t_callers = total[func]
+        for caller, counts in callers.iteritems():
+            if caller in t_callers:
+                counts = tuple(a + b for a, b in zip(t_callers[caller],
+                                                     counts))
+            t_callers[caller] = counts
+        total[func] = (t_cc + cc, t_nc + nc, t_tt + tt, t_ct + ct, t_callers)
+
+
+def func_name(func):
+    """ Return the label pstats uses for the function func of a profile. """
+    filename, line, name = func
+    if filename == '~' and line == 0:
+        # A builtin.
+        if name.startswith('<') and name.endswith('>'):
+            return '{%s}' % name[1:-1]
+        return name
+    return '%s:%d(%s)' % (filename, line, name)
+
+
+def hottest(stats, n=None):
+    """ Return (function, calls, own time, cumulative time) of the n
+    functions of the profile stats that took the most time of their own,
+    most first; of all of them if n is None. """
+    rows = [(func_name(func), nc, tt, ct)
+            for func, (cc, nc, tt, ct, callers) in stats.iteritems()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows if n is None else rows[:n]
+
+
+def dump_stats(stats, path):
+    """ Save the profile stats to path, to be loaded by pstats.Stats. """
+    with open(path, 'wb') as fd:
+        marshal.dump(stats, fd)
+
+
+class ProfileStats(object):
+    """ The profiles of the tests of a run, as sent by the workers in
+    profiling mode, and their sum. The profile of each test is kept in a
+    BlobLog and read back when it is asked for. """
+    def __init__(self):
+        self.log = BlobLog()
+        self.blobs = {}
+        # Sum of the profiles of all tests added since the last clear.
+        self.total = {}
+    
+    def __len__(self):
+        return len(self.blobs)
+    
+    def __contains__(self, test_name):
+        return test_name in self.blobs
+    
+    def clear(self):
+        self.log.clear()
+        self.blobs = {}
+        self.total = {}
+    
+    def add(self, test_name, data):
+        """ Add the profile of test_name, marshalled pstats stats. """
+        self.blobs[test_name] = self.log.append(data)
+        add_stats(self.total, marshal.loads(data))
+    
+    def get(self, test_name):
+        """ Return the profile stats of test_name, or None. """
+        blob = self.blobs.get(test_name)
+        if blob is None:
+            return None
+        return marshal.loads(self.log.read(blob))
+
+
+class BatchWriter(object):
+    """ Coalesce the messages of a worker into batches that are sent as a
+    whole. A batch is sent once it holds size messages, or interval seconds
+    after its first message was written, whichever comes first. """
+    def __init__(self, conn, size=BATCH_SIZE, interval=BATCH_INTERVAL):
+        self.conn = conn
+        self.size = size
+        self.interval = interval
+        
+        self.batch = []
+        self.started = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.closed = False
+        
+        self.thread = threading.Thread(target=self.flusher)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def send(self, key, args):
+        with self.lock:
+            self.batch.append((key, args))
+            if len(self.batch) >= self.size:
+                self._flush()
+            elif len(self.batch) == 1:
+                self.started = time.time()
+                self.wakeup.notify()
+    
+    def flush(self):
+        with self.lock:
+            self._flush()
+    
+    def _flush(self):
+        if self.batch:
+            # marshal is a lot cheaper than pickle, and all we ever send
+            # are strings, numbers and lists thereof.
+            self.conn.send_bytes(marshal.dumps(self.batch))
+            self.batch = []
+    
+    def flusher(self):
+        """ Send batches that have not filled up in time. """
+        with self.lock:
+            while not self.closed:
+                if not self.batch:
+                    self.wakeup.wait()
+                    continue
+                remaining = self.started + self.interval - time.time()
+                if remaining > 0:
+                    self.wakeup.wait(remaining)
+                else:
+                    self._flush()
+    
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.closed = True
+            self.wakeup.notify()
+        self.thread.join()
+        self.conn.close()
+
+
+def read_fd(fd, offset, size):
+    """ Read size bytes at offset from the file descriptor fd, fewer if the
+    file ends before. """
+    os.lseek(fd, offset, os.SEEK_SET)
+    data = []
+    while size > 0:
+        chunk = os.read(fd, size)
+        if not chunk:
+            break
+        data.append(chunk)
+        size -= len(chunk)
+    return ''.join(data)
+
+
+def read_capped(fd, limit=OUTPUT_LIMIT, size=None):
+    """ Read the file descriptor fd, whose size is looked up unless given.
+    If it has more than limit bytes, only the first and last limit / 2 of
+    them are returned. Unlike reads through a file object, this never
+    returns data buffered before the file was truncated. """
+    if size is None:
+        size = os.fstat(fd).st_size
+    if limit is None or size <= limit:
+        return read_fd(fd, 0, size)
+    head = read_fd(fd, 0, limit // 2)
+    tail = read_fd(fd, size - limit // 2, limit // 2)
+    return '%s\n[... %d bytes omitted ...]\n%s' % (
+        head, size - len(head) - len(tail), tail
+    )
+
+
+class FDStream(object):
+    """ Replacement for sys.stdout and sys.stderr that writes straight to a
+    file descriptor, so its output is in order with what C extensions and
+    subprocesses write there. Unicode is written as UTF-8. """
+    encoding = 'utf-8'
+    softspace = 0
+    
+    def __init__(self, fd):
+        self.fd = fd
+    
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode(self.encoding)
+        while data:
+            data = data[os.write(self.fd, data):]
+    
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+    
+    def flush(self):
+        pass
+    
+    def fileno(self):
+        return self.fd
+    
+    def isatty(self):
+        return False
+
+
+class OutputCapture(object):
+    """ Capture everything written to the stdout and stderr file
+    descriptors of the process in the file path, which the GUI can read
+    while a test is still running and after its worker was killed. """
+    def __init__(self, path, limit=OUTPUT_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.file = open(path, 'w+b')
+        # Reading through a descriptor of its own leaves the position
+        # writes go to alone.
+        self.reader = os.open(path, os.O_RDONLY)
+        # Size of the file at the last read, which is all clear needs to
+        # know to skip the truncation; None once it may have changed.
+        self.size = None
+        self.saved = None
+    
+    def start(self):
+        """ Redirect stdout and stderr to the file. """
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (AttributeError, ValueError, IOError):
+                pass
+        self.saved = (os.dup(1), os.dup(2), sys.stdout, sys.stderr)
+        os.dup2(self.file.fileno(), 1)
+        os.dup2(self.file.fileno(), 2)
+        sys.stdout = FDStream(1)
+        sys.stderr = FDStream(2)
+    
+    def clear(self):
+        """ Forget what was captured so far. Right after a read that found
+        nothing, this costs nothing; what was written in between, e.g. by
+        class fixtures, is then kept for the next read. """
+        size, self.size = self.size, None
+        if size == 0:
+            return
+        fd = self.file.fileno()
+        os.ftruncate(fd, 0)
+        # The position is shared by all descriptors of the file.
+        os.lseek(fd, 0, os.SEEK_SET)
+    
+    def read(self):
+        """ Return what was captured since the last clear. """
+        self.size = os.fstat(self.reader).st_size
+        if not self.size:
+            return ''
+        return read_capped(self.reader, self.limit, self.size)
+    
+    def stop(self):
+        """ Restore stdout and stderr. """
+        out, err, sys.stdout, sys.stderr = self.saved
+        os.dup2(out, 1)
+        os.dup2(err, 2)
+        os.close(out)
+        os.close(err)
+        os.close(self.reader)
+        self.file.close()
+
+
+class BGTestResult(TestResult):
+    """ Report the results of a worker to the TestRunner. Tests are only
+    named the first time they are seen; all further messages refer to them
+    by the id assigned in that 'test' message. Every outcome carries the
+    wall clock and CPU time the test took and, with memory, how much more
+    resident memory the worker uses after it than before and the most the
+    worker used while it ran, as far as can be told (see measure); both
+    are 0 without. Tracebacks are
+    sent once in a 'traceback' message and referred to by its id; those
+    differing only in addresses count as the same (see traceback_key).
+    With profile, every outcome is followed by the cProfile stats of the
+    test, marshalled.
+    
+    After every test, the commands that arrived through control are read
+    into commands; a 'stop' command sets shouldStop instead, which makes
+    the suite stop before its next test (see TestRunner.cancel). """
+    def __init__(self, writer, capture, profile=False, control=None,
+                 memory=False):
+        TestResult.__init__(self)
+        self.writer = writer
+        self.capture = capture
+        self.control = control
+        self.commands = deque()
+        self.ids = {}
+        # Id of every traceback sent, by traceback_key.
+        self.tracebacks = {}
+        self.started = None
+        self.meter = MemoryMeter() if memory else None
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+    
+    def testId(self, test):
+        test_name = str(test)
+        try:
+            return self.ids[test_name]
+        except KeyError:
+            test_id = self.ids[test_name] = len(self.ids)
+            self.writer.send(
+                "test",
+                [test_id, test_name, test.shortDescription(), test.id()]
+            )
+            return test_id
+    
+    def tracebackId(self, err):
+        tb = ''.join(traceback.format_exception(*err))
+        key = traceback_key(tb)
+        try:
+            return self.tracebacks[key]
+        except KeyError:
+            tb_id = self.tracebacks[key] = len(self.tracebacks)
+            self.writer.send("traceback", [tb_id, tb])
+            return tb_id
+    
+    def startTest(self, test):
+        TestResult.startTest(self, test)
+        self.clearOutput()
+        self.writer.send("start", [self.testId(test)])
+        if self.meter is None:
+            self.started = (time.time(), cpu_time(), 0, 0)
+        else:
+            self.started = (time.time(), cpu_time(), self.meter.rss(),
+                            self.meter.peak())
+        if self.profiler is not None:
+            self.profiler.enable()
+    
+    def stopTest(self, test):
+        TestResult.stopTest(self, test)
+        if self.profiler is not None:
+            self.profiler.create_stats()
+            self.writer.send(
+                "profile",
+                [self.testId(test), marshal.dumps(self.profiler.stats)]
+            )
+            self.profiler.clear()
+        self.readCommands()
+    
+    def readCommands(self):
+        control = self.control
+        try:
+            while control is not None and control.poll():
+                command = control.recv()
+                if command[0] == 'stop':
+                    self.shouldStop = True
+                else:
+                    self.commands.append(command)
+        except EOFError:
+            # The runner is gone, nobody is waiting for the rest.
+            self.control = None
+            self.shouldStop = True
+    
+    def measure(self):
+        """ Return the wall clock and CPU time since the current test was
+        started, the change of resident memory since then and the most
+        resident memory used in between; zero for results outside of a
+        test, e.g. failing class fixtures. Unless the test raised the peak
+        of the worker, the most it used is only known to be at least the
+        larger of the memory before and after it. """
+        if self.started is None:
+            return [0.0, 0.0, 0, 0]
+        if self.profiler is not None:
+            self.profiler.disable()
+        wall, cpu, rss, peak = self.started
+        self.started = None
+        measures = [time.time() - wall, cpu_time() - cpu]
+        if self.meter is None:
+            return measures + [0, 0]
+        new_rss, new_peak = self.meter.rss(), self.meter.peak()
+        if new_peak <= peak:
+            new_peak = max(rss, new_rss)
+        return measures + [new_rss - rss, new_peak]
+    
+    def addSuccess(self, test):
+        measures = self.measure()
+        self.writer.send(
+            "success", [self.testId(test), self.getOutput()] + measures
+        )
+    
+    def addError(self, test, err):
+        measures = self.measure()
+        tb_id = self.tracebackId(err)
+        self.writer.send(
+            "error", [self.testId(test), tb_id, self.getOutput()] + measures
+        )
+    
+    def addFailure(self, test, err):
+        measures = self.measure()
+        tb_id = self.tracebackId(err)
+        self.writer.send(
+            "failure", [self.testId(test), tb_id, self.getOutput()] + measures
+        )
+    
+    def getOutput(self):
+        return self.capture.read()
+    
+    def clearOutput(self):
+        self.capture.clear()
+
+
+class TimingDatabase(object):
+    """ SQLite database of the durations of every test of every run,
+    keyed by the id of the test. """
+    def __init__(self, path=TIMINGS_DB):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, started REAL, elapsed REAL
+            );
+            CREATE TABLE IF NOT EXISTS durations (
+                run INTEGER, test TEXT, outcome INTEGER, wall REAL, cpu REAL
+            );
+            CREATE INDEX IF NOT EXISTS durations_test
+                ON durations (test, run);
+            CREATE TABLE IF NOT EXISTS estimates (
+                test TEXT PRIMARY KEY, wall REAL
+            );
+            CREATE TABLE IF NOT EXISTS failing (
+                test TEXT PRIMARY KEY
+            );
+        """)
+    
+    def record(self, started, elapsed, results):
+        """ Store a run; results are (test id, outcome, wall, cpu) tuples.
+        """
+        with self.db:
+            run = self.db.execute(
+                "INSERT INTO runs (started, elapsed) VALUES (?, ?)",
+                (started, elapsed)
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO durations VALUES (?, ?, ?, ?, ?)",
+                ((run, ) + tuple(row) for row in results)
+            )
+            # The estimate is an exponential moving average over the runs
+            # the test took part in.
+            self.db.executemany(
+                "INSERT OR IGNORE INTO estimates VALUES (?, ?)",
+                ((test, wall) for test, outcome, wall, cpu in results)
+            )
+            self.db.executemany(
+                "UPDATE estimates SET wall = (wall + ?) / 2 WHERE test = ?",
+                ((wall, test) for test, outcome, wall, cpu in results)
+            )
+            self.db.executemany(
+                "DELETE FROM failing WHERE test = ?",
+                ((test, ) for test, outcome, wall, cpu in results
+                 if outcome == SUCCESS)
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO failing VALUES (?)",
+                ((test, ) for test, outcome, wall, cpu in results
+                 if outcome != SUCCESS)
+            )
+        return run
+    
+    def estimates(self):
+        """ Return a dictionary mapping test ids to the wall clock time they
+        are expected to take. """
+        return dict(self.db.execute("SELECT test, wall FROM estimates"))
+    
+    def failing(self):
+        """ Return the set of the ids of the tests that did not pass the
+        last time they ran. """
+        return set(test for test, in self.db.execute(
+            "SELECT test FROM failing"
+        ))
+    
+    def history(self, test):
+        """ Return (run start, outcome, wall, cpu) of every recorded run of
+        test, oldest first. """
+        return self.db.execute(
+            "SELECT runs.started, outcome, wall, cpu FROM durations "
+            "JOIN runs ON runs.id = durations.run WHERE test = ? "
+            "ORDER BY run", (test, )
+        ).fetchall()
+    
+    def slowest(self, n=SLOWEST, runs=10):
+        """ Return the n tests with the highest mean wall clock time over
+        the last runs runs as (test id, mean wall, mean cpu) tuples. """
+        return self.db.execute(
+            "SELECT test, AVG(wall) AS mean, AVG(cpu) FROM durations "
+            "WHERE run > (SELECT IFNULL(MAX(id), 0) FROM runs) - ? "
+            "GROUP BY test ORDER BY mean DESC LIMIT ?", (runs, n)
+        ).fetchall()
+    
+    def close(self):
+        self.db.close()
+
+
+# Kinds of changes between two runs, see diff_runs.
+NEW_FAILURE, FIXED, SLOWER = range(3)
+
+
+class RunHistory(object):
+    """ Append-only history of runs, kept in directory: the outcome, flags,
+    durations, output and traceback of every test of every run.
+    
+    The results of a run are stored together in results.log as compressed
+    arrays, with test names and blobs (output and tracebacks) replaced by
+    numbers. Every distinct blob is stored once, however many tests or runs
+    produced it, in blobs.log. history.sqlite has the runs, test names and
+    blobs and where they are; nothing is read before it is asked for, so
+    opening a long history is cheap and a run is only loaded to be looked
+    at (see HistoryRun). """
+    # Arrays a run is stored as, and their typecodes.
+    COLUMNS = [('names', 'i'), ('outcomes', 'b'), ('flags', 'b'),
+               ('walls', 'f'), ('cpus', 'f'), ('outputs', 'i'),
+               ('tracebacks', 'i')]
+    
+    def __init__(self, directory=HISTORY_DIR):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.db = sqlite3.connect(os.path.join(directory, 'history.sqlite'))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, started REAL, elapsed REAL,
+                tests INTEGER, failures INTEGER, errors INTEGER,
+                offset INTEGER, length INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS names (
+                id INTEGER PRIMARY KEY, test TEXT UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                id INTEGER PRIMARY KEY, digest BLOB UNIQUE, offset INTEGER,
+                length INTEGER, flags INTEGER
+            );
+        """)
+        self.results = open(os.path.join(directory, 'results.log'), 'ab+')
+        self.blobs = open(os.path.join(directory, 'blobs.log'), 'ab+')
+        # Number of every test name, once one is recorded.
+        self.name_ids = None
+    
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    
+    @staticmethod
+    def append(log, data):
+        """ Write data to the end of the file log; return where it went. """
+        log.seek(0, 2)
+        offset = log.tell()
+        log.write(data)
+        log.flush()
+        return offset
+    
+    @staticmethod
+    def read(log, offset, length):
+        log.seek(offset)
+        return log.read(length)
+    
+    def nameIds(self, names):
+        """ Return an array of the numbers of names, numbering new ones. """
+        if self.name_ids is None:
+            self.name_ids = dict(
+                (test, name_id) for name_id, test in
+                self.db.execute("SELECT id, test FROM names")
+            )
+        ids = array('i')
+        for name in names:
+            name_id = self.name_ids.get(name)
+            if name_id is None:
+                name_id = self.name_ids[name] = self.db.execute(
+                    "INSERT INTO names (test) VALUES (?)", (name, )
+                ).lastrowid
+            ids.append(name_id)
+        return ids
+    
+    def addBlob(self, data):
+        """ Store data unless it is stored already; return its number. """
+        flags = 0
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+            flags |= BlobLog.UNICODE
+        digest = buffer(hashlib.sha1(data).digest())
+        row = self.db.execute("SELECT id FROM blobs WHERE digest = ?",
+                              (digest, )).fetchone()
+        if row is not None:
+            return row[0]
+        if len(data) > 64:
+            packed = zlib.compress(data, 1)
+            if len(packed) < len(data):
+                data = packed
+                flags |= BlobLog.COMPRESSED
+        offset = self.append(self.blobs, data)
+        return self.db.execute(
+            "INSERT INTO blobs (digest, offset, length, flags) "
+            "VALUES (?, ?, ?, ?)", (digest, offset, len(data), flags)
+        ).lastrowid
+    
+    def readBlob(self, blob):
+        if blob == -1:
+            return ''
+        offset, length, flags = self.db.execute(
+            "SELECT offset, length, flags FROM blobs WHERE id = ?", (blob, )
+        ).fetchone()
+        data = self.read(self.blobs, offset, length)
+        if flags & BlobLog.COMPRESSED:
+            data = zlib.decompress(data)
+        if flags & BlobLog.UNICODE:
+            data = data.decode('utf-8')
+        return data
+    
+    def record(self, store, records, started, elapsed):
+        """ Add a run, which started at started and took elapsed seconds,
+        with the records of store (a ResultStore). Return its number. """
+        # Blob numbers in store to those here, as store has already merged
+        # equal tracebacks.
+        blobs = {-1: -1}
+        
+        def blob(blob_id, read):
+            if blob_id not in blobs:
+                blobs[blob_id] = self.addBlob(read(blob_id))
+            return blobs[blob_id]
+        
+        columns = dict((name, array(code)) for name, code in self.COLUMNS)
+        outcomes = columns['outcomes']
+        try:
+            with self.db:
+                columns['names'] = self.nameIds(
+                    store.name(record) for record in records
+                )
+                for record in records:
+                    outcomes.append(store.outcome(record))
+                    columns['flags'].append(store.flags[record])
+                    columns['walls'].append(store.wall(record))
+                    columns['cpus'].append(store.cpu(record))
+                    columns['outputs'].append(
+                        blob(store.outputId(record), store.readOutput)
+                    )
+                    columns['tracebacks'].append(
+                        blob(store.tracebackId(record), store.readTraceback)
+                    )
+                data = zlib.compress(marshal.dumps(
+                    [columns[name].tostring() for name, code in self.COLUMNS]
+                ))
+                offset = self.append(self.results, data)
+                return self.db.execute(
+                    "INSERT INTO runs (started, elapsed, tests, failures, "
+                    "errors, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (started, elapsed, len(outcomes), outcomes.count(FAILURE),
+                     outcomes.count(ERROR), offset, len(data))
+                ).lastrowid
+        except:
+            # Names numbered in the transaction that was rolled back.
+            self.name_ids = None
+            raise
+    
+    def runs(self, limit=-1, offset=0):
+        """ Return (number, start time, seconds, tests, failures, errors)
+        of runs, the latest first, skipping offset of them and returning
+        at most limit. """
+        return self.db.execute(
+            "SELECT id, started, elapsed, tests, failures, errors FROM runs "
+            "ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+    
+    def previous(self, run):
+        """ Return the number of the run before run, None if there is none.
+        """
+        row = self.db.execute(
+            "SELECT MAX(id) FROM runs WHERE id < ?", (run, )
+        ).fetchone()
+        return row[0]
+    
+    def load(self, run):
+        """ Return the results of run as a HistoryRun. """
+        offset, length = self.db.execute(
+            "SELECT offset, length FROM runs WHERE id = ?", (run, )
+        ).fetchone()
+        data = marshal.loads(zlib.decompress(
+            self.read(self.results, offset, length)
+        ))
+        columns = {}
+        for (name, code), column in zip(self.COLUMNS, data):
+            columns[name] = array(code)
+            columns[name].fromstring(column)
+        return HistoryRun(self, run, columns)
+    
+    def testNames(self, name_ids):
+        """ Return the test names with the numbers in name_ids by number. """
+        names = {}
+        name_ids = list(name_ids)
+        # SQLite takes up to 999 parameters.
+        for start in xrange(0, len(name_ids), 500):
+            part = name_ids[start:start + 500]
+            names.update(self.db.execute(
+                "SELECT id, test FROM names WHERE id IN (%s)" %
+                ', '.join('?' * len(part)), part
+            ))
+        return names
+    
+    def close(self):
+        self.db.close()
+        self.results.close()
+        self.blobs.close()
+
+
+class HistoryRun(object):
+    """ The results of a run of a RunHistory, by their position in the run.
+    Test names are looked up as they are asked for, output and tracebacks
+    read when they are. """
+    def __init__(self, history, run, columns):
+        self.history = history
+        self.run = run
+        self.name_ids = columns['names']
+        self.outcomes = columns['outcomes']
+        self.flags = columns['flags']
+        self.walls = columns['walls']
+        self.cpus = columns['cpus']
+        self.outputs = columns['outputs']
+        self.tracebacks = columns['tracebacks']
+        self.names = {}
+        self.positions = None
+    
+    def __len__(self):
+        return len(self.name_ids)
+    
+    def name(self, indx):
+        name_id = self.name_ids[indx]
+        try:
+            return self.names[name_id]
+        except KeyError:
+            pass
+        self.names.update(self.history.testNames([name_id]))
+        return self.names[name_id]
+    
+    def prefetch(self, indices):
+        """ Look up the names of the results at indices in one go. """
+        missing = set(self.name_ids[indx] for indx in indices) - set(
+            self.names
+        )
+        if missing:
+            self.names.update(self.history.testNames(missing))
+    
+    def outcome(self, indx):
+        return self.outcomes[indx]
+    
+    def wall(self, indx):
+        return self.walls[indx]
+    
+    def cpu(self, indx):
+        return self.cpus[indx]
+    
+    def output(self, indx):
+        return self.history.readBlob(self.outputs[indx])
+    
+    def traceback(self, indx):
+        return self.history.readBlob(self.tracebacks[indx])
+    
+    def position(self, name_id):
+        """ Return where the result of the test numbered name_id is, None
+        if it did not run. """
+        if self.positions is None:
+            self.positions = dict(
+                (name_id, indx) for indx, name_id in enumerate(self.name_ids)
+            )
+        return self.positions.get(name_id)
+
+
+def diff_runs(before, after, factor=REGRESSION_FACTOR,
+              minimum=REGRESSION_MIN):
+    """ Return what changed from the HistoryRun before to after, as (kind,
+    position in before or None, position in after) tuples: NEW_FAILURE
+    for tests failing in after that did not fail in before, FIXED for those
+    passing in after that failed in before, and SLOWER for those taking
+    factor times and minimum seconds longer in after. """
+    changes = []
+    outcomes, walls = before.outcomes, before.walls
+    for indx, name_id in enumerate(after.name_ids):
+        old = before.position(name_id)
+        failed = after.outcomes[indx] != SUCCESS
+        if old is None:
+            if failed:
+                changes.append((NEW_FAILURE, None, indx))
+            continue
+        if failed and outcomes[old] == SUCCESS:
+            changes.append((NEW_FAILURE, old, indx))
+        elif not failed and outcomes[old] != SUCCESS:
+            changes.append((FIXED, old, indx))
+        elif (after.walls[indx] >= walls[old] * factor and
+              after.walls[indx] - walls[old] >= minimum):
+            changes.append((SLOWER, old, indx))
+    return changes
+
+
+class Zygote(object):
+    """ Long-lived worker that keeps the test modules imported and forks a
+    child to execute each run, so reruns skip interpreter startup and
+    imports. The results of every run are sent through the same pipe,
+    results; while a run is executing, control talks to the child. If any
+    module that is not part of the standard library or site-packages
+    changed on disk since it was imported, all of those are dropped and
+    imported anew before the next run. Needs os.fork. """
+    def __init__(self, inherited=()):
+        self.control, child_control = Pipe()
+        self.results, writer = Pipe(duplex=False)
+        self.proc = Process(target=self.serve,
+                            args=(child_control, writer, inherited))
+        self.proc.daemon = True
+        self.proc.start()
+        writer.close()
+        child_control.close()
+        self.child = None
+    
+    def alive(self):
+        return self.proc.is_alive()
+    
+    def fork(self, specs, spool=None, profile=False,
+             output_limit=OUTPUT_LIMIT, measure_memory=MEASURE_MEMORY):
+        """ Start a child executing the tests described by specs (see
+        test_spec) as commanded through control, writing their output to
+        the file spool, keeping output_limit bytes of that of each test,
+        profiling them if profile is true and measuring their memory if
+        measure_memory is. """
+        self.control.send(('fork', (specs, spool, profile, output_limit,
+                                    measure_memory)))
+        self.child = self.control.recv()
+    
+    def close(self):
+        """ Terminate the zygote and the run it may be executing. """
+        if self.child is not None:
+            try:
+                os.kill(self.child, signal.SIGKILL)
+            except OSError:
+                pass
+        self.proc.terminate()
+        self.proc.join()
+        self.control.close()
+        self.results.close()
+    
+    @staticmethod
+    def isProjectModule(module):
+        """ Whether module was imported from outside of the standard library
+        and site-packages, i.e. whether it may be edited between runs. """
+        path = getattr(module, '__file__', None)
+        if path is None or module.__name__ == '__main__':
+            return False
+        if module.__name__.split('.')[0] == __name__.split('.')[0]:
+            # qtestudo itself.
+            return False
+        return is_project_file(path)
+    
+    @staticmethod
+    def mtime(path):
+        if path.endswith(('.pyc', '.pyo')):
+            path = path[:-1]
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+    
+    @classmethod
+    def refresh(cls, mtimes, specs):
+        """ Make sure the modules of specs are imported and up to date. """
+        if any(cls.mtime(path) != mtime
+               for path, mtime in mtimes.itervalues()):
+            for name in mtimes:
+                sys.modules.pop(name, None)
+            mtimes.clear()
+        for spec in specs:
+            try:
+                import_module(spec[0], spec[1])
+            except Exception:
+                # Reported by load_spec in the child.
+                pass
+        for name, module in sys.modules.items():
+            if (module is not None and name not in mtimes and
+                cls.isProjectModule(module)):
+                mtimes[name] = (module.__file__, cls.mtime(module.__file__))
+    
+    @classmethod
+    def serve(cls, control, writer, inherited):
+        for conn in inherited:
+            conn.close()
+        # Module name to (path, mtime) of the modules we may have to drop.
+        mtimes = {}
+        while True:
+            try:
+                cmd, args = control.recv()
+            except EOFError:
+                break
+            if cmd == 'stop':
+                # Meant for a child that finished before it got to read
+                # it, see TestRunner.cancel.
+                continue
+            if cmd != 'fork':
+                break
+            specs, spool, profile, output_limit, measure_memory = args
+            cls.refresh(mtimes, specs)
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    TestRunner.bgProcess(
+                        [load_spec(spec) for spec in specs], control, writer,
+                        spool, profile, output_limit, measure_memory
+                    )
+                    code = 0
+                finally:
+                    os._exit(code)
+            control.send(pid)
+            status = os.waitpid(pid, 0)[1]
+            if status:
+                # The child died before it could report 'done'.
+                writer.send_bytes(marshal.dumps([('exit', [status])]))
+
+
+def agent_addresses(text, port=AGENT_PORT):
+    """ Parse a comma-separated list of HOST[:PORT][*N] into a list of
+    addresses for TestRunner, with those followed by *N listed N times.
+    Raise ValueError if text is not such a list. """
+    addresses = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        item, star, count = item.partition('*')
+        host, colon, number = item.partition(':')
+        if not host:
+            raise ValueError('no host in %r' % item)
+        address = (host, int(number) if colon else port)
+        addresses.extend([address] * (int(count) if star else 1))
+    return addresses
+
+
+def connect_agent(address, authkey=AGENT_AUTHKEY, timeout=AGENT_TIMEOUT):
+    """ Connect to the agent at address like multiprocessing's Client does,
+    but fail if that takes longer than timeout seconds rather than trying
+    again for a while. """
+    sock = socket.create_connection(address, timeout)
+    try:
+        sock.setblocking(True)
+        conn = Connection(os.dup(sock.fileno()))
+    finally:
+        sock.close()
+    if authkey is not None:
+        try:
+            answer_challenge(conn, authkey)
+            deliver_challenge(conn, authkey)
+        except:
+            conn.close()
+            raise
+    return conn
+
+
+class Channel(object):
+    """ A worker as seen by TestRunner: the reading end of the pipe its
+    results come through and the writing end of the one it takes commands
+    from; for an agent, the connection to it is both. """
+    def __init__(self, conn, control, persistent=False, worker=None,
+                 spool=None, address=None):
+        self.conn = conn
+        self.control = control
+        # Where the agent is, None for a local worker.
+        self.address = address
+        # Tells the event loop about data arriving from conn, if any.
+        self.notifier = None
+        self.persistent = persistent
+        # The Process or Zygote, and the file it writes test output to.
+        self.worker = worker
+        self.spool = spool
+        # Whether the worker is executing a run we are waiting for.
+        self.active = True
+        # The chunks of test indices handed to the worker that it has not
+        # finished yet.
+        self.assigned = deque()
+        self.quitting = False
+        # The tests and tracebacks the worker has sent so far, by id.
+        self.tests = {}
+        self.tracebacks = {}
+        # The id of the test being run, when the worker last showed
+        # progress, and the ids (test.id()) of the tests of the first
+        # assigned chunk that have a result.
+        self.current = None
+        self.since = time.time()
+        self.finished = set()
+        # Seconds the tests it sent results of took, and seconds the
+        # workers it took the place of were busy.
+        self.tested = 0.0
+        self.carried = 0.0
+    
+    def workerName(self):
+        if self.address is None:
+            return 'The worker'
+        return 'The worker of the agent at %s:%d' % self.address
+
+
+def worker_main(tests, control, conn, inherited, spool=None, profile=False,
+                output_limit=OUTPUT_LIMIT, measure_memory=MEASURE_MEMORY):
+    """ Entry point of the worker processes of TestRunner. """
+    for other in inherited:
+        other.close()
+    TestRunner.bgProcess(tests, control, conn, spool, profile, output_limit,
+                         measure_memory)
+
+
+class TestRunner(object):
+    """ Run tests in worker processes and report their results to result,
+    which is told about a run through setAmount and enter, about the
+    results of cached tests through addCached and about everything the
+    workers send through its translate mapping; see QTestResult.
+    
+    The tests are split into fixture groups (see fixture_key), which are
+    queued longest expected duration first, as learned from previous runs
+    (see TimingDatabase). Workers are handed chunks of groups from the
+    front of the queue whenever they become idle; chunks shrink as the
+    queue empties, so all workers finish at about the same time.
+    
+    A watchdog kills workers that did not finish a test within timeout
+    seconds, or die otherwise; the test is recorded as an error and the
+    rest of the worker's tests are queued again for a new worker.
+    
+    With profile, the workers profile every test and the result is told
+    about the profiles through translate['profile'] (see ProfileStats).
+    Durations of profiled runs are not recorded.
+    
+    Of the output of every test, output_limit bytes are kept (see
+    read_capped); 0 keeps all of it. With measure_memory, the workers
+    measure the memory every test uses (see BGTestResult).
+    
+    Tests that can be described by test_spec also run on the agents (see
+    qtestudo.agent) at the addresses in agents, which take chunks from the
+    same queue as the local workers. Agents that cannot be reached, or
+    all of them if a test cannot be described, are listed in unreachable.
+    The tests of an agent that goes away are queued again, like those of a
+    worker that dies, but for the one it was running that is no error: it
+    is queued again as well, up to AGENT_RETRIES times.
+    
+    Tests that failed the last time they ran are queued first, and once
+    maxfail tests failed or had errors, the run is cancelled (see cancel):
+    the workers finish the test they are running and the rest are not run.
+    
+    Without an event loop, call wait after run to see the run through.
+    
+    The settings left at None are those of the module (WORKERS, GROUP and
+    so on) at the time the runner is made; a timeout, maxfail or
+    output_limit of 0 turns them off. """
+    def __init__(self, result, workers=None, group=None, warm=None,
+                 timings=TIMINGS_DB, incremental=None,
+                 results=RESULTS_DB, timeout=None, profile=None,
+                 agents=None, authkey=None, maxfail=None,
+                 output_limit=None, measure_memory=None):
+        self.result = result
+        self.workers = workers or WORKERS
+        self.agents = list(AGENTS if agents is None else agents)
+        self.authkey = AGENT_AUTHKEY if authkey is None else authkey
+        # (address, reason) of the agents the last run could not use.
+        self.unreachable = []
+        self.timeout = TIMEOUT if timeout is None else timeout
+        self.profile = PROFILE if profile is None else profile
+        self.maxfail = MAXFAIL if maxfail is None else maxfail
+        # None keeps all the output.
+        self.output_limit = (
+            OUTPUT_LIMIT if output_limit is None else output_limit
+        ) or None
+        self.measure_memory = (
+            MEASURE_MEMORY if measure_memory is None else measure_memory
+        )
+        # Tests that failed or had errors in the current run, tests that
+        # were started, and whether it was cancelled.
+        self.n_failed = 0
+        self.n_started = 0
+        self.cancelled = False
+        # Times every test was queued again after its agent was lost, by
+        # index.
+        self.retries = {}
+        self.group = GROUP if group is None else group
+        self.warm = WARM if warm is None else warm
+        self.timings_path = timings
+        self.timings = None
+        self.incremental = INCREMENTAL if incremental is None else incremental
+        self.results_path = results
+        self.cache = None
+        self.graph = None
+        # Input digests of the tests of an incremental run by id, and the
+        # results not yet written to the cache.
+        self.digests = {}
+        self.passed = []
+        self.failed = []
+        # (test id, outcome, wall, cpu) of the results of the current run.
+        self.timed = []
+        # The tracebacks of the current run by traceback_key, so that every
+        # worker's copy of one (up to addresses) is replaced by the same
+        # string.
+        self.tracebacks = {}
+        self.done = False
+        self.procs = []
+        self.zygotes = []
+        self.conns = {}
+        # Chunks of tests not yet handed to a worker, see nextChunk.
+        self.tests = []
+        self.groups = []
+        self.costs = []
+        self.durations = {}
+        self.queue = deque()
+        self.remaining = 0
+        # Messages read from the workers but not yet applied to the result.
+        self.pending = deque()
+        self.scheduled = False
+        self.started = None
+        self.first_test = None
+        # Time each worker spent running tests, and the slowest worker's
+        # total time.
+        self.busy = []
+        self.utilization = []
+    
+    def run(self, test, update=False):
+        """ Run test. With update, results of an earlier run are replaced
+        by the new ones of the same tests instead of being cleared. """
+        self.done = False
+        self.started = time.time()
+        self.first_test = None
+        self.n_failed = 0
+        self.n_started = 0
+        self.retries = {}
+        self.cancelled = False
+        self.result.setAmount(test.countTestCases())
+        self.result.enter(update)
+        tests = list(flatten_suite(test))
+        self.digests = {}
+        self.passed = []
+        self.failed = []
+        self.tracebacks = {}
+        if self.incremental:
+            tests = self.skipUnchanged(tests)
+        self.plan(tests)
+        n = max(1, min(self.workers, len(self.groups)))
+        # Every worker reports 'done' on its own, the result only gets to
+        # see the last one.
+        self.running = n
+        self.elapsed = 0
+        self.busy = []
+        self.utilization = []
+        self.timed = []
+        self.pending.clear()
+        self.unreachable = []
+        warm = self.warm and hasattr(os, 'fork')
+        specs = None
+        if warm or self.agents:
+            specs = map(test_spec, self.tests)
+            if None in specs:
+                test = self.tests[specs.index(None)]
+                specs = None
+        if self.agents and specs is not None:
+            # Connected first, so that the chunks the local workers are
+            # handed already account for the agents.
+            agents = self.startAgents(specs)
+            self.running += len(agents)
+            for channel in agents:
+                self.feed(channel)
+        elif self.agents:
+            reason = 'it cannot load %s, so all tests run locally' % test.id()
+            self.unreachable = [(address, reason) for address in self.agents]
+        if warm and specs is not None:
+            self.runWarm(n, specs)
+        else:
+            self.runCold(n)
+        self.startTimers()
+    
+    def wait(self, interval=0.05):
+        """ Read and apply the results of the current run until it is done.
+        """
+        while not self.done:
+            fds = list(self.conns)
+            if os.name == 'posix':
+                ready = select.select(fds, [], [], interval)[0]
+            else:
+                time.sleep(interval)
+                ready = fds
+            for fd in ready:
+                if fd in self.conns:
+                    self.tick(fd)
+            if self.timeout:
+                self.checkTimeouts()
+            while self.pending:
+                self.consume()
+    
+    def startTimers(self):
+        """ Called once the workers of a run were started, to arrange for
+        poll and checkTimeouts to be called while it goes on. wait does
+        that by itself. """
+    
+    def stopTimers(self):
+        """ Called once a run is over. """
+    
+    def isRunning(self):
+        """ Return whether a run is in progress. """
+        return self.started is not None and not self.done
+    
+    def openCache(self):
+        if self.cache is None and self.results_path is not None:
+            try:
+                self.cache = ResultCache(self.results_path)
+            except (sqlite3.Error, EnvironmentError):
+                self.results_path = None
+        return self.cache
+    
+    def skipUnchanged(self, tests):
+        """ Show the cached results of those of tests that passed before and
+        whose inputs have not changed since; return the others. """
+        if self.graph is None:
+            self.graph = ImportGraph()
+        by_path = {}
+        for test in tests:
+            path = test_path(test)
+            if path is None or not os.path.isfile(path):
+                continue
+            if path not in by_path:
+                by_path[path] = self.graph.digest(path)
+            self.digests[test.id()] = by_path[path]
+        cache = self.openCache()
+        if cache is None:
+            return tests
+        try:
+            cached = cache.lookup(self.digests)
+        except sqlite3.Error:
+            return tests
+        remaining = []
+        self.result.beginUpdate()
+        for test in tests:
+            hit = cached.get(test.id())
+            if hit is None:
+                remaining.append(test)
+            else:
+                self.result.addCached(str(test), test.shortDescription(), *hit)
+        self.result.endUpdate()
+        return remaining
+    
+    def updateCache(self):
+        """ Write the results gathered for the cache so far. """
+        passed, self.passed = self.passed, []
+        failed, self.failed = self.failed, []
+        cache = self.openCache()
+        if cache is None or not (passed or failed):
+            return
+        try:
+            cache.update(passed, failed)
+        except sqlite3.Error:
+            pass
+    
+    def estimates(self):
+        """ Return the expected wall clock time of tests by their id. """
+        if self.timings_path is None:
+            return {}
+        try:
+            if self.timings is None:
+                self.timings = TimingDatabase(self.timings_path)
+            return self.timings.estimates()
+        except (sqlite3.Error, EnvironmentError):
+            return {}
+    
+    def failing(self):
+        """ Return the ids of the tests that did not pass the last time. """
+        if self.timings_path is None:
+            return set()
+        try:
+            if self.timings is None:
+                self.timings = TimingDatabase(self.timings_path)
+            return self.timings.failing()
+        except (sqlite3.Error, EnvironmentError):
+            return set()
+    
+    def plan(self, tests):
+        """ Queue the fixture groups of tests, those with tests that failed
+        last time first, then longest first. """
+        self.tests = tests
+        self.groups = fixture_groups(tests, self.group)
+        self.durations = self.estimates()
+        ids = [[tests[indx].id() for indx in group] for group in self.groups]
+        self.costs = group_costs(ids, self.durations)
+        failing = self.failing()
+        passed = [failing.isdisjoint(group) for group in ids]
+        for indx, group in enumerate(self.groups):
+            if not passed[indx] and len(group) > 1:
+                self.groups[indx] = failing_first(group, ids[indx], failing)
+        self.queue = deque(sorted(
+            xrange(len(self.groups)), key=lambda i: (passed[i], -self.costs[i])
+        ))
+        self.remaining = sum(self.costs)
+    
+    def nextChunk(self):
+        """ Take groups off the queue for a worker that is about to become
+        idle. Chunks are a fraction of the remaining work, so messages are
+        few while the queue is long and the work is finely divided once
+        it runs short. """
+        target = self.remaining / (2.0 * PREFETCH * max(1, self.running))
+        chunk = []
+        cost = 0
+        while self.queue and (not chunk or cost < target):
+            indx = self.queue.popleft()
+            chunk.extend(self.groups[indx])
+            cost += self.costs[indx]
+        self.remaining -= cost
+        return chunk
+    
+    def feed(self, channel):
+        """ Make sure channel has a chunk to start on once it finishes the
+        current one; tell it to quit if there is nothing left to do. """
+        try:
+            while len(channel.assigned) < PREFETCH and self.queue:
+                chunk = self.nextChunk()
+                channel.assigned.append(chunk)
+                channel.control.send(('run', chunk))
+            if not channel.assigned and not channel.quitting:
+                channel.quitting = True
+                channel.control.send(('quit', None))
+        except (IOError, OSError):
+            # The worker died; once tick sees it is gone, its chunks are
+            # queued again.
+            pass
+    
+    def inherited(self):
+        """ Return the connections a new worker would inherit from us but
+        must not keep open. """
+        conns = []
+        for channel in self.conns.itervalues():
+            conns.extend([channel.conn, channel.control])
+        return conns
+    
+    @staticmethod
+    def spoolFile():
+        """ Return the path of a new file for a worker's output. """
+        fd, path = tempfile.mkstemp(prefix='qtestudo-', suffix='.out')
+        os.close(fd)
+        return path
+    
+    def runCold(self, n):
+        """ Start a new process for each of n workers. """
+        self.procs = []
+        for _ in xrange(n):
+            self.startWorker()
+    
+    def startWorker(self):
+        """ Start a worker process, hand it its first chunks and return its
+        channel. """
+        reader, writer = Pipe(duplex=False)
+        commands, control = Pipe(duplex=False)
+        spool = self.spoolFile()
+        proc = Process(
+            target=worker_main,
+            args=(self.tests, commands, writer, self.inherited(), spool,
+                  self.profile, self.output_limit, self.measure_memory)
+        )
+        proc.start()
+        # Only the worker may hold the writing end, otherwise we never
+        # see EOF if it dies.
+        writer.close()
+        commands.close()
+        self.procs.append(proc)
+        channel = self.watch(reader, control, worker=proc, spool=spool)
+        self.feed(channel)
+        return channel
+    
+    def startAgents(self, specs):
+        """ Have every agent start a worker for the tests described by
+        specs. Return the channels of those that did. """
+        channels = []
+        for address in self.agents:
+            try:
+                conn = connect_agent(address, self.authkey)
+            except (EnvironmentError, EOFError, AuthenticationError), exc:
+                self.unreachable.append((address, str(exc)))
+                continue
+            try:
+                conn.send(('start', (specs, self.profile, self.output_limit,
+                                     self.measure_memory)))
+            except (EnvironmentError, ValueError), exc:
+                conn.close()
+                self.unreachable.append((address, str(exc)))
+                continue
+            channels.append(self.watch(conn, conn, address=address))
+        return channels
+    
+    def runWarm(self, n, specs):
+        """ Have n Zygotes fork a worker each for the tests described by
+        specs. """
+        for indx in xrange(n):
+            if indx < len(self.zygotes) and not self.zygotes[indx].alive():
+                self.unwatch(self.zygotes[indx].results.fileno())
+                self.zygotes[indx].close()
+                self.zygotes[indx] = Zygote(self.inherited())
+            elif indx == len(self.zygotes):
+                self.zygotes.append(Zygote(self.inherited()))
+            zygote = self.zygotes[indx]
+            fd = zygote.results.fileno()
+            if fd not in self.conns:
+                self.watch(zygote.results, zygote.control, persistent=True,
+                           worker=zygote, spool=self.spoolFile())
+            channel = self.conns[fd]
+            channel.active = True
+            channel.quitting = False
+            channel.assigned.clear()
+            channel.finished.clear()
+            channel.current = None
+            channel.since = time.time()
+            channel.tested = channel.carried = 0.0
+            zygote.fork(specs, channel.spool, self.profile, self.output_limit,
+                        self.measure_memory)
+            self.feed(channel)
+    
+    def watch(self, conn, control, persistent=False, worker=None,
+              spool=None, address=None):
+        """ Call tick whenever there is data to be read from conn. """
+        channel = self.conns[conn.fileno()] = Channel(
+            conn, control, persistent, worker, spool, address
+        )
+        return channel
+    
+    def unwatch(self, fd):
+        channel = self.conns.pop(fd, None)
+        if channel is None:
+            return
+        if not channel.persistent:
+            channel.conn.close()
+            if channel.control is not channel.conn:
+                channel.control.close()
+        if channel.spool is not None:
+            try:
+                os.unlink(channel.spool)
+            except OSError:
+                pass
+    
+    def poll(self):
+        for fd in self.conns.keys():
+            if fd in self.conns:
+                self.tick(fd)
+    
+    def tick(self, fd):
+        """ Read what the worker at fd has sent; it is applied to the
+        result by consume. """
+        channel = self.conns[fd]
+        conn, tests = channel.conn, channel.tests
+        while True:
+            try:
+                if not conn.poll():
+                    break
+                batch = marshal.loads(conn.recv_bytes())
+            except (EOFError, IOError):
+                # The worker went away without saying goodbye.
+                if channel.active and channel.address is not None:
+                    # Not the test's fault, so it is run again.
+                    self.abandon(channel, 'The connection to the agent at '
+                                 '%s:%d running this test was lost.' %
+                                 channel.address, retry=True)
+                elif channel.active:
+                    self.abandon(channel, 'The worker running this test '
+                                 'exited unexpectedly.')
+                self.unwatch(fd)
+                break
+            for key, args in batch:
+                if key == 'test':
+                    test_id, test_name, test_descr, test_key = args
+                    tests[test_id] = (test_name, test_descr, test_key)
+                elif key == 'traceback':
+                    tb = args[1]
+                    channel.tracebacks[args[0]] = self.tracebacks.setdefault(
+                        traceback_key(tb), tb
+                    )
+                elif key == 'profile':
+                    self.pending.append(
+                        ('profile', [tests[args[0]][0], args[1]])
+                    )
+                elif key == 'ready':
+                    channel.assigned.popleft()
+                    channel.finished.clear()
+                    self.feed(channel)
+                elif key == 'exit' and channel.assigned:
+                    status = args[0]
+                    if os.WIFSIGNALED(status):
+                        reason = 'was killed by signal %d' % (
+                            os.WTERMSIG(status)
+                        )
+                    else:
+                        reason = 'exited with status %d' % (
+                            os.WEXITSTATUS(status)
+                        )
+                    self.abandon(channel, '%s running this test %s.' % (
+                        channel.workerName(), reason
+                    ))
+                elif key == 'done' or key == 'exit':
+                    if channel.active:
+                        channel.active = False
+                        if key == 'done':
+                            elapsed, busy = args
+                        else:
+                            elapsed, busy = None, channel.tested
+                        self.pending.append(
+                            ('done', [elapsed, busy + channel.carried])
+                        )
+                    if not channel.persistent:
+                        self.unwatch(fd)
+                        self.schedule()
+                        return
+                    tests.clear()
+                    channel.tracebacks.clear()
+                else:
+                    test_name, test_descr, test_key = tests[args[0]]
+                    channel.since = time.time()
+                    if key == 'start':
+                        channel.current = args[0]
+                        self.n_started += 1
+                        if self.first_test is None:
+                            self.first_test = time.time() - self.started
+                    else:
+                        channel.current = None
+                        channel.finished.add(test_key)
+                        wall, cpu = args[-4:-2]
+                        channel.tested += wall
+                        self.timed.append(
+                            (test_key, OUTCOMES[key], wall, cpu)
+                        )
+                        if test_key in self.digests:
+                            self.cacheResult(key, test_key, args)
+                        if key != 'success':
+                            args[1] = channel.tracebacks[args[1]]
+                    self.pending.append(
+                        (key, [test_name, test_descr] + args[1:])
+                    )
+                    if key == 'failure' or key == 'error':
+                        self.countFailure()
+        self.schedule()
+    
+    def checkTimeouts(self):
+        """ Kill the workers that have been running a test for too long. """
+        now = time.time()
+        for fd, channel in self.conns.items():
+            if (channel.active and channel.assigned and
+                now - channel.since > self.timeout):
+                self.abandon(channel, 'Timed out after %.1f s; the worker '
+                             'running this test was killed.' % self.timeout)
+                self.kill(channel)
+    
+    def kill(self, channel):
+        worker = channel.worker
+        self.unwatch(channel.conn.fileno())
+        if isinstance(worker, Zygote):
+            worker.close()
+            self.zygotes.remove(worker)
+        elif worker is not None:
+            if hasattr(signal, 'SIGKILL'):
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            else:
+                worker.terminate()
+            worker.join()
+    
+    def readSpool(self, channel):
+        if channel.spool is None:
+            return ''
+        try:
+            with open(channel.spool, 'rb') as fd:
+                return read_capped(fd.fileno(), self.output_limit)
+        except (IOError, OSError):
+            return ''
+    
+    def spoolOf(self, test_name):
+        """ Return the file the output of the running test test_name goes
+        to, or None if it is not running. """
+        for channel in self.conns.itervalues():
+            if (channel.current is not None and channel.spool is not None and
+                channel.tests[channel.current][0] == test_name):
+                return channel.spool
+        return None
+    
+    def abandon(self, channel, message, retry=False):
+        """ Record the test the worker of channel was running as an error
+        with message, queue the rest of its tests again and start a new
+        worker for them. With retry, the test is queued again as well,
+        unless that happened AGENT_RETRIES times already. """
+        if channel.current is not None:
+            test_name, test_descr, test_key = channel.tests[channel.current]
+        else:
+            test_key = None
+        rest = [indx for chunk in channel.assigned for indx in chunk
+                if self.tests[indx].id() not in channel.finished]
+        # Unless it did not even tell us it started the test, the worker
+        # was stuck at the first test without a result.
+        keys = [self.tests[indx].id() for indx in rest]
+        hung = None
+        if rest:
+            hung = rest.pop(keys.index(test_key) if test_key in keys else 0)
+        tries = self.retries.get(hung, 0)
+        if retry and hung is not None and tries < AGENT_RETRIES:
+            self.retries[hung] = tries + 1
+            rest.insert(0, hung)
+            if test_key is not None:
+                # It is started again.
+                self.n_started -= 1
+            test_key = None
+        elif test_key is None and hung is not None:
+            test = self.tests[hung]
+            test_name, test_descr, test_key = (
+                str(test), test.shortDescription(), test.id()
+            )
+            # It gets a result, so it counts as started for notRun.
+            self.n_started += 1
+        channel.assigned.clear()
+        channel.finished.clear()
+        channel.current = None
+        if test_key is not None:
+            wall = time.time() - channel.since
+            self.timed.append((test_key, ERROR, wall, 0.0))
+            if test_key in self.digests:
+                self.failed.append(test_key)
+            if retry:
+                message += ' It was queued again %d times before.' % tries
+            self.pending.append(('error', [
+                test_name, test_descr, message + '\n',
+                self.readSpool(channel), wall, 0.0
+            ]))
+            self.countFailure()
+        if rest and not self.cancelled:
+            self.groups.append(rest)
+            cost = group_costs([[self.tests[indx].id() for indx in rest]],
+                               self.durations)[0]
+            self.costs.append(cost)
+            self.remaining += cost
+            self.queue.appendleft(len(self.groups) - 1)
+        if channel.active:
+            channel.active = False
+            # It was busy with the tests it sent results of, and with the
+            # one it did not finish.
+            busy = channel.carried + channel.tested
+            if hung is not None:
+                busy += time.time() - channel.since
+            if self.queue:
+                # The new worker takes its place, also in utilization.
+                self.startWorker().carried = busy
+            else:
+                # The run lasted at least until now.
+                self.pending.append(
+                    ('done', [time.time() - self.started, busy])
+                )
+        self.schedule()
+    
+    def countFailure(self):
+        self.n_failed += 1
+        if self.maxfail and self.n_failed >= self.maxfail:
+            self.cancel()
+    
+    def cancel(self):
+        """ Cancel the current run: the tests not yet started are not run,
+        and every worker is told to stop once it finished the test it is
+        running. The run then ends like any other, with the results of the
+        tests that did run. """
+        if self.cancelled or not self.isRunning():
+            return
+        self.cancelled = True
+        self.queue.clear()
+        self.remaining = 0
+        for channel in self.conns.values():
+            if not channel.active:
+                continue
+            # No 'quit' after this: if the worker has stopped by then, its
+            # zygote would read it and exit.
+            channel.quitting = True
+            try:
+                channel.control.send(('stop', None))
+            except (IOError, OSError):
+                # The worker died; tick finds out.
+                pass
+    
+    def notRun(self):
+        """ Return how many tests of a cancelled run were not started. """
+        if not self.cancelled:
+            return 0
+        return max(0, len(self.tests) - self.n_started)
+    
+    def cacheResult(self, key, test_key, args):
+        if key == 'success':
+            outp, wall, cpu = args[1:4]
+            self.passed.append(
+                (test_key, self.digests[test_key], outp, wall, cpu)
+            )
+        else:
+            self.failed.append(test_key)
+        if len(self.passed) + len(self.failed) >= 1000:
+            self.updateCache()
+    
+    def schedule(self):
+        """ Arrange for consume to be called; wait does that by itself. """
+    
+    def consume(self):
+        """ Apply pending messages to the result for at most FRAME_BUDGET
+        seconds, then give the event loop a chance to repaint and handle
+        input before continuing. """
+        self.scheduled = False
+        deadline = time.time() + FRAME_BUDGET
+        finished = False
+        self.result.beginUpdate()
+        try:
+            while self.pending and not finished:
+                key, args = self.pending.popleft()
+                if key == 'done':
+                    finished = self.workerDone(*args)
+                else:
+                    self.result.translate[key](*args)
+                if time.time() > deadline:
+                    break
+        finally:
+            self.result.endUpdate()
+        if finished:
+            self.result.done(self.elapsed, self.first_test, self.utilization,
+                             self.notRun())
+            self.recordTimings()
+            self.updateCache()
+        self.schedule()
+    
+    def recordTimings(self):
+        """ Add the durations of the finished run to the timings database.
+        """
+        timed, self.timed = self.timed, []
+        if self.timings_path is None or not timed or self.profile:
+            return
+        try:
+            if self.timings is None:
+                self.timings = TimingDatabase(self.timings_path)
+            self.timings.record(self.started, self.elapsed, timed)
+        except (sqlite3.Error, EnvironmentError):
+            # Not being able to keep the history must not break runs.
+            self.timings_path = None
+    
+    def workerDone(self, elapsed, busy):
+        """ Account for a worker having finished. Return whether it was the
+        last one. """
+        self.running -= 1
+        if busy is not None:
+            self.busy.append(busy)
+        # The workers run concurrently, so the run took as long as the
+        # slowest of them.
+        if elapsed is not None:
+            self.elapsed = max(self.elapsed, elapsed)
+        if not self.running:
+            self.stopTimers()
+            if self.elapsed:
+                self.utilization = [b / self.elapsed for b in self.busy]
+            self.done = True
+        return self.done
+    
+    @staticmethod
+    def bgProcess(tests, control, conn, spool=None, profile=False,
+                  output_limit=OUTPUT_LIMIT, measure_memory=MEASURE_MEMORY):
+        """ Run the chunks of tests (given by their indices) that arrive
+        through control until told to quit. Output is captured in the file
+        spool, see OutputCapture, of which output_limit bytes are kept per
+        test; with profile, every test is profiled, with measure_memory,
+        the memory it uses is measured. """
+        if spool is None:
+            fd, path = tempfile.mkstemp(prefix='qtestudo-', suffix='.out')
+            os.close(fd)
+        else:
+            path = spool
+        capture = OutputCapture(path, output_limit)
+        capture.start()
+        writer = BatchWriter(conn)
+        result = BGTestResult(writer, capture, profile, control,
+                              measure_memory)
+        start = time.time()
+        busy = 0.0
+        while not result.shouldStop:
+            try:
+                if result.commands:
+                    cmd, chunk = result.commands.popleft()
+                else:
+                    cmd, chunk = control.recv()
+            except EOFError:
+                break
+            if cmd != 'run':
+                break
+            began = time.time()
+            TestSuite(load_test(tests[indx]) for indx in chunk)(result)
+            busy += time.time() - began
+            writer.send('ready', [])
+            writer.flush()
+        writer.send('done', [time.time() - start, busy])
+        writer.close()
+        if result.meter is not None:
+            result.meter.close()
+        capture.stop()
+        if spool is None:
+            os.unlink(path)
+    
+    def stop(self):
+        """ Kill the workers right away, unlike cancel. The results they
+        sent until now are still applied to the result, which is then told
+        that the run is done. """
+        running = self.isRunning()
+        self.cancelled = True
+        self.queue.clear()
+        if running:
+            self.poll()
+        self.stopTimers()
+        for fd in self.conns.keys():
+            self.unwatch(fd)
+        self.done = True
+        for proc in self.procs:
+            proc.terminate()
+        # A child killed halfway through a message would leave its
+        # zygote's pipe unusable, so the zygotes go too.
+        self.shutdown()
+        pending, self.pending = self.pending, deque()
+        if not running:
+            return
+        self.result.beginUpdate()
+        try:
+            for key, args in pending:
+                if key != 'done':
+                    self.result.translate[key](*args)
+        finally:
+            self.result.endUpdate()
+        self.elapsed = time.time() - self.started
+        self.result.done(self.elapsed, self.first_test, [], self.notRun())
+        self.recordTimings()
+        self.updateCache()
+    
+    def shutdown(self):
+        """ Terminate the warm workers. """
+        for zygote in self.zygotes:
+            self.unwatch(zygote.results.fileno())
+            zygote.close()
+        self.zygotes = []
@@ -0,0 +1,2466 @@
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+The Qt user interface of qtestudo: the main window, the dialogs and the
+models showing results, and QTestRunner, which drives a TestRunner (see
+qtestudo.core) from the Qt event loop.
+"""
+
+
+import os
+import re
+import sys
+import time
+import heapq
+import sqlite3
+import types
+
+from array import array
+
+from PyQt4 import QtGui, QtCore
+from unittest import TestResult, TestSuite, TestProgram
+
+from qtestudo import core
+from qtestudo.core import (
+    INDEX_PATH, SUCCESS, FAILURE, ERROR, CACHED, LEAKED, OVER_BUDGET,
+    TestRunner, ResultStore, TestRef, DiscoveryIndex, ImportGraph, Inotify,
+    ProfileStats, SearchIndex, discover, read_fd, hottest, dump_stats,
+    flatten_suite, failed_tests, test_path, summary, memory_flags,
+    megabytes, agent_addresses, HISTORY_DIR, RunHistory, diff_runs
+)
+
+COLORED_PROGRESS = True
+# Seconds watch mode waits for further changes before it reruns tests, and
+# seconds between checks for changes where inotify is not available.
+WATCH_DEBOUNCE = 0.3
+WATCH_POLL = 1.0
+# Seconds between reads of the output of a running test shown in a
+# QTestView.
+TAIL_INTERVAL = 0.25
+# Seconds QTestLoader waits for further typing before it filters the tests,
+# and the most tests a filtered tree is expanded to show.
+FILTER_DELAY = 0.15
+FILTER_EXPAND = 1000
+# Number of runs a history view reads at a time.
+HISTORY_PAGE = 100
+# Number of functions a profile view lists, those with the most time of
+# their own.
+PROFILE_ROWS = 200
+
+BLUE_COLOR = '#6699FF'
+RED_COLOR = '#ff471a'
+GREEN_COLOR = '#b3ff66'
+YELLOW_COLOR = '#ffd966'
+
+timers = []
+
+def call_init(fun):
+    timer = QtCore.QTimer()
+    def func():
+        fun()
+        timers.remove(timer)
+    timer.singleShot(0, func)
+    timers.append(timer)
+
+
+class QExceptionDialog(QtGui.QDialog):
+    def __init__(self, msg, title=None):
+        QtGui.QDialog.__init__(self)
+        
+        buttons = QtGui.QDialogButtonBox()
+        buttons.addButton(QtGui.QDialogButtonBox.Ok)
+        
+        self.connect(buttons, QtCore.SIGNAL('accepted()'), self,
+                     QtCore.SLOT('accept()'))
+        
+        main = QtGui.QVBoxLayout()
+        if title is not None:
+            main.addWidget(QtGui.QLabel(title))
+        entry = QtGui.QTextEdit(msg)
+        entry.setReadOnly(True)
+        main.addWidget(entry)
+        main.addWidget(buttons)
+        
+        self.setLayout(main)
+
+
+class QTestLoader(QtGui.QDialog):
+    """ Dialog to open files or directories and pick the tests to run from
+    the TestCases found in them, shown in a QTestTreeModel. """
+    def __init__(self):
+        QtGui.QDialog.__init__(self)
+        self.setModal(True)
+        
+        self.thread = None
+        self.model = QTestTreeModel()
+        
+        self.file_line = QtGui.QLineEdit()
+        self.file_button = QtGui.QPushButton("Open...")
+        self.dir_button = QtGui.QPushButton("Open Directory...")
+        
+        self.connect(self.file_button, QtCore.SIGNAL('clicked()'), self.load)
+        self.connect(self.dir_button, QtCore.SIGNAL('clicked()'),
+                     self.loadDirectory)
+        
+        self.filter_line = QtGui.QLineEdit()
+        self.regex = QtGui.QCheckBox('Regular Expression')
+        # Filter once typing pauses rather than on every key.
+        self.filter_timer = QtCore.QTimer()
+        self.filter_timer.setSingleShot(True)
+        
+        self.connect(self.filter_line,
+                     QtCore.SIGNAL('textChanged(const QString &)'),
+                     self.scheduleFilter)
+        self.connect(self.regex, QtCore.SIGNAL('toggled(bool)'),
+                     self.scheduleFilter)
+        self.connect(self.filter_timer, QtCore.SIGNAL('timeout()'),
+                     self.applyFilter)
+        
+        self.tree = QtGui.QTreeView()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setModel(self.model)
+        
+        self.count = QtGui.QLabel()
+        self.connect(
+            self.model,
+            QtCore.SIGNAL('dataChanged(const QModelIndex &, '
+                          'const QModelIndex &)'),
+            self.updateCount
+        )
+        self.connect(self.model, QtCore.SIGNAL('modelReset()'),
+                     self.updateCount)
+        
+        file_layout = QtGui.QHBoxLayout()
+        file_layout.addWidget(self.file_line, 5)
+        file_layout.addWidget(self.file_button, 1)
+        file_layout.addWidget(self.dir_button, 1)
+        
+        filter_layout = QtGui.QHBoxLayout()
+        filter_layout.addWidget(QtGui.QLabel('Filter:'))
+        filter_layout.addWidget(self.filter_line, 5)
+        filter_layout.addWidget(self.regex)
+        
+        select_all = QtGui.QPushButton('Select All')
+        select_none = QtGui.QPushButton('Select None')
+        
+        self.connect(select_all, QtCore.SIGNAL('clicked()'),
+                     self.selectAll)
+        self.connect(select_none, QtCore.SIGNAL('clicked()'),
+                     self.selectNone)
+        
+        buttons = QtGui.QDialogButtonBox()
+        buttons.addButton(QtGui.QDialogButtonBox.Ok)
+        buttons.addButton(QtGui.QDialogButtonBox.Cancel)
+        
+        self.connect(buttons, QtCore.SIGNAL('accepted()'), self,
+                     QtCore.SLOT('accept()'))
+        self.connect(buttons, QtCore.SIGNAL('rejected()'), self,
+                     QtCore.SLOT('reject()'))
+        
+        button_lay = QtGui.QHBoxLayout()
+        button_lay.addWidget(select_all)
+        button_lay.addWidget(select_none)
+        button_lay.addWidget(self.count, 1)
+        button_lay.addWidget(buttons)
+        
+        main = QtGui.QVBoxLayout()
+        main.addLayout(file_layout)
+        main.addLayout(filter_layout)
+        main.addWidget(self.tree)
+        main.addLayout(button_lay)
+        
+        self.setLayout(main)
+        self.updateCount()
+    
+    @property
+    def selected(self):
+        """ The tests that are checked. """
+        return self.model.selectedTests()
+    
+    def selectAll(self):
+        self.model.selectShown(True)
+    
+    def selectNone(self):
+        self.model.selectShown(False)
+    
+    def updateCount(self, *args):
+        self.count.setText('%d of %d tests selected' % (
+            self.model.n_selected, self.model.n_tests
+        ))
+    
+    def scheduleFilter(self, *args):
+        self.filter_timer.start(int(FILTER_DELAY * 1000))
+    
+    def applyFilter(self):
+        self.filter_timer.stop()
+        try:
+            self.model.setFilter(unicode(self.filter_line.text()),
+                                 self.regex.isChecked())
+        except re.error, exc:
+            self.filter_line.setToolTip(str(exc))
+            return
+        self.filter_line.setToolTip('')
+        self.expandFiltered()
+    
+    def expandFiltered(self):
+        """ Show the tests left by a filter unless there are many. """
+        if self.model.pattern and self.model.n_shown <= FILTER_EXPAND:
+            self.tree.expandAll()
+    
+    def load(self):
+        filename = QtGui.QFileDialog.getOpenFileNames(
+            self, 'Open file', '.', "Python Source (*.py)")
+        self.discover(map(str, list(filename)))
+    
+    def loadDirectory(self):
+        directory = QtGui.QFileDialog.getExistingDirectory(
+            self, 'Open directory', '.')
+        if directory:
+            self.discover([str(directory)])
+    
+    def discover(self, paths):
+        """ Scan paths for TestCases in the background. """
+        if not paths or self.thread is not None:
+            return
+        self.file_line.setText(', '.join(paths))
+        self.file_button.setEnabled(False)
+        self.dir_button.setEnabled(False)
+        self.thread = QDiscoveryThread(paths)
+        self.connect(self.thread, QtCore.SIGNAL('discovered'),
+                     self.addClasses)
+        self.thread.start()
+    
+    def addClasses(self, classes, errors):
+        self.thread.wait()
+        self.thread = None
+        self.file_button.setEnabled(True)
+        self.dir_button.setEnabled(True)
+        self.model.addClasses(classes)
+        self.expandFiltered()
+        if errors:
+            msg = QExceptionDialog(
+                '\n'.join(tb for path, tb in errors),
+                'The following files could not be scanned for tests: %s' %
+                ', '.join(path for path, tb in errors)
+            )
+            msg.exec_()
+
+
+class QTestTreeModel(QtCore.QAbstractItemModel):
+    """ Checkable tree of the TestClassRefs found by discover, by module,
+    class and test method. Which methods are checked is kept as a set per
+    class, so checking and unchecking many tests, or all of them, is linear
+    in their number.
+    
+    setFilter hides the tests whose id does not contain a string or match a
+    regular expression; a string that extends the previous one only needs
+    the tests still shown to be checked again. Checking a module or class
+    checks the tests of it that are shown. """
+    def __init__(self, parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        # Module names and the classes in every module, by module index.
+        self.modules = []
+        self.module_classes = []
+        self.module_index = {}
+        # TestClassRefs, their module index and the lower case ids of their
+        # methods, by class index.
+        self.classes = []
+        self.class_module = array('i')
+        self.keys = []
+        self.class_index = {}
+        # Method indices checked, by class index.
+        self.checked = []
+        self.n_tests = 0
+        self.n_selected = 0
+        self.pattern = ''
+        self.regex = False
+        self.showAll()
+    
+    def showAll(self):
+        # What is shown: module indices, and by module index the class
+        # indices, and by class index the method indices.
+        self.shown_modules = array('i', xrange(len(self.modules)))
+        self.shown_classes = [array('i', classes)
+                              for classes in self.module_classes]
+        self.shown_methods = [array('i', xrange(len(cls.methods)))
+                              for cls in self.classes]
+        self.n_shown = self.n_tests
+        self.updateRows()
+    
+    def updateRows(self):
+        # The row of every module and class, for parent.
+        self.module_rows = array('i', [-1]) * len(self.modules)
+        self.class_rows = array('i', [-1]) * len(self.classes)
+        for row, module in enumerate(self.shown_modules):
+            self.module_rows[module] = row
+            for row, cls in enumerate(self.shown_classes[module]):
+                self.class_rows[cls] = row
+    
+    def addClasses(self, classes):
+        """ Add the TestClassRefs that are not in the tree yet. """
+        self.beginResetModel()
+        for cls in classes:
+            key = (cls.module, cls.name)
+            if key in self.class_index:
+                continue
+            module = self.module_index.get(cls.module)
+            if module is None:
+                module = self.module_index[cls.module] = len(self.modules)
+                self.modules.append(cls.module)
+                self.module_classes.append(array('i'))
+            index = self.class_index[key] = len(self.classes)
+            self.module_classes[module].append(index)
+            self.classes.append(cls)
+            self.class_module.append(module)
+            self.keys.append([
+                ('%s.%s.%s' % (cls.module, cls.name, method)).lower()
+                for method, descr in cls.methods
+            ])
+            self.checked.append(set())
+            self.n_tests += len(cls.methods)
+        self.filter(self.pattern, self.regex)
+        self.endResetModel()
+    
+    def setFilter(self, pattern, regex=False):
+        """ Show only the tests whose id (module.class.method) contains
+        pattern, ignoring case, or matches it if regex is true. Raise
+        re.error for an invalid regular expression. """
+        if (pattern, regex) == (self.pattern, self.regex):
+            return
+        if regex:
+            re.compile(pattern)
+        self.beginResetModel()
+        self.filter(pattern, regex)
+        self.endResetModel()
+    
+    def filter(self, pattern, regex):
+        if not pattern:
+            self.pattern, self.regex = pattern, regex
+            self.showAll()
+            return
+        if regex:
+            match = re.compile(pattern, re.IGNORECASE).search
+        else:
+            lower = pattern.lower()
+            match = lambda key: lower in key
+        # Only the tests shown can contain a string extending the last one.
+        if (not regex and not self.regex and self.pattern and
+                self.pattern.lower() in lower):
+            candidates = self.shown_methods
+        else:
+            candidates = [xrange(len(cls.methods)) for cls in self.classes]
+        shown_methods = []
+        for index, methods in enumerate(candidates):
+            keys = self.keys[index]
+            shown_methods.append(array('i', [
+                method for method in methods if match(keys[method])
+            ]))
+        self.pattern, self.regex = pattern, regex
+        self.shown_methods = shown_methods
+        self.shown_classes = [
+            array('i', [cls for cls in classes if shown_methods[cls]])
+            for classes in self.module_classes
+        ]
+        self.shown_modules = array('i', [
+            module for module, classes in enumerate(self.shown_classes)
+            if classes
+        ])
+        self.n_shown = sum(len(methods) for methods in shown_methods)
+        self.updateRows()
+    
+    # Module rows carry 0 as internal id, class rows their module index * 2
+    # + 1 and method rows their class index * 2 + 2.
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if row < 0 or column != 0:
+            return QtCore.QModelIndex()
+        if not parent.isValid():
+            if row < len(self.shown_modules):
+                return self.createIndex(row, column, 0)
+            return QtCore.QModelIndex()
+        module, cls, method = self.node(parent)
+        if cls == -1:
+            if row < len(self.shown_classes[module]):
+                return self.createIndex(row, column, module * 2 + 1)
+        elif method == -1:
+            if row < len(self.shown_methods[cls]):
+                return self.createIndex(row, column, cls * 2 + 2)
+        return QtCore.QModelIndex()
+    
+    def node(self, index):
+        """ Return the module, class and method index of index, -1 for the
+        levels below it. """
+        internal = index.internalId()
+        if internal == 0:
+            return self.shown_modules[index.row()], -1, -1
+        if internal % 2:
+            module = (internal - 1) // 2
+            return module, self.shown_classes[module][index.row()], -1
+        cls = (internal - 2) // 2
+        return (self.class_module[cls], cls,
+                self.shown_methods[cls][index.row()])
+    
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QtCore.QModelIndex()
+        internal = index.internalId()
+        if internal % 2:
+            module = (internal - 1) // 2
+            return self.createIndex(self.module_rows[module], 0, 0)
+        cls = (internal - 2) // 2
+        module = self.class_module[cls]
+        return self.createIndex(self.class_rows[cls], 0, module * 2 + 1)
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.shown_modules)
+        module, cls, method = self.node(parent)
+        if cls == -1:
+            return len(self.shown_classes[module])
+        if method == -1:
+            return len(self.shown_methods[cls])
+        return 0
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+    
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.ItemIsEnabled
+        return (QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable |
+                QtCore.Qt.ItemIsUserCheckable)
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return QtCore.QVariant()
+        module, cls, method = self.node(index)
+        if role == QtCore.Qt.CheckStateRole:
+            if cls == -1:
+                classes = self.shown_classes[module]
+            elif method == -1:
+                classes = [cls]
+            else:
+                return QtCore.QVariant(
+                    QtCore.Qt.Checked if method in self.checked[cls]
+                    else QtCore.Qt.Unchecked
+                )
+            return QtCore.QVariant(self.checkState(classes))
+        if role == QtCore.Qt.DisplayRole:
+            if cls == -1:
+                return QtCore.QVariant(self.modules[module])
+            if method == -1:
+                return QtCore.QVariant(self.classes[cls].name)
+            return QtCore.QVariant(self.classes[cls].methods[method][0])
+        elif role == QtCore.Qt.ToolTipRole:
+            if cls == -1:
+                cls = self.module_classes[module][0]
+                return QtCore.QVariant(self.classes[cls].path)
+            if method == -1:
+                cls = self.classes[cls]
+                return QtCore.QVariant('%s:%d' % (cls.path, cls.lineno))
+            descr = self.classes[cls].methods[method][1]
+            if descr:
+                return QtCore.QVariant(descr)
+        return QtCore.QVariant()
+    
+    def checkState(self, classes):
+        """ Return whether none, some or all of the tests shown of classes
+        are checked. """
+        shown = checked = 0
+        for cls in classes:
+            methods = self.shown_methods[cls]
+            selected = self.checked[cls]
+            shown += len(methods)
+            if not selected:
+                pass
+            elif len(methods) == len(self.classes[cls].methods):
+                checked += len(selected)
+            else:
+                checked += sum(1 for method in methods if method in selected)
+            if checked and checked != shown:
+                return QtCore.Qt.PartiallyChecked
+        return QtCore.Qt.Checked if checked else QtCore.Qt.Unchecked
+    
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole:
+            return False
+        check = value.toInt()[0] == QtCore.Qt.Checked
+        module, cls, method = self.node(index)
+        if method != -1:
+            selected = self.checked[cls]
+            if check and method not in selected:
+                selected.add(method)
+                self.n_selected += 1
+            elif not check and method in selected:
+                selected.remove(method)
+                self.n_selected -= 1
+            self.rowChanged(index)
+            self.rowChanged(index.parent())
+            self.rowChanged(index.parent().parent())
+            return True
+        if cls == -1:
+            self.check(self.shown_classes[module], check)
+            self.rowChanged(index)
+            self.changed(index, 2)
+        else:
+            self.check([cls], check)
+            self.rowChanged(index)
+            self.rowChanged(index.parent())
+            self.changed(index)
+        return True
+    
+    def check(self, classes, check):
+        """ Check or uncheck the tests of classes that are shown. """
+        for cls in classes:
+            selected = self.checked[cls]
+            before = len(selected)
+            if check:
+                selected.update(self.shown_methods[cls])
+            else:
+                selected.difference_update(self.shown_methods[cls])
+            self.n_selected += len(selected) - before
+    
+    def selectShown(self, check=True):
+        """ Check or uncheck all tests that are shown. """
+        self.check(xrange(len(self.classes)), check)
+        self.changed(QtCore.QModelIndex(), 3)
+    
+    def rowChanged(self, index):
+        self.emit(
+            QtCore.SIGNAL('dataChanged(const QModelIndex &, '
+                          'const QModelIndex &)'),
+            index, index
+        )
+    
+    def changed(self, parent, depth=1):
+        """ Emit dataChanged for the rows up to depth levels below parent,
+        a range of rows at a time. """
+        rows = self.rowCount(parent)
+        if not rows:
+            return
+        self.emit(
+            QtCore.SIGNAL('dataChanged(const QModelIndex &, '
+                          'const QModelIndex &)'),
+            self.index(0, 0, parent), self.index(rows - 1, 0, parent)
+        )
+        if depth > 1:
+            for row in xrange(rows):
+                self.changed(self.index(row, 0, parent), depth - 1)
+    
+    def selectedTests(self):
+        """ Return TestRefs for the tests that are checked, in the order
+        they were found. """
+        tests = []
+        for cls, selected in zip(self.classes, self.checked):
+            for method in sorted(selected):
+                tests.append(TestRef(cls, *cls.methods[method]))
+        return tests
+
+
+class QDiscoveryThread(QtCore.QThread):
+    """ Run discover and emit its result as discovered(classes, errors). """
+    def __init__(self, paths, index_path=INDEX_PATH):
+        QtCore.QThread.__init__(self)
+        self.paths = paths
+        self.index_path = index_path
+    
+    def run(self):
+        classes, errors = discover(self.paths, DiscoveryIndex(self.index_path))
+        self.emit(QtCore.SIGNAL('discovered'), classes, errors)
+
+
+class QSourceWatcher(QtCore.QObject):
+    """ Watch a set of files and emit changed(paths) once they stopped
+    changing for debounce seconds. Uses inotify where available and falls
+    back to comparing mtimes every poll seconds. """
+    def __init__(self, debounce=WATCH_DEBOUNCE, poll=WATCH_POLL,
+                 parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self.files = set()
+        self.mtimes = {}
+        self.changed = set()
+        
+        self.debounce = QtCore.QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(int(debounce * 1000))
+        self.connect(self.debounce, QtCore.SIGNAL('timeout()'), self.fire)
+        
+        self.notifier = None
+        self.timer = None
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError, TypeError):
+            self.inotify = None
+            self.timer = QtCore.QTimer(self)
+            self.timer.setInterval(int(poll * 1000))
+            self.connect(self.timer, QtCore.SIGNAL('timeout()'),
+                         self.pollFiles)
+            self.timer.start()
+        else:
+            self.notifier = QtCore.QSocketNotifier(
+                self.inotify.fd, QtCore.QSocketNotifier.Read, self
+            )
+            self.connect(self.notifier, QtCore.SIGNAL('activated(int)'),
+                         self.readEvents)
+    
+    @staticmethod
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+    
+    def setFiles(self, files):
+        self.files = set(files)
+        if self.inotify is not None:
+            for directory in set(os.path.dirname(f) for f in self.files):
+                try:
+                    self.inotify.watch(directory)
+                except OSError:
+                    pass
+        else:
+            self.mtimes = dict((f, self.mtime(f)) for f in self.files)
+    
+    def readEvents(self):
+        changed = self.inotify.read() & self.files
+        if changed:
+            self.changed |= changed
+            self.debounce.start()
+    
+    def pollFiles(self):
+        for path, mtime in self.mtimes.items():
+            current = self.mtime(path)
+            if current != mtime:
+                self.mtimes[path] = current
+                self.changed.add(path)
+                self.debounce.start()
+    
+    def fire(self):
+        changed, self.changed = self.changed, set()
+        self.emit(QtCore.SIGNAL('changed'), changed)
+    
+    def close(self):
+        self.debounce.stop()
+        if self.timer is not None:
+            self.timer.stop()
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.inotify.close()
+
+
+class QTestView(QtGui.QWidget):
+    def __init__(self, name, desc, outp, error, profile=None):
+        QtGui.QWidget.__init__(self)
+        
+        self.setWindowTitle("QTestudo - %s" % name)
+        
+        self.name = QtGui.QLineEdit(name)
+        self.name.setReadOnly(True)
+        
+        self.desc = QtGui.QLineEdit(desc)
+        self.name.setReadOnly(True)
+        
+        self.outp = QtGui.QTextEdit(self)
+        for line in outp.splitlines():
+            self.outp.append(line)
+        self.outp.setReadOnly(True)
+        
+        self.error = QtGui.QTextEdit(error, self)
+        for line in error.splitlines():
+            self.error.append(line)
+        self.error.setReadOnly(True)        
+        
+        first_line = QtGui.QHBoxLayout()
+        second_line = QtGui.QHBoxLayout()
+        
+        first_line.addWidget(QtGui.QLabel('Name:'))
+        first_line.addWidget(self.name)
+        second_line.addWidget(QtGui.QLabel('Description:'))
+        second_line.addWidget(self.desc)
+        
+        result = QtGui.QVBoxLayout()
+        result.addWidget(QtGui.QLabel('Test Output:'))
+        result.addWidget(self.outp)
+        result.addWidget(QtGui.QLabel('Traceback:'))
+        result.addWidget(self.error)
+        result_page = QtGui.QWidget(self)
+        result_page.setLayout(result)
+        
+        self.tabs = QtGui.QTabWidget(self)
+        self.tabs.addTab(result_page, 'Result')
+        if profile is not None:
+            self.tabs.addTab(QProfileView(profile, self), 'Profile')
+        
+        main = QtGui.QVBoxLayout()
+        main.addLayout(first_line)
+        main.addLayout(second_line)
+        main.addWidget(self.tabs)
+    
+        self.setLayout(main)
+        
+        self.spool = None
+        self.offset = 0
+        self.limit = core.OUTPUT_LIMIT
+        self.tail = QtCore.QTimer(self)
+        self.connect(self.tail, QtCore.SIGNAL('timeout()'), self.readSpool)
+    
+    def follow(self, spool, limit, interval=TAIL_INTERVAL):
+        """ Append what the running test writes to the file spool to the
+        output shown, until showResult is called; skip all but the last
+        half of limit bytes of what was written between reads, None for no
+        limit. """
+        self.spool = spool
+        self.offset = 0
+        self.limit = limit
+        self.tail.setInterval(int(interval * 1000))
+        self.tail.start()
+        self.readSpool()
+    
+    def readSpool(self):
+        try:
+            fd = os.open(self.spool, os.O_RDONLY)
+        except OSError:
+            self.tail.stop()
+            return
+        try:
+            size = os.fstat(fd).st_size
+            if size < self.offset:
+                # Truncated: the test is over and the next one started.
+                self.tail.stop()
+                return
+            limit = self.limit
+            if limit is not None and size - self.offset > limit:
+                skip = size - limit // 2
+                self.append(
+                    '\n[... %d bytes omitted ...]\n' % (skip - self.offset)
+                )
+                self.offset = skip
+            data = read_fd(fd, self.offset, size - self.offset)
+        finally:
+            os.close(fd)
+        self.offset += len(data)
+        self.append(data)
+    
+    def append(self, data):
+        if data:
+            self.outp.moveCursor(QtGui.QTextCursor.End)
+            self.outp.insertPlainText(data.decode('utf-8', 'replace'))
+    
+    def showResult(self, outp, error):
+        """ Stop following the output and show the result of the test. """
+        self.tail.stop()
+        self.outp.setPlainText(outp)
+        self.error.setPlainText(error)
+
+
+class QProfileModel(QtCore.QAbstractTableModel):
+    """ Table of the functions of a profile that took the most time of
+    their own, see hottest. """
+    COLUMNS = ['Function', 'Calls', 'Own (s)', 'Cumulative (s)']
+    
+    def __init__(self, n=PROFILE_ROWS, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.n = n
+        self.rows = []
+        self.sort_column = 2
+        self.sort_order = QtCore.Qt.DescendingOrder
+    
+    def setStats(self, stats):
+        self.beginResetModel()
+        self.rows = hottest(stats, self.n)
+        self._sort()
+        self.endResetModel()
+    
+    def _sort(self):
+        column = self.sort_column
+        self.rows.sort(
+            key=lambda row: row[column],
+            reverse=self.sort_order == QtCore.Qt.DescendingOrder
+        )
+    
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.emit(QtCore.SIGNAL('layoutAboutToBeChanged()'))
+        self._sort()
+        self.emit(QtCore.SIGNAL('layoutChanged()'))
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+            orientation == QtCore.Qt.Horizontal):
+            return QtCore.QVariant(self.COLUMNS[section])
+        return QtCore.QVariant()
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (role != QtCore.Qt.DisplayRole or not index.isValid() or
+            index.row() >= len(self.rows)):
+            return QtCore.QVariant()
+        value = self.rows[index.row()][index.column()]
+        if index.column() > 1:
+            value = '%.4f' % value
+        return QtCore.QVariant(value)
+
+
+class QProfileView(QtGui.QWidget):
+    """ Show the hottest functions of a profile (a dict as in
+    pstats.Stats.stats) and export it for pstats. """
+    def __init__(self, stats, parent=None):
+        QtGui.QWidget.__init__(self, parent)
+        self.stats = stats
+        
+        self.model = QProfileModel(parent=self)
+        self.model.setStats(stats)
+        self.table = QtGui.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(2, QtCore.Qt.DescendingOrder)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setResizeMode(
+            0, QtGui.QHeaderView.Stretch
+        )
+        
+        export = QtGui.QPushButton('&Export...', self)
+        self.connect(export, QtCore.SIGNAL('clicked()'), self.export)
+        
+        footer = QtGui.QHBoxLayout()
+        footer.addWidget(QtGui.QLabel(
+            '%d functions, the %d with the most time of their own are '
+            'shown.' % (len(stats), len(self.model.rows))
+        ), 1)
+        footer.addWidget(export)
+        
+        main = QtGui.QVBoxLayout()
+        main.addWidget(self.table)
+        main.addLayout(footer)
+        self.setLayout(main)
+    
+    def export(self):
+        path = QtGui.QFileDialog.getSaveFileName(
+            self, 'Export profile', '.', "Profile (*.prof)")
+        if not path:
+            return
+        try:
+            dump_stats(self.stats, unicode(path))
+        except EnvironmentError, exc:
+            QtGui.QMessageBox.warning(
+                self, 'Export profile', 'Could not save the profile: %s' % exc
+            )
+
+
+class QTestWindow(QtGui.QMainWindow):
+    def __init__(self):
+        QtGui.QMainWindow.__init__(self)
+        
+        self.setWindowTitle("QTestudo")
+        
+        self.cases = []
+        self.hotspots = None
+        self.history_view = None
+        self.result = QTestResult(self.updateStatus, self.indicateSuccess,
+                                  self.indicateFailure, self.reset)
+        self.runner = QTestRunner(self.result)
+        self.setCentralWidget(self.result)
+        
+        self.watcher = None
+        # Test module to the tests selected from it, while watching.
+        self.watched = {}
+        # Files that changed while a run was in progress.
+        self.changed = set()
+        
+        load = QtGui.QAction('&Open', self)
+        load.setShortcut('Ctrl+O')
+        load.setStatusTip('Load test cases')
+        self.connect(load, QtCore.SIGNAL('triggered()'),
+                     self.loadTestCases)
+        
+        run = QtGui.QAction('&Run', self)
+        run.setStatusTip('Run test cases')
+        self.connect(run, QtCore.SIGNAL('triggered()'),
+                     self.runTestCases)
+        
+        run_failed = QtGui.QAction('Run &Failed', self)
+        run_failed.setStatusTip('Run the tests that failed in the last run')
+        self.connect(run_failed, QtCore.SIGNAL('triggered()'),
+                     self.runFailed)
+        
+        stop = QtGui.QAction('&Stop', self)
+        stop.setStatusTip(
+            'Stop the run once the running tests are finished; again to '
+            'kill the workers right away'
+        )
+        self.connect(stop, QtCore.SIGNAL('triggered()'),
+                     self.stopRun)
+        
+        workers = QtGui.QAction('&Workers...', self)
+        workers.setStatusTip('Set the number of worker processes')
+        self.connect(workers, QtCore.SIGNAL('triggered()'),
+                     self.setWorkers)
+        
+        watch = QtGui.QAction('Wa&tch', self)
+        watch.setStatusTip(
+            'Run the tests affected by changes to their files as they are '
+            'saved'
+        )
+        watch.setCheckable(True)
+        self.connect(watch, QtCore.SIGNAL('toggled(bool)'),
+                     self.setWatching)
+        
+        menubar = self.menuBar()
+        
+        file_menu = menubar.addMenu('&File')
+        file_menu.addAction(load)
+        file_menu.addAction(run)
+        file_menu.addAction(run_failed)
+        file_menu.addAction(stop)
+        file_menu.addAction(watch)
+        
+        timeout = QtGui.QAction('&Timeout...', self)
+        timeout.setStatusTip(
+            'Set how long a test may run before its worker is killed'
+        )
+        self.connect(timeout, QtCore.SIGNAL('triggered()'),
+                     self.setTimeout)
+        
+        warm = QtGui.QAction('Keep Workers W&arm', self)
+        warm.setStatusTip(
+            'Keep the test modules imported in the workers between runs'
+        )
+        warm.setCheckable(True)
+        warm.setChecked(self.runner.warm)
+        self.connect(warm, QtCore.SIGNAL('toggled(bool)'),
+                     self.setWarm)
+        
+        incremental = QtGui.QAction('&Incremental Runs', self)
+        incremental.setStatusTip(
+            'Skip tests that passed before if nothing they import changed'
+        )
+        incremental.setCheckable(True)
+        incremental.setChecked(self.runner.incremental)
+        self.connect(incremental, QtCore.SIGNAL('toggled(bool)'),
+                     self.setIncremental)
+        
+        profile = QtGui.QAction('&Profile Tests', self)
+        profile.setStatusTip(
+            'Profile every test; see the Profile tab of its detailed view'
+        )
+        profile.setCheckable(True)
+        profile.setChecked(self.runner.profile)
+        self.connect(profile, QtCore.SIGNAL('toggled(bool)'),
+                     self.setProfile)
+        
+        self.measure_memory = QtGui.QAction('Measure &Memory', self)
+        self.measure_memory.setStatusTip(
+            'Record how much memory every test uses and flag leaks'
+        )
+        self.measure_memory.setCheckable(True)
+        self.measure_memory.setChecked(self.runner.measure_memory)
+        self.connect(self.measure_memory, QtCore.SIGNAL('toggled(bool)'),
+                     self.setMeasureMemory)
+        
+        budget = QtGui.QAction('Memory &Budget...', self)
+        budget.setStatusTip(
+            'Set how much memory a test may use before it is flagged'
+        )
+        self.connect(budget, QtCore.SIGNAL('triggered()'),
+                     self.setMemoryBudget)
+        
+        output_limit = QtGui.QAction('&Output Limit...', self)
+        output_limit.setStatusTip(
+            'Set how much of the output of every test is kept'
+        )
+        self.connect(output_limit, QtCore.SIGNAL('triggered()'),
+                     self.setOutputLimit)
+        
+        maxfail = QtGui.QAction('Stop After &Failures...', self)
+        maxfail.setStatusTip(
+            'Set after how many failed tests a run is stopped'
+        )
+        self.connect(maxfail, QtCore.SIGNAL('triggered()'),
+                     self.setMaxfail)
+        
+        agents = QtGui.QAction('&Agents...', self)
+        agents.setStatusTip(
+            'Set the worker agents on other hosts that also run tests'
+        )
+        self.connect(agents, QtCore.SIGNAL('triggered()'),
+                     self.setAgents)
+        
+        options_menu = menubar.addMenu('&Options')
+        options_menu.addAction(workers)
+        options_menu.addAction(agents)
+        options_menu.addAction(timeout)
+        options_menu.addAction(maxfail)
+        options_menu.addAction(warm)
+        options_menu.addAction(incremental)
+        options_menu.addAction(profile)
+        options_menu.addAction(self.measure_memory)
+        options_menu.addAction(budget)
+        options_menu.addAction(output_limit)
+        
+        hotspots = QtGui.QAction('&Hotspots...', self)
+        hotspots.setStatusTip(
+            'Show the functions that took the most time across all profiled '
+            'tests'
+        )
+        self.connect(hotspots, QtCore.SIGNAL('triggered()'),
+                     self.showHotspots)
+        
+        history = QtGui.QAction('H&istory...', self)
+        history.setStatusTip(
+            'Show earlier runs and what changed between them'
+        )
+        self.connect(history, QtCore.SIGNAL('triggered()'),
+                     self.showHistory)
+        
+        view_menu = menubar.addMenu('&View')
+        view_menu.addAction(hotspots)
+        view_menu.addAction(history)
+        self.statusBar().showMessage('')
+    
+    def closeEvent(self, event):
+        self.setWatching(False)
+        self.runner.shutdown()
+        QtGui.QMainWindow.closeEvent(self, event)
+    
+    def reset(self):
+        self.statusBar().showMessage('')
+        self.statusBar().setStyleSheet('')
+    
+    def indicateSuccess(self, elapsed):
+        # self.colorStatusBar('#B2FF7F')
+        self.statusBar().showMessage(summary(self.result, elapsed))
+        self.runChanged()
+    
+    def indicateFailure(self, elapsed):
+        # self.colorStatusBar('#FFB2B2')
+        self.statusBar().showMessage(summary(self.result, elapsed))
+        self.runChanged()
+    
+    def colorStatusBar(self, color):
+        self.statusBar().setStyleSheet("QStatusBar {\n"
+         "background: %s;\n"
+         "}" % color)
+    
+    def updateStatus(self, test):
+        self.statusBar().showMessage(test)
+    
+    def loadTestCases(self):
+        selector = QTestLoader()
+        if selector.exec_():
+            self.cases[:] = selector.selected
+            if self.watcher is not None:
+                self.updateWatch()
+    
+    def setWorkers(self):
+        workers, ok = QtGui.QInputDialog.getInteger(
+            self, 'Workers', 'Number of worker processes:',
+            self.runner.workers, 1, 1024
+        )
+        if ok:
+            self.runner.workers = workers
+    
+    def setAgents(self):
+        text = ', '.join('%s:%d' % address for address in self.runner.agents)
+        while True:
+            text, ok = QtGui.QInputDialog.getText(
+                self, 'Agents',
+                'Agents to run tests on, as HOST[:PORT][*WORKERS], ...:',
+                QtGui.QLineEdit.Normal, text
+            )
+            if not ok:
+                return
+            try:
+                self.runner.agents = agent_addresses(unicode(text))
+            except ValueError:
+                continue
+            return
+    
+    def setTimeout(self):
+        timeout, ok = QtGui.QInputDialog.getDouble(
+            self, 'Timeout', 'Seconds a test may run (0 for no limit):',
+            self.runner.timeout or 0, 0, 86400, 1
+        )
+        if ok:
+            self.runner.timeout = timeout or None
+    
+    def setOutputLimit(self):
+        limit, ok = QtGui.QInputDialog.getInteger(
+            self, 'Output Limit',
+            'KiB of output kept of every test (0 for no limit):',
+            (self.runner.output_limit or 0) // 1024, 0, 1 << 21
+        )
+        if ok:
+            self.runner.output_limit = limit * 1024 or None
+            self.result.output_limit = self.runner.output_limit
+    
+    def setMaxfail(self):
+        maxfail, ok = QtGui.QInputDialog.getInteger(
+            self, 'Stop After Failures',
+            'Failed tests after which a run is stopped (0 for none):',
+            self.runner.maxfail or 0, 0, 1 << 30
+        )
+        if ok:
+            self.runner.maxfail = maxfail or None
+    
+    def stopRun(self):
+        if not self.runner.isRunning():
+            self.statusBar().showMessage('No tests are running.')
+        elif self.runner.cancelled:
+            self.runner.stop()
+        else:
+            self.runner.cancel()
+            self.statusBar().showMessage(
+                'Stopping once the running tests are finished.'
+            )
+    
+    def setMemoryBudget(self):
+        budget, ok = QtGui.QInputDialog.getDouble(
+            self, 'Memory Budget',
+            'MiB of memory a test may use (0 for no limit):',
+            (self.result.memory_budget or 0) / float(1 << 20), 0, 1 << 20, 1
+        )
+        if ok:
+            self.result.memory_budget = int(budget * (1 << 20)) or None
+            if self.result.memory_budget is not None:
+                # There is no budget to keep without measuring.
+                self.measure_memory.setChecked(True)
+    
+    def setMeasureMemory(self, measure):
+        self.runner.measure_memory = measure
+    
+    def setIncremental(self, incremental):
+        self.runner.incremental = incremental
+    
+    def setProfile(self, profile):
+        self.runner.profile = profile
+    
+    def showHotspots(self):
+        profiles = self.result.profiles
+        if not profiles:
+            self.statusBar().showMessage(
+                'No tests were profiled; check Options->Profile Tests and '
+                'run them.'
+            )
+            return
+        self.hotspots = QProfileView(profiles.total)
+        self.hotspots.setWindowTitle(
+            'QTestudo - Hotspots of %d tests' % len(profiles)
+        )
+        self.hotspots.show()
+    
+    def showHistory(self):
+        history = self.result.openHistory()
+        if history is None or not len(history):
+            self.statusBar().showMessage('No runs have been recorded.')
+            return
+        self.history_view = QHistoryView(history)
+        self.history_view.setWindowTitle(
+            'QTestudo - History of %d runs' % len(history)
+        )
+        self.history_view.show()
+    
+    def setWarm(self, warm):
+        self.runner.warm = warm
+        if not warm:
+            self.runner.shutdown()
+    
+    def runTestCases(self):
+        if not self.cases:
+            self.statusBar().showMessage('No TestCases selected.')
+        else:
+            suite = TestSuite(self.cases)
+            self.runner.run(suite)
+            if self.runner.unreachable:
+                QtGui.QMessageBox.warning(
+                    self, 'Agents', 'Running without these agents:\n%s' %
+                    '\n'.join('%s:%d: %s' % (address + (reason,))
+                              for address, reason in self.runner.unreachable)
+                )
+    
+    def setWatching(self, watching):
+        if not watching:
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+            self.watched = {}
+            self.changed = set()
+            return
+        if self.watcher is None:
+            self.watcher = QSourceWatcher(parent=self)
+            self.connect(self.watcher, QtCore.SIGNAL('changed'),
+                         self.sourcesChanged)
+        self.updateWatch()
+    
+    def updateWatch(self):
+        """ Watch the files the selected tests depend on. """
+        if self.runner.graph is None:
+            self.runner.graph = ImportGraph()
+        graph = self.runner.graph
+        self.watched = {}
+        for test in flatten_suite(TestSuite(self.cases)):
+            path = test_path(test)
+            if path is not None and os.path.isfile(path):
+                self.watched.setdefault(os.path.abspath(path), []).append(test)
+        files = set()
+        for path in self.watched:
+            files |= graph.dependencies(path)
+        self.watcher.setFiles(files)
+    
+    def sourcesChanged(self, paths):
+        self.changed |= paths
+        if not self.runner.isRunning():
+            self.runChanged()
+    
+    def runChanged(self):
+        """ Run the watched tests that depend on files that changed. """
+        if not self.changed or self.watcher is None:
+            return
+        changed, self.changed = self.changed, set()
+        graph = self.runner.graph
+        tests = []
+        for path, module_tests in self.watched.iteritems():
+            if graph.dependencies(path) & changed:
+                tests.extend(module_tests)
+        # Changed files may import different files now.
+        self.updateWatch()
+        if tests:
+            self.runner.run(TestSuite(tests), update=True)
+    
+    def runFailed(self):
+        selected = list(flatten_suite(TestSuite(self.cases)))
+        tests = failed_tests(selected or self.runner.tests,
+                             self.result.failedNames())
+        if not tests:
+            self.statusBar().showMessage('No failed tests.')
+        else:
+            # Cached results could only be passes, which is not what we are
+            # after here.
+            incremental = self.runner.incremental
+            self.runner.incremental = False
+            try:
+                self.runner.run(TestSuite(tests))
+            finally:
+                self.runner.incremental = incremental
+
+
+def record_data(store, record, role):
+    """ Return what a model showing the results in store has for the row
+    of record and role. """
+    if role == QtCore.Qt.DisplayRole:
+        notes = ['%.3f s' % store.wall(record)]
+        if store.isCached(record):
+            notes.append('cached')
+        if store.hasFlag(record, LEAKED):
+            notes.append('leaked %s' % megabytes(store.growth(record)))
+        if store.hasFlag(record, OVER_BUDGET):
+            notes.append('over memory budget')
+        return QtCore.QVariant('%s [%s]' % (
+            store.name(record), ', '.join(notes)
+        ))
+    elif role == QtCore.Qt.ToolTipRole:
+        tip = 'Wall: %.3f s, CPU: %.3f s' % (
+            store.wall(record), store.cpu(record)
+        )
+        if store.peak(record):
+            tip += '\nPeak memory: %s, retained: %s' % (
+                megabytes(store.peak(record)),
+                megabytes(store.growth(record))
+            )
+        descr = store.descr(record)
+        if descr:
+            tip = '%s\n%s' % (descr, tip)
+        return QtCore.QVariant(tip)
+    elif role == QtCore.Qt.FontRole:
+        return QtCore.QVariant(QResultListModel.font(store.hasOutput(record)))
+    return QtCore.QVariant()
+
+
+class QResultListModel(QtCore.QAbstractListModel):
+    """ List of the records of a ResultStore that have one outcome. Fonts
+    and tooltips are only produced when the view asks for them, that is
+    for the rows that are visible. """
+    _fonts = None
+    
+    def __init__(self, store, parent=None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.store = store
+        self.records = array('i')
+        self.pending = array('i')
+    
+    @classmethod
+    def font(cls, italic):
+        if cls._fonts is None:
+            plain = QtGui.QFont()
+            italics = QtGui.QFont()
+            italics.setItalic(True)
+            cls._fonts = (plain, italics)
+        return cls._fonts[italic]
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.records)
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.records):
+            return QtCore.QVariant()
+        return record_data(self.store, self.records[index.row()], role)
+    
+    def record(self, row):
+        return self.records[row]
+    
+    def append(self, record):
+        """ Queue record to be inserted by the next call to commit. """
+        self.pending.append(record)
+    
+    def commit(self):
+        """ Insert the queued records as one block of rows. Return whether
+        there were any. """
+        if not self.pending:
+            return False
+        row = len(self.records)
+        self.beginInsertRows(QtCore.QModelIndex(), row,
+                             row + len(self.pending) - 1)
+        self.records.extend(self.pending)
+        self.pending = array('i')
+        self.endInsertRows()
+        return True
+    
+    def setRecords(self, records):
+        """ Show records, in that order, instead of the rows so far. """
+        self.beginResetModel()
+        self.records = array('i', records)
+        self.pending = array('i')
+        self.endResetModel()
+    
+    def remove(self, record):
+        """ Remove the row of record, if there is one. """
+        self.commit()
+        try:
+            row = self.records.index(record)
+        except ValueError:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.records[row]
+        self.endRemoveRows()
+    
+    def clear(self):
+        self.beginResetModel()
+        self.records = array('i')
+        self.pending = array('i')
+        self.endResetModel()
+
+
+class QClusterModel(QtCore.QAbstractItemModel):
+    """ Tree of the records of a ResultStore that have one outcome, grouped
+    by their traceback (see ResultStore.tracebackId): a row for every
+    distinct traceback, saying how many tests failed that way, with a
+    child row for each of those tests. Like QResultListModel, records are
+    queued by append and inserted by commit. """
+    # How a cluster row is shown at most.
+    TITLE_LENGTH = 120
+    
+    def __init__(self, store, parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self.store = store
+        self.clearClusters()
+    
+    def clearClusters(self):
+        # Traceback id, title and records of every cluster, by row.
+        self.clusters = []
+        self.titles = []
+        self.members = []
+        # Row of every cluster by traceback id.
+        self.rows = {}
+        self.pending = array('i')
+    
+    def title(self, traceback_id):
+        """ Return the last line of the traceback, which names the
+        exception. """
+        if traceback_id == -1:
+            return '(no traceback)'
+        lines = self.store.readTraceback(traceback_id).strip().splitlines()
+        title = lines[-1] if lines else ''
+        if len(title) > self.TITLE_LENGTH:
+            title = title[:self.TITLE_LENGTH - 3] + '...'
+        return title
+    
+    # Children carry the row of their cluster + 1 as internal id, top level
+    # rows 0.
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            if 0 <= row < len(self.clusters):
+                return self.createIndex(row, column, 0)
+        elif parent.internalId() == 0:
+            if 0 <= row < len(self.members[parent.row()]):
+                return self.createIndex(row, column, parent.row() + 1)
+        return QtCore.QModelIndex()
+    
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, 0)
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.clusters)
+        if parent.internalId() == 0:
+            return len(self.members[parent.row()])
+        return 0
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return QtCore.QVariant()
+        record = self.recordAt(index)
+        if record is not None:
+            return record_data(self.store, record, role)
+        row = index.row()
+        if role == QtCore.Qt.DisplayRole:
+            count = len(self.members[row])
+            return QtCore.QVariant('%s [%d test%s]' % (
+                self.titles[row], count, '' if count == 1 else 's'
+            ))
+        elif role == QtCore.Qt.ToolTipRole and self.clusters[row] != -1:
+            return QtCore.QVariant(
+                self.store.readTraceback(self.clusters[row])
+            )
+        return QtCore.QVariant()
+    
+    def recordAt(self, index):
+        """ Return the record of the test row index, None for a cluster. """
+        if not index.isValid() or index.internalId() == 0:
+            return None
+        return self.members[index.internalId() - 1][index.row()]
+    
+    def append(self, record):
+        """ Queue record to be inserted by the next call to commit. """
+        self.pending.append(record)
+    
+    def changed(self, row):
+        index = self.index(row, 0)
+        self.emit(
+            QtCore.SIGNAL('dataChanged(const QModelIndex &, '
+                          'const QModelIndex &)'),
+            index, index
+        )
+    
+    def commit(self):
+        """ Insert the queued records, a block of rows per cluster they
+        belong to. Return whether there were any. """
+        if not self.pending:
+            return False
+        grown = {}
+        new = []
+        for record in self.pending:
+            traceback_id = self.store.tracebackId(record)
+            row = self.rows.get(traceback_id)
+            if row is None:
+                row = self.rows[traceback_id] = (
+                    len(self.clusters) + len(new)
+                )
+                new.append((traceback_id, array('i')))
+            if row < len(self.clusters):
+                grown.setdefault(row, array('i')).append(record)
+            else:
+                new[row - len(self.clusters)][1].append(record)
+        self.pending = array('i')
+        for row, records in grown.iteritems():
+            members = self.members[row]
+            self.beginInsertRows(self.index(row, 0), len(members),
+                                 len(members) + len(records) - 1)
+            members.extend(records)
+            self.endInsertRows()
+            self.changed(row)
+        if new:
+            row = len(self.clusters)
+            self.beginInsertRows(QtCore.QModelIndex(), row,
+                                 row + len(new) - 1)
+            for traceback_id, records in new:
+                self.clusters.append(traceback_id)
+                self.titles.append(self.title(traceback_id))
+                self.members.append(records)
+            self.endInsertRows()
+        return True
+    
+    def remove(self, record):
+        """ Remove the row of record, and its cluster if that was the last
+        one in it. """
+        self.commit()
+        row = self.rows.get(self.store.tracebackId(record))
+        if row is None:
+            return
+        members = self.members[row]
+        try:
+            child = members.index(record)
+        except ValueError:
+            return
+        if len(members) > 1:
+            self.beginRemoveRows(self.index(row, 0), child, child)
+            del members[child]
+            self.endRemoveRows()
+            self.changed(row)
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.clusters[row]
+        del self.titles[row]
+        del self.members[row]
+        self.rows = dict(
+            (traceback_id, row)
+            for row, traceback_id in enumerate(self.clusters)
+        )
+        self.endRemoveRows()
+    
+    def setRecords(self, records):
+        """ Show records instead of the rows so far. """
+        self.clear()
+        self.pending.extend(records)
+        self.commit()
+    
+    def clear(self):
+        self.beginResetModel()
+        self.clearClusters()
+        self.endResetModel()
+
+
+class QSlowestModel(QtCore.QAbstractTableModel):
+    """ Table of the n slowest results of a ResultStore. They are tracked
+    in a heap as results come in, so the table is cheap to keep current. """
+    COLUMNS = ['Test', 'Wall (s)', 'CPU (s)', 'Outcome', 'Peak (MiB)',
+               'Retained (MiB)']
+    OUTCOMES = ['Passed', 'Failed', 'Error']
+    
+    def __init__(self, store, n=None, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.store = store
+        self.n = core.SLOWEST if n is None else n
+        self.heap = []
+        self.records = []
+        self.dirty = False
+        self.sort_column = 1
+        self.sort_order = QtCore.Qt.DescendingOrder
+    
+    def add(self, record):
+        entry = (self.store.wall(record), record)
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+        else:
+            return
+        self.dirty = True
+    
+    def discard(self, record):
+        """ Stop showing record, which was superseded by a newer result. """
+        heap = [entry for entry in self.heap if entry[1] != record]
+        if len(heap) != len(self.heap):
+            heapq.heapify(heap)
+            self.heap = heap
+            self.dirty = True
+    
+    def setN(self, n):
+        self.n = n
+        self.heap = []
+        for record in heapq.nlargest(n, xrange(len(self.store)),
+                                     key=self.store.wall):
+            self.add(record)
+        self.dirty = True
+        self.commit()
+    
+    def commit(self):
+        """ Show the current n slowest results. """
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.emit(QtCore.SIGNAL('layoutAboutToBeChanged()'))
+        self.records = [record for wall, record in self.heap]
+        self._sort()
+        self.emit(QtCore.SIGNAL('layoutChanged()'))
+    
+    def clear(self):
+        self.beginResetModel()
+        self.heap = []
+        self.records = []
+        self.dirty = False
+        self.endResetModel()
+    
+    def key(self, column):
+        store = self.store
+        return [store.name, store.wall, store.cpu, store.outcome,
+                store.peak, store.growth][column]
+    
+    def _sort(self):
+        self.records.sort(
+            key=self.key(self.sort_column),
+            reverse=self.sort_order == QtCore.Qt.DescendingOrder
+        )
+    
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.emit(QtCore.SIGNAL('layoutAboutToBeChanged()'))
+        self._sort()
+        self.emit(QtCore.SIGNAL('layoutChanged()'))
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.records)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+            orientation == QtCore.Qt.Horizontal):
+            return QtCore.QVariant(self.COLUMNS[section])
+        return QtCore.QVariant()
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (role != QtCore.Qt.DisplayRole or not index.isValid() or
+            index.row() >= len(self.records)):
+            return QtCore.QVariant()
+        record = self.records[index.row()]
+        column = index.column()
+        value = self.key(column)(record)
+        if column in (1, 2):
+            value = '%.3f' % value
+        elif column == 3:
+            value = self.OUTCOMES[value]
+        elif column > 3:
+            value = '%.1f' % (value / float(1 << 20))
+        return QtCore.QVariant(value)
+    
+    def record(self, row):
+        return self.records[row]
+
+
+class QRunListModel(QtCore.QAbstractTableModel):
+    """ Table of the runs in a RunHistory, the latest first. Rows are read
+    HISTORY_PAGE at a time as the view scrolls down to them. """
+    COLUMNS = ['Started', 'Tests', 'Failures', 'Errors', 'Elapsed (s)']
+    
+    def __init__(self, history, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.history = history
+        self.total = len(history)
+        self.rows = []
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+    
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and len(self.rows) < self.total
+    
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        rows = self.history.runs(HISTORY_PAGE, len(self.rows))
+        if not rows:
+            self.total = len(self.rows)
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.rows),
+                             len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+            orientation == QtCore.Qt.Horizontal):
+            return QtCore.QVariant(self.COLUMNS[section])
+        return QtCore.QVariant()
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (role != QtCore.Qt.DisplayRole or not index.isValid() or
+            index.row() >= len(self.rows)):
+            return QtCore.QVariant()
+        run, started, elapsed, tests, failures, errors = self.rows[
+            index.row()
+        ]
+        value = [
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)),
+            tests, failures, errors, '%.3f' % elapsed
+        ][index.column()]
+        return QtCore.QVariant(value)
+    
+    def run(self, row):
+        return self.rows[row][0]
+
+
+class QRunModel(QtCore.QAbstractTableModel):
+    """ Table of the results of a HistoryRun. Test names are looked up for
+    the rows that are shown only. """
+    COLUMNS = ['Test', 'Outcome', 'Wall (s)', 'CPU (s)']
+    
+    def __init__(self, run, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.run = run
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.run)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+            orientation == QtCore.Qt.Horizontal):
+            return QtCore.QVariant(self.COLUMNS[section])
+        return QtCore.QVariant()
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if (role != QtCore.Qt.DisplayRole or not index.isValid() or
+            index.row() >= len(self.run)):
+            return QtCore.QVariant()
+        indx = index.row()
+        column = index.column()
+        run = self.run
+        if column == 0:
+            value = run.name(indx)
+        elif column == 1:
+            value = QSlowestModel.OUTCOMES[run.outcome(indx)]
+        elif column == 2:
+            value = '%.3f' % run.wall(indx)
+        else:
+            value = '%.3f' % run.cpu(indx)
+        return QtCore.QVariant(value)
+    
+    def details(self, row):
+        """ Return the arguments for a QTestView of the result in row. """
+        run = self.run
+        return run.name(row), '', run.output(row), run.traceback(row)
+
+
+class QRunDiffModel(QtCore.QAbstractTableModel):
+    """ Table of the changes from the HistoryRun before to after, see
+    diff_runs; new failures first, then fixes, then slower tests. """
+    COLUMNS = ['Test', 'Change', 'Before (s)', 'After (s)']
+    CHANGES = ['New failure', 'Fixed', 'Slower']
+    COLORS = [RED_COLOR, GREEN_COLOR, YELLOW_COLOR]
+    
+    def __init__(self, before, after, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.before = before
+        self.after = after
+        self.changes = sorted(diff_runs(before, after),
+                              key=lambda change: (change[0], change[2]))
+        after.prefetch([change[2] for change in self.changes])
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.changes)
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+            orientation == QtCore.Qt.Horizontal):
+            return QtCore.QVariant(self.COLUMNS[section])
+        return QtCore.QVariant()
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.changes):
+            return QtCore.QVariant()
+        kind, old, new = self.changes[index.row()]
+        if role == QtCore.Qt.BackgroundRole:
+            return QtCore.QVariant(QtGui.QColor(self.COLORS[kind]))
+        if role != QtCore.Qt.DisplayRole:
+            return QtCore.QVariant()
+        column = index.column()
+        if column == 0:
+            value = self.after.name(new)
+        elif column == 1:
+            value = self.CHANGES[kind]
+        elif column == 2:
+            value = '' if old is None else '%.3f' % self.before.wall(old)
+        else:
+            value = '%.3f' % self.after.wall(new)
+        return QtCore.QVariant(value)
+    
+    def details(self, row):
+        """ Return the arguments for a QTestView of the newer result in
+        row. """
+        new = self.changes[row][2]
+        after = self.after
+        return after.name(new), '', after.output(new), after.traceback(new)
+
+
+class QHistoryView(QtGui.QWidget):
+    """ Browse the runs of a RunHistory: select a run to see its results,
+    or two runs (or check the box to compare with the one before) to see
+    what changed between them. Double click a result for its output and
+    traceback. """
+    def __init__(self, history, parent=None):
+        QtGui.QWidget.__init__(self, parent)
+        self.history = history
+        self.views = []
+        
+        self.runs_model = QRunListModel(history, self)
+        self.runs = QtGui.QTableView(self)
+        self.runs.setModel(self.runs_model)
+        self.runs.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+        self.runs.setSelectionMode(
+            QtGui.QAbstractItemView.ExtendedSelection
+        )
+        self.runs.verticalHeader().hide()
+        self.connect(
+            self.runs.selectionModel(),
+            QtCore.SIGNAL('selectionChanged(const QItemSelection &, '
+                          'const QItemSelection &)'),
+            self.showSelected
+        )
+        
+        self.compare = QtGui.QCheckBox('Compare with the run before', self)
+        self.compare.setChecked(True)
+        self.connect(self.compare, QtCore.SIGNAL('toggled(bool)'),
+                     self.showSelected)
+        
+        self.results = QtGui.QTableView(self)
+        self.results.verticalHeader().hide()
+        self.results.horizontalHeader().setStretchLastSection(True)
+        self.connect(
+            self.results,
+            QtCore.SIGNAL("doubleClicked ( const QModelIndex & )"),
+            self.showResult
+        )
+        self.summary = QtGui.QLabel(self)
+        
+        left = QtGui.QVBoxLayout()
+        left.addWidget(QtGui.QLabel('Runs:'))
+        left.addWidget(self.runs)
+        left.addWidget(self.compare)
+        
+        right = QtGui.QVBoxLayout()
+        right.addWidget(self.summary)
+        right.addWidget(self.results)
+        
+        main = QtGui.QHBoxLayout()
+        main.addLayout(left, 1)
+        main.addLayout(right, 2)
+        self.setLayout(main)
+    
+    def showSelected(self, *args):
+        rows = sorted(index.row() for index in
+                      self.runs.selectionModel().selectedRows())
+        if not rows:
+            return
+        after = self.runs_model.run(rows[0])
+        before = None
+        if len(rows) > 1:
+            before = self.runs_model.run(rows[-1])
+        elif self.compare.isChecked():
+            before = self.history.previous(after)
+        after_run = self.history.load(after)
+        if before is None:
+            model = QRunModel(after_run, self)
+            self.summary.setText('Run %d: %d tests.' % (after, len(model.run)))
+        else:
+            model = QRunDiffModel(self.history.load(before), after_run, self)
+            counts = [0, 0, 0]
+            for change in model.changes:
+                counts[change[0]] += 1
+            self.summary.setText(
+                'Run %d compared with run %d: %d new failures, %d fixed, '
+                '%d slower.' % ((after, before) + tuple(counts))
+            )
+        self.results.setModel(model)
+        self.results.horizontalHeader().setResizeMode(
+            0, QtGui.QHeaderView.Stretch
+        )
+    
+    def showResult(self, index):
+        view = QTestView(*self.results.model().details(index.row()))
+        view.show()
+        self.views.append(view)
+
+
+class QTestResult(QtGui.QWidget, TestResult):
+    def __init__(self, status=None, on_success=None, on_failure=None,
+                 reset=None):
+        TestResult.__init__(self)
+        QtGui.QWidget.__init__(self)
+        
+        self.status = status
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.reset = reset
+        
+        self.progress = QtGui.QProgressBar(self)
+        if COLORED_PROGRESS:
+            self.setProgressColor(BLUE_COLOR)
+        
+        self.store = ResultStore()
+        self.search = SearchIndex(self.store)
+        self.profiles = ProfileStats()
+        self.models = {}
+        self.lists = {}
+        self.success = self.makeView(SUCCESS)
+        self.fail = self.makeView(FAILURE)
+        self.error = self.makeView(ERROR)
+        
+        self.slowest_model = QSlowestModel(self.store, parent=self)
+        self.slowest = QtGui.QTableView(self)
+        self.slowest.setModel(self.slowest_model)
+        self.slowest.setSortingEnabled(True)
+        self.slowest.sortByColumn(1, QtCore.Qt.DescendingOrder)
+        self.slowest.verticalHeader().hide()
+        self.slowest.horizontalHeader().setStretchLastSection(True)
+        self.connect(
+            self.slowest,
+            QtCore.SIGNAL("doubleClicked ( const QModelIndex & )"),
+            lambda index: self.itemDoubleClicked(self.slowest_model, index)
+        )
+        self.slowest_n = QtGui.QSpinBox(self)
+        self.slowest_n.setRange(1, 10000)
+        self.slowest_n.setValue(self.slowest_model.n)
+        self.connect(self.slowest_n, QtCore.SIGNAL('valueChanged(int)'),
+                     self.slowest_model.setN)
+        
+        # What the results shown are searched for, None for all results,
+        # and how many results were found.
+        self.query = None
+        self.n_found = 0
+        self.search_line = QtGui.QLineEdit(self)
+        self.search_count = QtGui.QLabel(self)
+        # Search once typing pauses rather than on every key.
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.connect(self.search_line,
+                     QtCore.SIGNAL('textChanged(const QString &)'),
+                     lambda text: self.search_timer.start(
+                         int(FILTER_DELAY * 1000)
+                     ))
+        self.connect(self.search_timer, QtCore.SIGNAL('timeout()'),
+                     self.applySearch)
+        
+        self.views = []
+        # Views of running tests, by test name, see followTest.
+        self.following = {}
+        # Returns the file the output of a running test goes to, or None;
+        # set by QTestRunner.
+        self.spool_of = None
+        # Bytes of output kept of every test, see TestRunner; set by
+        # QTestRunner.
+        self.output_limit = core.OUTPUT_LIMIT
+        
+        self.running = QtGui.QListWidget(self)
+        # Item of every running test, by test name.
+        self.running_items = {}
+        self.connect(
+            self.running,
+            QtCore.SIGNAL("itemDoubleClicked ( QListWidgetItem * )"),
+            self.followTest
+        )
+        
+        # Nesting depth of beginUpdate/endUpdate.
+        self.updating = 0
+        self.current = None
+        
+        self.n_started = 0
+        self.n_success = 0
+        self.n_fail = 0
+        self.n_error = 0
+        self.n_cached = 0
+        self.n_leaked = 0
+        self.n_over_budget = 0
+        # Bytes of memory a test may use before it is flagged, see
+        # memory_flags.
+        self.memory_budget = core.MEMORY_BUDGET
+        # Latest record of every test name while results are updated in
+        # place, see enter.
+        self.by_name = None
+        # Seconds from the start of the last run until its first test.
+        self.first_test = None
+        # Fraction of the last run each worker spent running tests.
+        self.utilization = []
+        # Tests the last run did not get to because it was cancelled.
+        self.n_not_run = 0
+        # Where every run is recorded, None to not record them; see
+        # openHistory.
+        self.history_dir = HISTORY_DIR
+        self.history = None
+        
+        left = QtGui.QVBoxLayout()
+        left.addWidget(QtGui.QLabel('Running Tests:'))
+        left.addWidget(self.running, 0)
+        left.addWidget(QtGui.QLabel('Passed Tests:'))
+        left.addWidget(self.success)
+        left.addWidget(self.progress)
+        
+        right = QtGui.QVBoxLayout()
+        right.addWidget(QtGui.QLabel('Tests with Errors:'))
+        right.addWidget(self.error)
+        right.addWidget(QtGui.QLabel('Failed Tests:'))
+        right.addWidget(self.fail)
+        
+        slowest_header = QtGui.QHBoxLayout()
+        slowest_header.addWidget(QtGui.QLabel('Slowest Tests:'), 1)
+        slowest_header.addWidget(self.slowest_n)
+        right.addLayout(slowest_header)
+        right.addWidget(self.slowest)
+        
+        search = QtGui.QHBoxLayout()
+        search.addWidget(QtGui.QLabel('Search:'))
+        search.addWidget(self.search_line, 1)
+        search.addWidget(self.search_count)
+        
+        lists = QtGui.QHBoxLayout()
+        lists.addLayout(left)
+        lists.addLayout(right)
+        
+        main = QtGui.QVBoxLayout()
+        main.addLayout(search)
+        main.addLayout(lists)
+        
+        self.setLayout(main)
+        
+        self.translate = {
+            'success': self.addSuccess,'failure': self.addFailure,
+            'error': self.addError, 'start': self.startTest,
+            'profile': self.addProfile, 'done': self.done
+        }
+    
+    def makeView(self, outcome):
+        if outcome == SUCCESS:
+            model = QResultListModel(self.store, self)
+            view = QtGui.QListView(self)
+            # Lets the view lay out any number of rows without asking the
+            # model for each of them.
+            view.setUniformItemSizes(True)
+            record = lambda index: model.record(index.row())
+        else:
+            model = QClusterModel(self.store, self)
+            view = QtGui.QTreeView(self)
+            view.setUniformRowHeights(True)
+            view.setHeaderHidden(True)
+            record = model.recordAt
+        view.setModel(model)
+        self.models[outcome] = model
+        self.lists[outcome] = view
+        self.connect(
+            view,
+            QtCore.SIGNAL("doubleClicked ( const QModelIndex & )"),
+            lambda index: self.showRecord(record(index))
+        )
+        return view
+    
+    def applySearch(self):
+        """ Show only the results whose name, description or traceback
+        contain all words typed into the search box. """
+        self.search_timer.stop()
+        query = unicode(self.search_line.text()).strip() or None
+        if query == self.query:
+            return
+        self.query = query
+        if query is None:
+            records = (record for record in xrange(len(self.store))
+                       if record not in self.search.discarded)
+        else:
+            records = sorted(self.search.search(query))
+            self.n_found = len(records)
+        self.showFound()
+        shown = dict((outcome, array('i')) for outcome in self.models)
+        outcomes = self.store.outcomes
+        for record in records:
+            shown[outcomes[record]].append(record)
+        for outcome, model in self.models.iteritems():
+            model.setRecords(shown[outcome])
+    
+    def showFound(self):
+        if self.query is None:
+            self.search_count.setText('')
+        else:
+            self.search_count.setText('%d found' % self.n_found)
+    
+    def setProgressColor(self, color):
+        self.progress.setStyleSheet(""" QProgressBar {
+     border: 2px solid grey;
+     border-radius: 5px;
+     text-align: center;
+ }
+QProgressBar::chunk {
+     background-color: %s;
+     width: 1px;
+}""" % color)
+    
+    def setAmount(self, amount):
+        self.n_started = 0
+        self.progress.setValue(0)
+        self.progress.setMaximum(amount)
+        self.progress.setMinimum(0)
+    
+    def itemDoubleClicked(self, model, index):
+        self.showRecord(model.record(index.row()))
+    
+    def showRecord(self, record):
+        """ Open the detailed view of record, unless it is None. """
+        if record is None:
+            return
+        view = QTestView(
+            *self.store.details(record),
+            profile=self.profiles.get(self.store.name(record))
+        )
+        view.show()
+        self.views.append(view)
+    
+    def followTest(self, item):
+        """ Show the output of the running test of item as it is written. """
+        test_name = unicode(item.text())
+        view = self.following.get(test_name)
+        if view is None:
+            view = QTestView(test_name, unicode(item.toolTip()), '', '')
+            self.following[test_name] = view
+            self.views.append(view)
+            spool = None
+            if self.spool_of is not None:
+                spool = self.spool_of(test_name)
+            if spool is not None:
+                view.follow(spool, limit=self.output_limit)
+        view.show()
+        view.raise_()
+    
+    def beginUpdate(self):
+        """ Suspend repainting; rows, scrolling, progress and status are only
+        updated by the matching endUpdate. Calls may be nested. """
+        self.updating += 1
+        if self.updating == 1:
+            self.setUpdatesEnabled(False)
+    
+    def endUpdate(self):
+        self.updating -= 1
+        if self.updating:
+            return
+        for outcome, model in self.models.iteritems():
+            if model.commit():
+                self.lists[outcome].scrollToBottom()
+        self.slowest_model.commit()
+        self.progress.setValue(self.n_started)
+        if self.current is not None and self.status is not None:
+            self.status('Running Test %s.' % self.current)
+        self.current = None
+        self.setUpdatesEnabled(True)
+    
+    def startTest(self, test_name, test_descr):
+        self.beginUpdate()
+        self.n_started += 1
+        self.current = test_name
+        if test_name not in self.running_items:
+            item = QtGui.QListWidgetItem(test_name)
+            item.setToolTip(test_descr)
+            self.running.addItem(item)
+            self.running_items[test_name] = item
+        self.endUpdate()
+    
+    def stopRunning(self, test_name):
+        item = self.running_items.pop(test_name, None)
+        if item is not None:
+            self.running.takeItem(self.running.row(item))
+    
+    def addResult(self, outcome, test_name, test_descr, outp, tb,
+                  wall=0.0, cpu=0.0, flags=0, growth=0, peak=0):
+        self.beginUpdate()
+        flags |= memory_flags(growth, peak, self.memory_budget)
+        if flags & LEAKED:
+            self.n_leaked += 1
+        if flags & OVER_BUDGET:
+            self.n_over_budget += 1
+        self.stopRunning(test_name)
+        view = self.following.pop(test_name, None)
+        if view is not None:
+            view.showResult(outp, tb)
+        if self.by_name is not None:
+            old = self.by_name.get(test_name)
+            if old is not None:
+                self.forget(old)
+        record = self.store.add(
+            outcome, test_name, test_descr, outp, tb, wall, cpu, flags,
+            growth, peak
+        )
+        if self.by_name is not None:
+            self.by_name[test_name] = record
+        self.search.add(record, tb)
+        if self.query is None:
+            self.models[outcome].append(record)
+        elif self.search.matches(record, self.query):
+            self.models[outcome].append(record)
+            self.n_found += 1
+            self.showFound()
+        self.slowest_model.add(record)
+        self.endUpdate()
+    
+    def forget(self, record):
+        """ Take the superseded result record out of the views and counts.
+        """
+        outcome = self.store.outcome(record)
+        self.models[outcome].remove(record)
+        self.search.discard(record)
+        query = self.query
+        if query is not None and self.search.matches(record, query):
+            self.n_found -= 1
+            self.showFound()
+        self.slowest_model.discard(record)
+        if outcome == SUCCESS:
+            self.n_success -= 1
+        elif outcome == FAILURE:
+            self.n_fail -= 1
+        else:
+            self.n_error -= 1
+        if self.store.isCached(record):
+            self.n_cached -= 1
+        if self.store.hasFlag(record, LEAKED):
+            self.n_leaked -= 1
+        if self.store.hasFlag(record, OVER_BUDGET):
+            self.n_over_budget -= 1
+    
+    def addSuccess(self, test_name, test_descr, outp, wall=0.0, cpu=0.0,
+                   growth=0, peak=0):
+        self.n_success += 1
+        self.addResult(SUCCESS, test_name, test_descr, outp, '', wall, cpu,
+                       0, growth, peak)
+    
+    def addCached(self, test_name, test_descr, outp, wall=0.0, cpu=0.0):
+        """ Show the result of a test that passed in an earlier run and was
+        skipped because nothing it depends on changed since. """
+        self.n_started += 1
+        self.n_success += 1
+        self.n_cached += 1
+        self.addResult(SUCCESS, test_name, test_descr, outp, '', wall, cpu,
+                       CACHED)
+    
+    def addProfile(self, test_name, stats):
+        self.profiles.add(test_name, stats)
+    
+    def failedNames(self):
+        """ Return the names of the tests that failed or had errors. """
+        return self.store.names_with((FAILURE, ERROR))
+    
+    def addFailure(self, test_name, test_descr, tb, outp, wall=0.0,
+                   cpu=0.0, growth=0, peak=0):
+        self.n_fail += 1
+        self.addResult(FAILURE, test_name, test_descr, outp, tb, wall, cpu,
+                       0, growth, peak)
+    
+    def addError(self, test_name, test_descr, tb, outp, wall=0.0, cpu=0.0,
+                 growth=0, peak=0):
+        self.n_error += 1
+        self.addResult(ERROR, test_name, test_descr, outp, tb, wall, cpu,
+                       0, growth, peak)
+    
+    def enter(self, update=False):
+        """ Prepare for a run. With update, the results of the last run are
+        kept and those of tests that run again replace them. """
+        if self.reset is not None:
+            self.reset()
+        
+        if COLORED_PROGRESS:
+            self.setProgressColor(BLUE_COLOR)
+        self.clearRunning()
+        if update:
+            if self.by_name is None:
+                self.by_name = self.store.index()
+            return
+        self.by_name = None
+        for model in self.models.itervalues():
+            model.clear()
+        self.slowest_model.clear()
+        self.store.clear()
+        self.search.clear()
+        self.n_found = 0
+        self.showFound()
+        self.profiles.clear()
+        
+        self.n_started = 0
+        self.n_success = 0
+        self.n_fail = 0
+        self.n_error = 0
+        self.n_cached = 0
+        self.n_leaked = 0
+        self.n_over_budget = 0
+    
+    def clearRunning(self):
+        self.running.clear()
+        self.running_items.clear()
+        for view in self.following.itervalues():
+            view.tail.stop()
+        self.following.clear()
+    
+    def openHistory(self):
+        """ Return the RunHistory runs are recorded in, None if there is
+        none or it cannot be opened. """
+        if self.history is None and self.history_dir is not None:
+            try:
+                self.history = RunHistory(self.history_dir)
+            except (sqlite3.Error, EnvironmentError):
+                self.history_dir = None
+        return self.history
+    
+    def recordHistory(self, elapsed):
+        """ Add the results shown to the history, as a run that took
+        elapsed seconds. """
+        history = self.openHistory()
+        if history is None or not len(self.store):
+            return
+        if self.by_name is not None:
+            records = sorted(self.by_name.itervalues())
+        else:
+            records = xrange(len(self.store))
+        try:
+            history.record(self.store, records, time.time() - elapsed,
+                           elapsed)
+        except (sqlite3.Error, EnvironmentError):
+            pass
+    
+    def done(self, elapsed, first_test=None, utilization=None, not_run=0):
+        self.clearRunning()
+        self.first_test = first_test
+        self.utilization = utilization or []
+        self.n_not_run = not_run
+        self.recordHistory(elapsed)
+        ok = not (self.n_error or self.n_fail)
+        if ok:
+            if COLORED_PROGRESS:
+                self.setProgressColor(GREEN_COLOR)
+            if self.on_success is not None:
+                self.on_success(elapsed)
+        else:
+            if COLORED_PROGRESS:
+                self.setProgressColor(RED_COLOR)
+            if self.on_failure is not None:
+                self.on_failure(elapsed)
+    
+
+
+class QTestRunner(TestRunner):
+    """ TestRunner that is driven by the Qt event loop: results are read
+    as soon as they arrive and applied to the QTestResult a frame budget
+    at a time (see consume), and timeouts are checked on a timer. """
+    def __init__(self, result, *args, **kwargs):
+        TestRunner.__init__(self, result, *args, **kwargs)
+        result.spool_of = self.spoolOf
+        result.output_limit = self.output_limit
+        # QSocketNotifier only works for sockets on Windows, there we
+        # have to fall back to polling the pipes.
+        if os.name == 'posix':
+            self.timer = None
+        else:
+            self.timer = QtCore.QTimer()
+            self.timer.connect(self.timer, 
+                       QtCore.SIGNAL('timeout()'),
+                       self.poll
+                       )
+            self.timer.setInterval(50)
+        self.watchdog = QtCore.QTimer()
+        self.watchdog.connect(self.watchdog, QtCore.SIGNAL('timeout()'),
+                              self.checkTimeouts)
+    
+    def startTimers(self):
+        if self.timer is not None:
+            self.timer.start()
+        if self.timeout:
+            self.watchdog.setInterval(int(min(1.0, self.timeout / 4.0) * 1000))
+            self.watchdog.start()
+    
+    def stopTimers(self):
+        if self.timer is not None:
+            self.timer.stop()
+        self.watchdog.stop()
+    
+    def watch(self, conn, control, persistent=False, worker=None,
+              spool=None, address=None):
+        channel = TestRunner.watch(self, conn, control, persistent, worker,
+                                   spool, address)
+        if self.timer is None:
+            notifier = QtCore.QSocketNotifier(conn.fileno(),
+                                              QtCore.QSocketNotifier.Read)
+            notifier.connect(notifier, QtCore.SIGNAL('activated(int)'),
+                             self.tick)
+            channel.notifier = notifier
+        return channel
+    
+    def unwatch(self, fd):
+        channel = self.conns.get(fd)
+        if channel is not None and channel.notifier is not None:
+            channel.notifier.setEnabled(False)
+            channel.notifier.deleteLater()
+        TestRunner.unwatch(self, fd)
+    
+    def schedule(self):
+        if self.pending and not self.scheduled:
+            self.scheduled = True
+            QtCore.QTimer.singleShot(0, self.consume)
+
+
+class QTestProgram(TestProgram):
+    def runTests(self):
+        if isinstance(self.testRunner, (type, types.ClassType)):
+            try:
+                testRunner = self.testRunner(verbosity=self.verbosity)
+            except TypeError:
+                # didn't accept the verbosity argument
+                testRunner = self.testRunner()
+        else:
+            # it is assumed to be a TestRunner instance
+            testRunner = self.testRunner
+        testRunner.run(self.test)
+
+
+def main():
+    app = QtGui.QApplication(sys.argv)
+    win = QTestWindow()
+    win.show()
+    # The window's own runner, so that File->Stop and Run Failed act on
+    # the tests it runs.
+    call_init(lambda: QTestProgram(testRunner=win.runner))
+    app.exec_()
+
+
+def run():
+    """ Show the main window, to pick the tests to run from there. """
+    app = QtGui.QApplication(sys.argv)
+    win = QTestWindow()
+    win.show()
+    app.exec_()
@@ -48,7 +48,7 @@ params = dict(
     keywords='unittest gui ui user-interface',
     license='GPL',
     zip_safe=True,
-    py_modules=['qtestudo'],
+    packages=['qtestudo'],
     install_requires=depends(['PyQt4']),
     classifiers = [
         'Development Status :: 4 - Beta',
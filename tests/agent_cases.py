@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests run on an agent by test_agent.py. The agent is started with
+QTESTUDO_ON_AGENT set, so that they can tell where they run.
+"""
+
+import os
+import sys
+import time
+import signal
+
+from unittest import TestCase
+
+ON_AGENT = bool(os.environ.get('QTESTUDO_ON_AGENT'))
+
+
+class Where(TestCase):
+    """ Every test writes where it runs, agent or local. """
+    def where(self):
+        sys.stdout.write('agent' if ON_AGENT else 'local')
+        time.sleep(0.05)
+    
+    test_00 = test_01 = test_02 = test_03 = test_04 = where
+    test_05 = test_06 = test_07 = test_08 = test_09 = where
+
+
+class LosesAgent(TestCase):
+    def test_loses_agent(self):
+        if ON_AGENT:
+            # The agent process serving the runner takes the connection
+            # to it along.
+            os.kill(os.getppid(), signal.SIGKILL)
+            os._exit(1)
+        sys.stdout.write('local')
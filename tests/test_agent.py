@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: us-ascii -*-
+
+# qtestudo - unittest UI using PyQt
+# Copyright (C) 2008 Florian Mayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Run tests on an agent listening on 127.0.0.1, as the runner would on
+another host.
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import socket
+import unittest
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from qtestudo import core
+from qtestudo.cli import StreamResult
+from qtestudo.core import TestRunner
+
+import agent_cases
+
+AUTHKEY = 'qtestudo-test'
+
+
+def free_port():
+    sock = socket.socket()
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+class Collector(object):
+    """ Reporter keeping the outcome, output and traceback of every
+    result. """
+    def __init__(self):
+        self.results = {}
+        self.tracebacks = {}
+    
+    def add(self, outcome, test_name, test_descr, outp, tb, wall, cpu,
+            flags=0, growth=0, peak=0):
+        self.results[test_name] = (outcome, outp)
+        self.tracebacks[test_name] = tb
+    
+    def close(self, result, elapsed):
+        pass
+
+
+class AgentTest(unittest.TestCase):
+    def setUp(self):
+        env = dict(os.environ, QTESTUDO_AUTHKEY=AUTHKEY, QTESTUDO_ON_AGENT='1',
+                   PYTHONPATH=os.pathsep.join([ROOT, HERE]))
+        self.address = ('127.0.0.1', free_port())
+        self.agent = subprocess.Popen(
+            [sys.executable, '-m', 'qtestudo.agent', '-b', self.address[0],
+             '-p', str(self.address[1])],
+            env=env, stderr=subprocess.PIPE
+        )
+        # It listens once it said so.
+        self.agent.stderr.readline()
+    
+    def tearDown(self):
+        self.agent.kill()
+        self.agent.wait()
+        self.agent.stderr.close()
+    
+    def run_tests(self, cases, authkey=AUTHKEY):
+        collector = Collector()
+        result = StreamResult([collector])
+        runner = TestRunner(result, 1, timings=None, results=None,
+                            agents=[self.address], authkey=authkey)
+        tests = unittest.TestLoader().loadTestsFromTestCase(cases)
+        runner.run(tests)
+        runner.wait()
+        self.tracebacks = collector.tracebacks
+        return runner, result, collector.results
+    
+    def test_agent(self):
+        runner, result, results = self.run_tests(agent_cases.Where)
+        self.assertEqual(runner.unreachable, [])
+        self.assertEqual(result.n_success, 10)
+        self.assertIn('agent', [outp for outcome, outp in results.values()])
+    
+    def test_wrong_authkey(self):
+        runner, result, results = self.run_tests(agent_cases.Where, 'wrong')
+        self.assertEqual([address for address, reason in runner.unreachable],
+                         [self.address])
+        self.assertEqual(result.n_success, 10)
+        self.assertEqual(set(outp for outcome, outp in results.values()),
+                         set(['local']))
+    
+    def test_lost_agent(self):
+        runner, result, results = self.run_tests(agent_cases.LosesAgent)
+        self.assertEqual(result.n_error, 0)
+        self.assertEqual(results.values(), [('success', 'local')])
+        # The local worker that took the agent's place counts as one.
+        self.assertEqual(len(result.utilization), 2)
+    
+    def test_lost_agent_no_retries(self):
+        retries, core.AGENT_RETRIES = core.AGENT_RETRIES, 0
+        try:
+            runner, result, results = self.run_tests(agent_cases.LosesAgent)
+        finally:
+            core.AGENT_RETRIES = retries
+        self.assertEqual(result.n_error, 1)
+        self.assertIn('was lost', self.tracebacks.values()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()